@@ -0,0 +1,95 @@
+import csv
+import time
+
+# ================== Batch Stock Adjustments ==================
+# Applies relative stock movements (receipts positive, issues negative) to
+# many items in one transaction as stock = stock + delta, so two people
+# booking movements at the same time add up instead of overwriting each
+# other. Lines for the same item are summed in a temp staging table and
+# the whole batch is applied with one UPDATE; the row triggers (totals,
+# alerts, change log) run once per item.
+#
+# A batch naming an unknown item is rejected as a whole, and so is one
+# that would take any item below zero when check_negative=True. Both
+# checks run after the UPDATE, inside the write transaction, so a
+# concurrent writer cannot slip in between check and update.
+
+
+class AdjustmentError(ValueError):
+    def __init__(self, message, items):
+        shown = ", ".join(str(item) for item in items[:10])
+        super().__init__(f"{message}: {shown}{' ...' if len(items) > 10 else ''}")
+        self.items = items
+
+
+class AdjustStats:
+    def __init__(self, lines, items, seconds):
+        self.lines = lines          # movements read
+        self.items = items          # distinct items changed
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"AdjustStats(lines={self.lines}, items={self.items}, seconds={self.seconds:.3f})"
+
+    @property
+    def rate(self):
+        # Movements applied per second
+        return self.lines / self.seconds if self.seconds else 0.0
+
+    def summary(self, noun):
+        return (f"Applied {self.lines} stock movements to {self.items} {noun} "
+                f"in {self.seconds:.2f}s ({self.rate:,.0f} lines/s).")
+
+
+def read_movements_csv(path):
+    # [(item, delta)] from a CSV file with a header row and ID,delta lines
+    movements = []
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for record in reader:
+            if not record:
+                continue
+            try:
+                movements.append((record[0], int(record[1])))
+            except (IndexError, ValueError):
+                raise ValueError(f"{path}, line {reader.line_num}: expected ID,quantity") from None
+    return movements
+
+
+def apply_movements(conn, table, key, column, movements, check_negative=False):
+    # movements: iterable of (item, delta). Returns AdjustStats; raises
+    # AdjustmentError (nothing applied) for unknown or negative items.
+    started = time.perf_counter()
+    stage = f"adjust_stage_{table}"
+    conn.execute(f"""CREATE TEMP TABLE IF NOT EXISTS {stage} (
+                         item TEXT PRIMARY KEY, delta INTEGER NOT NULL) WITHOUT ROWID""")
+    movements = [(item, int(delta)) for item, delta in movements]
+    try:
+        with conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")     # take the write lock up front
+            conn.executemany(f"""INSERT INTO {stage} VALUES (?, ?)
+                                 ON CONFLICT (item) DO UPDATE SET delta = delta + excluded.delta""",
+                             movements)
+            items = conn.execute(f"SELECT COUNT(*) FROM {stage}").fetchone()[0]
+            changed = conn.execute(f"""
+                UPDATE {table} SET {column} = IFNULL({column}, 0)
+                    + (SELECT delta FROM {stage} WHERE item = {table}.{key})
+                WHERE {key} IN (SELECT item FROM {stage})
+            """).rowcount
+            if changed != items:
+                missing = [row[0] for row in conn.execute(f"""
+                    SELECT item FROM {stage} WHERE item NOT IN (SELECT {key} FROM {table})
+                    ORDER BY item""")]
+                raise AdjustmentError("unknown IDs", missing)
+            if check_negative:
+                negative = [row[0] for row in conn.execute(f"""
+                    SELECT s.item FROM {stage} s JOIN {table} t ON t.{key} = s.item
+                    WHERE s.delta < 0 AND t.{column} < 0 ORDER BY s.item""")]
+                if negative:
+                    raise AdjustmentError("stock would go below zero", negative)
+    finally:
+        conn.execute(f"DELETE FROM {stage}")
+        conn.commit()
+    return AdjustStats(len(movements), items, time.perf_counter() - started)
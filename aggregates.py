@@ -0,0 +1,110 @@
+import math
+
+# ================== Materialized Group Aggregates ==================
+# A summary table with one row per group (e.g. per category) holding the
+# group's row count and running sums, kept up to date by insert, update
+# and delete triggers on the base table. Dashboards read O(groups) rows
+# instead of aggregating the whole table on every click.
+#
+# check() recomputes everything with GROUP BY and reports any group whose
+# stored numbers disagree; rebuild() replaces the stored numbers with the
+# recomputed ones. Sums of REAL columns are compared with a small
+# tolerance, since adding and subtracting floats row by row drifts in the
+# last few bits.
+#
+# NULL groups are stored under '' so that ON CONFLICT can find them.
+
+REL_TOLERANCE = 1e-9
+ABS_TOLERANCE = 1e-6
+
+
+class GroupAggregate:
+    def __init__(self, table, group, sums):
+        # sums: {column name: SQL expression}, with {row} standing for the
+        # base row, e.g. {"value": "{row}.price * {row}.stock"}
+        self.table = table
+        self.group = group
+        self.sums = sums
+        self.agg_table = f"{table}_by_{group}"
+
+    # ---------- Schema ----------
+    def install(self, conn):
+        t, g, agg = self.table, self.group, self.agg_table
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (agg,)).fetchone()
+        names = ", ".join(self.sums)
+        cols = ", ".join(f"{name} NOT NULL DEFAULT 0" for name in self.sums)
+
+        def add(row):
+            values = ", ".join(f"COALESCE({self._expr(name, row)}, 0)" for name in self.sums)
+            updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in self.sums)
+            return f"""
+                INSERT INTO {agg} ({g}, row_count, {names})
+                VALUES (COALESCE({row}.{g}, ''), 1, {values})
+                ON CONFLICT ({g}) DO UPDATE SET row_count = row_count + 1, {updates};"""
+
+        def remove(row):
+            updates = ", ".join(f"{name} = {name} - COALESCE({self._expr(name, row)}, 0)"
+                                for name in self.sums)
+            return f"""
+                UPDATE {agg} SET row_count = row_count - 1, {updates}
+                WHERE {g} = COALESCE({row}.{g}, '');
+                DELETE FROM {agg} WHERE {g} = COALESCE({row}.{g}, '') AND row_count = 0;"""
+
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {agg} (
+                {g} TEXT PRIMARY KEY,
+                row_count INTEGER NOT NULL DEFAULT 0,
+                {cols}
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER IF NOT EXISTS {agg}_insert AFTER INSERT ON {t}
+            BEGIN {add("NEW")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {agg}_update AFTER UPDATE ON {t}
+            BEGIN {remove("OLD")} {add("NEW")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {agg}_delete AFTER DELETE ON {t}
+            BEGIN {remove("OLD")}
+            END;
+        """)
+        if not exists:
+            # Summarise the rows that were there before the table was
+            self.rebuild(conn)
+
+    def _expr(self, name, row):
+        return self.sums[name].format(row=row)
+
+    def _recompute_sql(self):
+        sums = ", ".join(f"COALESCE(SUM({self._expr(name, self.table)}), 0)" for name in self.sums)
+        return (f"SELECT COALESCE({self.group}, '') AS grp, COUNT(*), {sums} "
+                f"FROM {self.table} GROUP BY grp")
+
+    # ---------- Reads ----------
+    def rows(self, conn):
+        # [(group, row_count, *sums)] ordered by group
+        return conn.execute(f"SELECT {self.group}, row_count, {', '.join(self.sums)} "
+                            f"FROM {self.agg_table} ORDER BY {self.group}").fetchall()
+
+    def total(self, conn, name):
+        return conn.execute(f"SELECT COALESCE(SUM({name}), 0) FROM {self.agg_table}").fetchone()[0]
+
+    # ---------- Consistency ----------
+    def check(self, conn):
+        # [(group, column, stored, recomputed)] for every disagreement
+        names = ["row_count", *self.sums]
+        stored = {row[0]: row[1:] for row in self.rows(conn)}
+        actual = {row[0]: row[1:] for row in conn.execute(self._recompute_sql())}
+        zeros = (0,) * len(names)
+        mismatches = []
+        for group in sorted(stored.keys() | actual.keys()):
+            have, want = stored.get(group, zeros), actual.get(group, zeros)
+            for name, a, b in zip(names, have, want):
+                if not math.isclose(a, b, rel_tol=REL_TOLERANCE, abs_tol=ABS_TOLERANCE):
+                    mismatches.append((group, name, a, b))
+        return mismatches
+
+    def rebuild(self, conn):
+        names = ", ".join(self.sums)
+        conn.execute(f"DELETE FROM {self.agg_table}")
+        conn.execute(f"INSERT INTO {self.agg_table} ({self.group}, row_count, {names}) "
+                     f"{self._recompute_sql()}")
@@ -0,0 +1,121 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+import db
+import inventory_core as app
+from benchmarks import datasets
+from versions import StaleRowError
+
+# ================== Multi-process Stress Test ==================
+# Several writer processes hammer the same inventory.db, each adding 1 to
+# the stock of random products from a small hot set, the way app instances
+# on a shared workstation would. Afterwards the total stock must have grown
+# by exactly the number of operations: anything less is lost writes.
+#
+#   adjust      relative update (stock = stock + 1) in one transaction
+#   optimistic  read row and version, write stock + 1 if the version still
+#               matches, re-read and try again on StaleRowError
+#   naive       read, then overwrite with stock + 1 (the old update_stock);
+#               expected to lose writes, shown for comparison
+#
+#   python -m benchmarks.concurrency
+#   python -m benchmarks.concurrency --writers 1 2 4 8 --ops 500 --modes adjust optimistic
+
+MODES = ("adjust", "optimistic", "naive")
+PRODUCTS = 1000
+HOT_PRODUCTS = 20       # writers pick from these, so they collide often
+
+
+def increment(mode, product_id):
+    # One +1 stock operation; returns the number of version conflicts hit
+    if mode == "adjust":
+        app.adjust_stock([(product_id, 1)])
+        return 0
+    if mode == "naive":
+        row = app.fetch_product(product_id)
+        app.set_stock(product_id, row[4] + 1)
+        return 0
+    conflicts = 0
+    while True:
+        row, version = app.fetch_product_version(product_id)
+        try:
+            app.set_stock(product_id, row[4] + 1, version)
+            return conflicts
+        except StaleRowError:
+            conflicts += 1
+
+
+def writer(path, mode, ops, seed, start, results):
+    app.DB_PATH = path
+    rng = random.Random(seed)
+    keys = [f"P{rng.randrange(HOT_PRODUCTS):07d}" for _ in range(ops)]
+    start.wait()
+    began = time.perf_counter()
+    conflicts = sum(increment(mode, key) for key in keys)
+    results.put((ops, conflicts, time.perf_counter() - began))
+    db.close_connection()
+
+
+def total_stock(path):
+    conn = db.open_connection(path)
+    try:
+        return conn.execute("SELECT SUM(stock) FROM products").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def run(path, mode, writers, ops):
+    before = total_stock(path)
+    ctx = multiprocessing.get_context("spawn")
+    start, results = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=writer, args=(path, mode, ops, seed, start, results))
+             for seed in range(writers)]
+    for p in procs:
+        p.start()
+    time.sleep(0.5)     # let every writer finish starting up
+    began = time.perf_counter()
+    start.set()
+    done = [results.get() for _ in procs]
+    seconds = time.perf_counter() - began
+    for p in procs:
+        p.join()
+    total_ops = sum(d[0] for d in done)
+    return {"mode": mode, "writers": writers, "ops": total_ops,
+            "ops_per_sec": total_ops / seconds, "conflicts": sum(d[1] for d in done),
+            "lost": before + total_ops - total_stock(path)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent writers on one inventory database")
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--ops", type=int, default=300, help="operations per writer")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args(argv)
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        app.DB_PATH = os.path.join(tmp, "inventory.db")
+        app.connect_db()
+        with db.transaction(app.DB_PATH) as conn:
+            conn.executemany("INSERT INTO products VALUES (?, ?, ?, ?, ?)", datasets.products(PRODUCTS))
+        db.close_connection(app.DB_PATH)
+
+        print(f"{'mode':<11} {'writers':>7} {'ops':>7} {'throughput':>14} {'conflicts':>10} {'lost writes':>12}")
+        for mode in args.modes:
+            for writers in args.writers:
+                r = run(app.DB_PATH, mode, writers, args.ops)
+                print(f"{r['mode']:<11} {r['writers']:>7} {r['ops']:>7} {r['ops_per_sec']:>10.0f} op/s "
+                      f"{r['conflicts']:>10} {r['lost']:>12}", flush=True)
+                failed |= mode != "naive" and r["lost"] != 0
+    if failed:
+        print("\nLOST WRITES in a safe mode")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import db
+
+# ================== Connection Micro-benchmark ==================
+# Per-operation latency of the old connect-per-handler pattern ("before")
+# against the shared per-thread connection from db.py ("after").
+#
+#   python -m benchmarks.connections [operations]
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS employee (
+        emp_id TEXT PRIMARY KEY,
+        name TEXT,
+        department TEXT,
+        email TEXT,
+        salary REAL
+    )
+"""
+
+
+def per_call_connection(path):
+    # What every handler used to do
+    def run(sql, params=()):
+        conn = sqlite3.connect(path)
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        conn.commit()
+        conn.close()
+        return rows
+    return run
+
+
+def shared_connection(path):
+    def run(sql, params=()):
+        with db.transaction(path) as conn:
+            return conn.execute(sql, params).fetchall()
+    return run
+
+
+def operations(n):
+    yield "insert", [("INSERT INTO employee VALUES (?, ?, ?, ?, ?)",
+                      (f"E{i:07d}", f"Name {i}", "Sales", f"e{i}@example.com", 1000.0 + i))
+                     for i in range(n)]
+    yield "select by id", [("SELECT * FROM employee WHERE emp_id=?", (f"E{i:07d}",))
+                           for i in range(n)]
+    yield "update", [("UPDATE employee SET salary=? WHERE emp_id=?", (2000.0 + i, f"E{i:07d}"))
+                     for i in range(n)]
+    yield "delete", [("DELETE FROM employee WHERE emp_id=?", (f"E{i:07d}",))
+                     for i in range(n)]
+
+
+def measure(run, statements):
+    start = time.perf_counter()
+    for sql, params in statements:
+        run(sql, params)
+    return (time.perf_counter() - start) / len(statements) * 1e6
+
+
+def main(argv):
+    n = int(argv[1]) if len(argv) > 1 else 2000
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, factory in (("before", per_call_connection), ("after", shared_connection)):
+            path = os.path.join(tmp, f"{label}.db")
+            with sqlite3.connect(path) as conn:
+                conn.execute(SCHEMA)
+            run = factory(path)
+            for op, statements in operations(n):
+                results.setdefault(op, {})[label] = measure(run, statements)
+            db.close_connection(path)
+
+    print(f"{'operation':<15} {'before (us)':>12} {'after (us)':>12} {'speedup':>8}")
+    print("-" * 50)
+    for op, r in results.items():
+        print(f"{op:<15} {r['before']:>12.1f} {r['after']:>12.1f} {r['before'] / r['after']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,58 @@
+import csv
+import random
+
+# ================== Synthetic Datasets ==================
+# Deterministic employee and product rows for benchmarks. The same size
+# and seed always give the same data, so runs on different commits are
+# comparable.
+
+FIRST_NAMES = ["Anna", "Bob", "Carla", "Dmitri", "Eve", "Farah", "Gus", "Hana",
+               "Ivan", "Julia", "Kofi", "Lena", "Marco", "Nadia", "Omar", "Priya"]
+LAST_NAMES = ["Smith", "Patel", "Garcia", "Chen", "Okafor", "Novak", "Silva",
+              "Kim", "Haddad", "Larsen", "Rossi", "Tanaka"]
+DEPARTMENTS = ["Sales", "Engineering", "Support", "Finance", "HR", "Marketing",
+               "Legal", "Operations", "Research", "Logistics"]
+
+ADJECTIVES = ["Compact", "Heavy", "Smart", "Classic", "Wireless", "Steel",
+              "Eco", "Pro", "Mini", "Ultra"]
+NOUNS = ["Drill", "Lamp", "Router", "Chair", "Kettle", "Cable", "Monitor",
+         "Blender", "Backpack", "Speaker", "Hammer", "Printer"]
+CATEGORIES = ["Tools", "Lighting", "Networking", "Furniture", "Kitchen",
+              "Electronics", "Outdoor", "Office", "Garden", "Sports",
+              "Toys", "Automotive", "Health", "Books", "Music",
+              "Storage", "Cleaning", "Pets", "Bath", "Crafts"]
+
+EMPLOYEE_HEADER = ["Employee ID", "Name", "Department", "Email", "Salary"]
+PRODUCT_HEADER = ["Product ID", "Name", "Category", "Price", "Stock"]
+
+
+def employees(n, seed=1):
+    rng = random.Random(seed)
+    for i in range(n):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield (f"E{i:07d}", f"{first} {last}", rng.choice(DEPARTMENTS),
+               f"{first.lower()}.{last.lower()}{i}@example.com",
+               round(rng.uniform(25000, 180000), 2))
+
+
+def products(n, seed=1):
+    rng = random.Random(seed)
+    for i in range(n):
+        yield (f"P{i:07d}", f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}",
+               rng.choice(CATEGORIES), round(rng.uniform(0.5, 900), 2),
+               rng.randrange(0, 250))
+
+
+def stock_movements(n, products, seed=1):
+    # Goods-receipt style lines for the first `products` product IDs
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield (f"P{rng.randrange(products):07d}", rng.randint(-5, 50))
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
@@ -0,0 +1,113 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import db
+from benchmarks import datasets
+from query_plans import load_app
+
+# ================== Export Memory Check ==================
+# Runs the TXT and CSV exporters of both apps on growing tables and
+# records the peak Python memory (tracemalloc) of each run. The exporters
+# stream the cursor in batches, so the peak must not grow with the table:
+# the check fails when an export's peak on the largest table exceeds
+# FLAT_RATIO times its peak on the smallest (plus SLACK_KIB for noise).
+#
+# Rows go straight into the bare table, and only the summary table the TXT
+# report reads its totals from is installed (built in one pass afterwards):
+# running 10M rows through every trigger, or rebuilding the search index
+# over them, would take far longer than the exports.
+#
+#   python -m benchmarks.export_memory                      10k to 1M rows
+#   python -m benchmarks.export_memory --sizes 10000 10000000
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+FLAT_RATIO = 1.5
+SLACK_KIB = 256
+LOAD_BATCH = 100_000
+KINDS = ("txt", "csv")
+
+APPS = {
+    # app: (table, rows(n), summary the TXT report reads)
+    "employee": ("employee", datasets.employees, "SALARY_TOTALS"),
+    "inventory": ("products", datasets.products, "CATEGORY_TOTALS"),
+}
+
+SCHEMAS = {
+    "employee": """CREATE TABLE employee (emp_id TEXT PRIMARY KEY, name TEXT, department TEXT,
+                                          email TEXT, salary REAL)""",
+    "inventory": """CREATE TABLE products (product_id TEXT PRIMARY KEY, name TEXT, category TEXT,
+                                           price REAL, stock INTEGER)""",
+}
+
+
+def build(app, name, size):
+    table, rows, summary = APPS[name]
+    conn = db.get_connection(app.DB_PATH)
+    conn.execute(SCHEMAS[name])
+    batch = []
+    for row in rows(size):
+        batch.append(row)
+        if len(batch) >= LOAD_BATCH:
+            conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    conn.executemany(f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?)", batch)
+    getattr(app, summary).install(conn)
+    conn.commit()
+
+
+def measure(export):
+    # (peak KiB, seconds, file size in MiB) of one export
+    tracemalloc.start()
+    try:
+        began = time.perf_counter()
+        path = export()
+        seconds = time.perf_counter() - began
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    size = os.path.getsize(path) / 2**20
+    os.remove(path)
+    return peak / 1024, seconds, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Peak memory of the streaming exporters")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--apps", nargs="+", choices=tuple(APPS), default=list(APPS))
+    args = parser.parse_args(argv)
+    sizes = sorted(args.sizes)
+
+    peaks = {}      # {(app, kind): {size: KiB}}
+    print(f"{'export':<15} {'rows':>11} {'peak':>12} {'time':>10} {'file':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.apps:
+            app = load_app(name)
+            app.EXPORTS.directory = os.path.join(tmp, "exports")
+            for size in sizes:
+                app.DB_PATH = os.path.join(tmp, f"{name}_{size}.db")
+                build(app, name, size)
+                for kind in KINDS:
+                    peak, seconds, mib = measure(app.EXPORTERS[kind])
+                    peaks.setdefault((name, kind), {})[size] = peak
+                    print(f"{name + ' ' + kind:<15} {size:>11,} {peak:>8,.0f} KiB {seconds:>8.2f} s "
+                          f"{mib:>7,.0f} MiB", flush=True)
+                db.close_connection(app.DB_PATH)
+                os.remove(app.DB_PATH)
+
+    grown = [(name, kind, by_size[sizes[0]], by_size[sizes[-1]])
+             for (name, kind), by_size in peaks.items()
+             if by_size[sizes[-1]] > by_size[sizes[0]] * FLAT_RATIO + SLACK_KIB]
+    for name, kind, small, large in grown:
+        print(f"\n{name} {kind}: peak grew from {small:,.0f} KiB at {sizes[0]:,} rows "
+              f"to {large:,.0f} KiB at {sizes[-1]:,}")
+    if not grown and len(sizes) > 1:
+        print(f"\nPeak memory flat from {sizes[0]:,} to {sizes[-1]:,} rows")
+    return 1 if grown else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import db
+from adjustments import apply_movements
+from benchmarks import datasets
+from ledger import StockLedger
+
+# ================== Stock Ledger Benchmark ==================
+# Builds a stock ledger of tens of millions of movements spread over two
+# years, then compares point-in-time stock (last snapshot + the movements
+# after it) with a replay of the product's whole history, and measures
+# what the ledger triggers add to a batch of stock movements.
+#
+# The history is loaded straight into the ledger tables, in the layout the
+# triggers write (movement numbers, a snapshot every `every` movements),
+# since pushing 20M movements through the triggers one batch at a time
+# would take most of an hour. Every product gets the same number of
+# movements at random times. Every query result is checked against the
+# replay.
+#
+#   python -m benchmarks.ledger                             10M movements
+#   python -m benchmarks.ledger --rows 20000000 --products 10000
+
+START = 1672531200          # 2023-01-01 00:00:00 UTC
+SPAN = 2 * 365 * 86400      # history covers two years
+LOAD_BATCH = 100000
+MOVEMENT_LINES = 5000       # lines per batch in the write test
+DELTAS = [d for d in range(-5, 51) if d]    # the triggers skip 0
+
+REPLAY = "SELECT IFNULL(SUM(delta), 0) FROM products_ledger WHERE item = ? AND at <= ?"
+
+
+def history(rows, products, every, seed=1):
+    # (ledger row, snapshot row or None) per product, in (item, n) order:
+    # rows // products movements each, at random times over SPAN
+    rng = random.Random(seed)
+    for i in range(products):
+        item, stock = f"P{i:07d}", 0
+        times = sorted(START + rng.randrange(SPAN) for _ in range(rows // products))
+        for n, at in enumerate(times, 1):
+            delta = rng.choice(DELTAS)
+            stock += delta
+            yield (item, n, delta, at), (item, at, n, stock) if n % every == 0 else None
+
+
+def build(conn, ledger, rows, products):
+    conn.execute("""CREATE TABLE products (product_id TEXT PRIMARY KEY, name TEXT,
+                    category TEXT, price REAL, stock INTEGER)""")
+    conn.executemany("INSERT INTO products VALUES (?, ?, ?, ?, 0)",
+                     ((row[0], row[1], row[2], row[3]) for row in datasets.products(products)))
+    ledger.install(conn)
+    conn.commit()
+
+    moves, snaps = [], []
+    for move, snap in history(rows, products, ledger.every):
+        moves.append(move)
+        if snap:
+            snaps.append(snap)
+        if len(moves) >= LOAD_BATCH:
+            load(conn, ledger, moves, snaps)
+    load(conn, ledger, moves, snaps)
+
+
+def load(conn, ledger, moves, snaps):
+    conn.executemany(f"INSERT INTO {ledger.ledger_table} VALUES (?, ?, ?, datetime(?, 'unixepoch'))",
+                     moves)
+    conn.executemany(f"INSERT INTO {ledger.snapshots_table} VALUES (?, datetime(?, 'unixepoch'), ?, ?)",
+                     snaps)
+    conn.commit()
+    moves.clear()
+    snaps.clear()
+
+
+def timed(func, args):
+    # (results, per-call milliseconds)
+    results, times = [], []
+    for a in args:
+        began = time.perf_counter()
+        results.append(func(*a))
+        times.append((time.perf_counter() - began) * 1000)
+    return results, times
+
+
+def describe(name, times):
+    times = sorted(times)
+    p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+    print(f"{name:<28} mean {statistics.fmean(times):8.3f} ms   "
+          f"p50 {statistics.median(times):8.3f} ms   p99 {p99:8.3f} ms")
+
+
+def write_rate(path, ledger, products):
+    # Lines/s of batch movements on `path`, through apply_movements
+    conn = db.open_connection(path)
+    try:
+        if ledger is not None:
+            ledger.install(conn)
+        movements = list(datasets.stock_movements(MOVEMENT_LINES * 10, products, seed=7))
+        began = time.perf_counter()
+        for i in range(0, len(movements), MOVEMENT_LINES):
+            apply_movements(conn, "products", "product_id", "stock", movements[i:i + MOVEMENT_LINES])
+        return len(movements) / (time.perf_counter() - began)
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Point-in-time stock on a large movement ledger")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="movements in the ledger")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--every", type=int, default=100, help="movements per snapshot")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ledger.db")
+        ledger = StockLedger("products", "product_id", "stock", every=args.every)
+        conn = db.open_connection(path)
+        began = time.perf_counter()
+        build(conn, ledger, args.rows, args.products)
+        snapshots = conn.execute(f"SELECT COUNT(*) FROM {ledger.snapshots_table}").fetchone()[0]
+        print(f"Built {args.rows:,} movements and {snapshots:,} snapshots for {args.products:,} products "
+              f"in {time.perf_counter() - began:.0f}s ({os.path.getsize(path) / 2**20:,.0f} MiB)\n")
+
+        rng = random.Random(3)
+        asks = [(f"P{rng.randrange(args.products):07d}",
+                 time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(START + rng.randrange(SPAN))))
+                for _ in range(args.queries)]
+        fast, fast_times = timed(lambda item, when: ledger.stock_at(conn, item, when), asks)
+        slow, slow_times = timed(lambda item, when: conn.execute(REPLAY, (item, when)).fetchone()[0], asks)
+        describe("snapshot + ledger scan", fast_times)
+        describe("full history replay", slow_times)
+        print(f"{'speed-up':<28} {statistics.fmean(slow_times) / statistics.fmean(fast_times):.1f}x")
+        conn.close()
+        wrong = sum(a != b for a, b in zip(fast, slow))
+
+        # Trigger cost: the same batches with and without a ledger
+        plain = os.path.join(tmp, "plain.db")
+        conn = sqlite3.connect(plain)
+        conn.execute("""CREATE TABLE products (product_id TEXT PRIMARY KEY, name TEXT,
+                        category TEXT, price REAL, stock INTEGER)""")
+        conn.executemany("INSERT INTO products VALUES (?, ?, ?, ?, ?)", datasets.products(args.products))
+        conn.commit()
+        conn.close()
+        print(f"\n{'batch movements, no ledger':<28} {write_rate(plain, None, args.products):10,.0f} lines/s")
+        print(f"{'batch movements, ledger':<28} {write_rate(path, ledger, args.products):10,.0f} lines/s")
+
+    if wrong:
+        print(f"\n{wrong} point-in-time results differ from the replay")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+
+import db
+import employee_core as app
+
+# ================== Salary Quantile Accuracy Check ==================
+# Fills an employee database with departments of 1 to --small employees
+# and one of --large, then compares the median and P90 that
+# salary_statistics() reads from the salary sketches (per department and
+# merged over all employees) with the exact values, interpolated the same
+# way (statistics.quantiles(method="inclusive")). Small departments are
+# where a quantile falls between two salaries, so they get the most cases.
+# Fails when any result is off by more than the sketch's accuracy.
+#
+#   python -m benchmarks.quantile_accuracy
+#   python -m benchmarks.quantile_accuracy --small 50 --large 200000
+
+QUANTILES = (0.5, 0.9)      # the median and P90 columns
+
+
+def exact(values, q):
+    ordered = sorted(values)
+    rank = q * (len(ordered) - 1)
+    low = math.floor(rank)
+    above = ordered[min(low + 1, len(ordered) - 1)]
+    return ordered[low] + (above - ordered[low]) * (rank - low)
+
+
+def salaries(rng, n):
+    return [round(rng.uniform(25000, 180000), 2) for _ in range(n)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sketch quantiles against exact percentiles")
+    parser.add_argument("--small", type=int, default=20, help="largest small department")
+    parser.add_argument("--large", type=int, default=50000, help="employees in the large department")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(5)
+    departments = {"Pair": [50000.0, 70000.0], "Triple": [50000.0, 60000.0, 70000.0]}
+    for n in range(1, args.small + 1):
+        departments[f"Small {n:02d}"] = salaries(rng, n)
+    departments["Large"] = salaries(rng, args.large)
+    rows = [(department, salary) for department, values in departments.items() for salary in values]
+    everyone = [salary for _, salary in rows]
+
+    worst, failures = 0.0, []
+    with tempfile.TemporaryDirectory() as tmp:
+        app.DB_PATH = os.path.join(tmp, "employees.db")
+        app.connect_db()
+        with db.transaction(app.DB_PATH) as conn:
+            conn.executemany("INSERT INTO employee VALUES (?, ?, ?, ?, ?)",
+                             ((f"E{i:07d}", "Name", department, "e@example.com", salary)
+                              for i, (department, salary) in enumerate(rows)))
+        for department, count, total, mean, stddev, *estimates in app.salary_statistics():
+            values = everyone if department is None else departments[department]
+            for q, estimate in zip(QUANTILES, estimates):
+                want = exact(values, q)
+                error = abs(estimate - want) / want
+                worst = max(worst, error)
+                if error > app.SALARY_QUANTILES.accuracy:
+                    failures.append((department or "(all)", count, q, estimate, want, error))
+        db.close_connection(app.DB_PATH)
+
+    print(f"{len(departments) + 1} groups, {len(everyone):,} salaries: "
+          f"worst relative error {worst:.3%} (allowed {app.SALARY_QUANTILES.accuracy:.0%})")
+    for department, count, q, estimate, want, error in failures:
+        print(f"  {department} ({count}): p{q * 100:g} {estimate:,.2f}, exact {want:,.2f} ({error:.2%} off)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import db
+from benchmarks import datasets
+from query_plans import load_app
+
+# ================== Headless Benchmark Suite ==================
+# Times every data operation behind the two apps' handlers on synthetic
+# datasets, without creating a Tk window. Each operation is run once for
+# timing and once under tracemalloc for peak Python memory. Results are
+# written as JSON; --compare prints the change against an earlier run.
+# Imports of the suite's own exports are round-trip checks: they must
+# insert every exported row, or the run fails.
+#
+#   python -m benchmarks.suite                      1k, 10k, 100k, 1M rows
+#   python -m benchmarks.suite --sizes 1000 10000 --out before.json
+#   python -m benchmarks.suite --sizes 1000 10000 --compare before.json
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+PAGE_SIZE = 100
+SCROLL_PAGES = 50
+MOVEMENT_LINES = 5000       # lines per batch stock adjustment
+REGRESSION_RATIO = 1.2
+
+
+class Op:
+    def __init__(self, name, run, prepare=None, expect=None):
+        self.name = name
+        self.run = run            # () -> rows processed
+        self.prepare = prepare    # untimed reset before each run
+        self.expect = expect      # rows run() must report, if checked
+
+
+def reset_db(app):
+    db.close_connection(app.DB_PATH)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(app.DB_PATH + suffix):
+            os.remove(app.DB_PATH + suffix)
+    app.connect_db()
+
+
+def touch_rows(app, table, key, n=100):
+    # A small batch of edits for the delta export to pick up
+    conn = db.get_connection(app.DB_PATH)
+    with conn:
+        conn.execute(f"UPDATE {table} SET name = name WHERE {key} IN "
+                     f"(SELECT {key} FROM {table} ORDER BY {key} LIMIT ?)", (n,))
+
+
+def scroll(fetch_after, pages):
+    rows, key = 0, None
+    for _ in range(pages):
+        page = fetch_after(key, PAGE_SIZE)
+        if not page:
+            break
+        rows += len(page)
+        key = page[-1][0]
+    return rows
+
+
+def employee_ops(app, size, tmp):
+    csv_path = datasets.write_csv(os.path.join(tmp, "employees.csv"),
+                                  datasets.EMPLOYEE_HEADER, datasets.employees(size))
+    conn = lambda: db.get_connection(app.DB_PATH)
+    exported = {}
+
+    def export_txt():
+        exported["txt"] = app.export_txt_file()
+        return size
+
+    def export_snapshot():
+        exported["snap"] = app.export_snapshot_file()
+        return size
+
+    return [
+        Op("import_from_csv", lambda: app.import_employees_csv(csv_path).inserted,
+           prepare=lambda: reset_db(app)),
+        Op("show_all", lambda: len(app.fetch_employees_after(None, PAGE_SIZE))),
+        Op("scroll", lambda: scroll(app.fetch_employees_after, SCROLL_PAGES)),
+        Op("last_page", lambda: len(app.fetch_employees_before(None, PAGE_SIZE))),
+        Op("search_employee", lambda: sum(len(app.EMPLOYEE_SEARCH.search(conn(), q))
+                                          for q in ("anna", "kim sales", "E0000042", "eng"))),
+        Op("salary_statistics", lambda: len(app.salary_statistics())),
+        Op("export_to_txt", export_txt),
+        Op("export_to_csv", lambda: app.export_csv_file() and size),
+        Op("export_snapshot", export_snapshot),
+        Op("export_changes", lambda: app.export_changes_file() and 100,
+           prepare=lambda: touch_rows(app, "employee", "emp_id")),
+        Op("import_from_txt", lambda: app.import_employees_txt(exported["txt"]).inserted,
+           prepare=lambda: reset_db(app), expect=size),
+        Op("restore_snapshot", lambda: app.restore_snapshot(exported["snap"]).inserted,
+           prepare=lambda: reset_db(app), expect=size),
+    ]
+
+
+def inventory_ops(app, size, tmp):
+    csv_path = datasets.write_csv(os.path.join(tmp, "products.csv"),
+                                  datasets.PRODUCT_HEADER, datasets.products(size))
+    movements = list(datasets.stock_movements(MOVEMENT_LINES, size))
+    conn = lambda: db.get_connection(app.DB_PATH)
+    exported = {}
+
+    def show_all():
+        categories = app.query("category_counts").fetchall()
+        return len(categories) + len(app.fetch_products_after(None, PAGE_SIZE))
+
+    def export_txt():
+        exported["txt"] = app.export_txt_file()
+        return size
+
+    def export_snapshot():
+        exported["snap"] = app.export_snapshot_file()
+        return size
+
+    return [
+        Op("import_from_csv", lambda: app.import_products_csv(csv_path).inserted,
+           prepare=lambda: reset_db(app)),
+        Op("show_all", show_all),
+        Op("filter_by_category", lambda: len(app.fetch_products_after(None, PAGE_SIZE, "Tools"))),
+        Op("last_page", lambda: len(app.fetch_products_before(None, PAGE_SIZE))),
+        Op("category_last_page", lambda: len(app.fetch_products_before(None, PAGE_SIZE, "Tools"))),
+        Op("search_product", lambda: sum(len(app.PRODUCT_SEARCH.search(conn(), q))
+                                         for q in ("drill", "smart lamp", "P0000042", "kit"))),
+        Op("low_stock_alert", lambda: len(app.stock_alerts())),
+        Op("adjust_stock_batch", lambda: app.adjust_stock(movements).lines),
+        Op("stock_at", lambda: sum(1 for product_id, _ in movements[:100]
+                                   if app.stock_at(product_id, "2999-12-31") is not None)),
+        Op("category_summary", lambda: len(app.query("category_summary").fetchall())),
+        Op("inventory_value", lambda: app.query("inventory_value").fetchone()[0] and 1),
+        Op("export_to_txt", export_txt),
+        Op("export_to_csv", lambda: app.export_csv_file() and size),
+        Op("export_snapshot", export_snapshot),
+        Op("export_changes", lambda: app.export_changes_file() and 100,
+           prepare=lambda: touch_rows(app, "products", "product_id")),
+        Op("import_from_txt", lambda: app.import_products_txt(exported["txt"]).inserted,
+           prepare=lambda: reset_db(app), expect=size),
+        Op("restore_snapshot", lambda: app.restore_snapshot(exported["snap"]).inserted,
+           prepare=lambda: reset_db(app), expect=size),
+    ]
+
+
+SUITES = {"employee": employee_ops, "inventory": inventory_ops}
+
+
+def measure(op):
+    if op.prepare:
+        op.prepare()
+    start = time.perf_counter()
+    rows = op.run()
+    seconds = time.perf_counter() - start
+
+    if op.prepare:
+        op.prepare()
+    tracemalloc.start()
+    op.run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rows, seconds, peak
+
+
+def run_suite(sizes, apps):
+    results = []
+    cwd = os.getcwd()
+    for size in sizes:
+        for name in apps:
+            with tempfile.TemporaryDirectory() as tmp:
+                os.chdir(tmp)  # keeps the relative exports/ directory (ExportStore) in tmp
+                try:
+                    app = load_app(name)
+                    app.DB_PATH = os.path.join(tmp, f"{name}.db")
+                    app.connect_db()
+                    for op in SUITES[name](app, size, tmp):
+                        rows, seconds, peak = measure(op)
+                        result = {"app": name, "op": op.name, "size": size, "rows": rows,
+                                  "seconds": round(seconds, 6),
+                                  "rows_per_sec": round(rows / seconds) if seconds else None,
+                                  "peak_kib": round(peak / 1024, 1)}
+                        if op.expect is not None and rows != op.expect:
+                            result["expected"] = op.expect
+                        results.append(result)
+                        print(f"{name:<10} {op.name:<20} {size:>9} {seconds * 1000:>11.2f} ms "
+                              f"{result['rows_per_sec'] or 0:>12} rows/s {result['peak_kib']:>11} KiB",
+                              flush=True)
+                        if "expected" in result:
+                            print(f"{'':<10} {op.name} returned {rows} rows, expected {op.expect}")
+                    db.close_connection(app.DB_PATH)
+                finally:
+                    os.chdir(cwd)
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform()}
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["app"], r["op"], r["size"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\nCompared with {baseline_path}:")
+    for r in results:
+        old = baseline.get((r["app"], r["op"], r["size"]))
+        if not old or not old["seconds"]:
+            continue
+        ratio = r["seconds"] / old["seconds"]
+        flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+        regressions += bool(flag)
+        print(f"{r['app']:<10} {r['op']:<20} {r['size']:>9} {ratio:>7.2f}x time{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark both apps without a display")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--apps", nargs="+", choices=sorted(SUITES), default=sorted(SUITES))
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", metavar="BASELINE_JSON")
+    args = parser.parse_args(argv)
+
+    print(f"{'app':<10} {'operation':<20} {'rows':>9} {'time':>14} {'throughput':>19} {'peak memory':>15}")
+    results = run_suite(args.sizes, args.apps)
+    with open(args.out, "w") as f:
+        json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    print(f"\nWrote {args.out}")
+    mismatched = [r for r in results if "expected" in r]
+    for r in mismatched:
+        print(f"{r['app']} {r['op']} at {r['size']} rows: {r['rows']} rows, expected {r['expected']}")
+    regressions = compare(results, args.compare) if args.compare else 0
+    return 1 if mismatched or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import csv
+import glob
+import gzip
+import os
+import re
+
+
+# ================== Change Log & Delta Exports ==================
+# Triggers record the key of every inserted, updated or deleted row in
+# <table>_changes. A delta export writes just those rows (their current
+# values, or a delete marker) and then trims the log, so routine exports
+# cost O(changes) instead of O(table). Every `checkpoint_every` deltas a
+# full checkpoint is written instead; restore() replays the newest
+# checkpoint plus the deltas after it.
+#
+# Files are named by the change sequence number they cover, so they sort
+# in replay order:
+#   <prefix>_checkpoint_<seq>.csv   full table as of seq
+#   <prefix>_delta_<seq>.csv        rows changed up to seq ("U"/"D" + row)
+# They are written through the app's ExportStore (see export_store), so a
+# file only gets its name once it is complete, and ".gz" is appended when
+# the store compresses.
+#
+# The newest sequence number doubles as a persistent change counter:
+# version() only ever grows, survives log trimming and restarts, and
+# export_state remembers the version each named export last covered, so
+# periodic jobs can skip exports when nothing changed.
+
+UPSERT = "U"
+DELETE = "D"
+
+
+class ChangeLog:
+    def __init__(self, table, key, columns, headers, prefix, checkpoint_every=12):
+        self.table = table
+        self.key = key
+        self.columns = columns
+        self.headers = headers
+        self.prefix = prefix
+        self.checkpoint_every = checkpoint_every
+        self.log_table = f"{table}_changes"
+
+    # ---------- Schema ----------
+    def install(self, conn):
+        t, k, log = self.table, self.key, self.log_table
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {log} (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                row_key TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS export_state (
+                name TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL DEFAULT 0,
+                deltas INTEGER NOT NULL DEFAULT 0
+            );
+            INSERT OR IGNORE INTO export_state (name, deltas) VALUES ('{t}', {self.checkpoint_every});
+
+            CREATE TRIGGER IF NOT EXISTS {t}_log_insert AFTER INSERT ON {t}
+            BEGIN
+                INSERT INTO {log} (row_key) VALUES (NEW.{k});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {t}_log_update AFTER UPDATE ON {t}
+            BEGIN
+                INSERT INTO {log} (row_key) SELECT OLD.{k} WHERE OLD.{k} IS NOT NEW.{k};
+                INSERT INTO {log} (row_key) VALUES (NEW.{k});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {t}_log_delete AFTER DELETE ON {t}
+            BEGIN
+                INSERT INTO {log} (row_key) VALUES (OLD.{k});
+            END;
+        """)
+
+    # ---------- Export ----------
+    def export(self, conn, store):
+        # Delta export, or a checkpoint when one is due, into the directory
+        # of ExportStore `store`. Returns the file written, or None when
+        # nothing changed since the last export.
+        exported, deltas = conn.execute(
+            "SELECT seq, deltas FROM export_state WHERE name=?", (self.table,)).fetchone()
+        if deltas >= self.checkpoint_every:
+            if self.version(conn) <= exported and self._files("checkpoint", store.directory):
+                return None     # due, but nothing changed since the last one
+            return self.export_checkpoint(conn, store)
+        return self.export_delta(conn, store, exported, deltas)
+
+    def export_delta(self, conn, store, exported, deltas):
+        cols = ", ".join(f"t.{c}" for c in self.columns)
+        # One read transaction so the rows match the sequence number
+        conn.execute("BEGIN")
+        try:
+            seq = conn.execute(f"SELECT MAX(seq) FROM {self.log_table}").fetchone()[0]
+            if seq is None or seq <= exported:
+                return None
+            cur = conn.execute(f"""
+                SELECT c.row_key, t.{self.key} IS NULL, {cols}
+                FROM (SELECT DISTINCT row_key FROM {self.log_table} WHERE seq > ? AND seq <= ?) c
+                LEFT JOIN {self.table} t ON t.{self.key} = c.row_key
+            """, (exported, seq))
+            filename = self._path("delta", seq, store)
+            with store.write(filename, newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Op"] + self.headers)
+                for key, deleted, *row in cur:
+                    if deleted:
+                        writer.writerow([DELETE, key] + [""] * (len(row) - 1))
+                    else:
+                        writer.writerow([UPSERT] + row)
+        finally:
+            conn.commit()
+        self._mark_exported(conn, seq, deltas + 1)
+        return filename
+
+    def export_checkpoint(self, conn, store):
+        conn.execute("BEGIN")
+        try:
+            seq = conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {self.log_table}").fetchone()[0]
+            seq = max(seq, conn.execute("SELECT seq FROM export_state WHERE name=?",
+                                        (self.table,)).fetchone()[0])
+            cur = conn.execute(f"SELECT {', '.join(self.columns)} FROM {self.table}")
+            filename = self._path("checkpoint", seq, store)
+            with store.write(filename, newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(self.headers)
+                writer.writerows(cur)
+        finally:
+            conn.commit()
+        self._mark_exported(conn, seq, 0)
+        return filename
+
+    def _mark_exported(self, conn, seq, deltas):
+        # The log is only needed for the next delta, so trim what is covered
+        with conn:
+            conn.execute("UPDATE export_state SET seq=?, deltas=? WHERE name=?",
+                         (seq, deltas, self.table))
+            conn.execute(f"DELETE FROM {self.log_table} WHERE seq <= ?", (seq,))
+
+    # ---------- Change detection ----------
+    def version(self, conn):
+        # Sequence number of the newest change ever logged (0 if none)
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (self.log_table,)).fetchone()
+        return row[0] if row else 0
+
+    def changed_since_export(self, conn, name=None):
+        # True if rows changed after the export `name` (default: the delta
+        # exports) last ran, or if it never ran
+        row = conn.execute("SELECT seq FROM export_state WHERE name=?",
+                           (name or self.table,)).fetchone()
+        return row is None or self.version(conn) > row[0]
+
+    def mark_exported(self, conn, name, version):
+        # Record that export `name` covers the table as of `version`
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO export_state (name, seq, deltas) VALUES (?, ?, 0)",
+                         (name, version))
+
+    # ---------- Restore ----------
+    def restore(self, conn, directory="."):
+        # Rebuild the table from the newest checkpoint plus later deltas.
+        # Returns the sequence number restored to.
+        checkpoints = self._files("checkpoint", directory)
+        if not checkpoints:
+            raise FileNotFoundError(f"No {self.prefix} checkpoint in {directory}")
+        base_seq, base = checkpoints[-1]
+        marks = ", ".join("?" * len(self.columns))
+        with conn:
+            conn.execute(f"DELETE FROM {self.table}")
+            with _open(base) as f:
+                reader = csv.reader(f)
+                next(reader)
+                conn.executemany(f"INSERT INTO {self.table} VALUES ({marks})", reader)
+            restored = base_seq
+            for seq, path in self._files("delta", directory):
+                if seq <= base_seq:
+                    continue
+                restored = seq
+                with _open(path) as f:
+                    reader = csv.reader(f)
+                    next(reader)
+                    for op, *row in reader:
+                        if op == DELETE:
+                            conn.execute(f"DELETE FROM {self.table} WHERE {self.key}=?", (row[0],))
+                        else:
+                            conn.execute(f"INSERT OR REPLACE INTO {self.table} VALUES ({marks})", row)
+            # The replay itself is not a change: continue numbering after the
+            # restored files and start the next export with a checkpoint
+            conn.execute(f"DELETE FROM {self.log_table}")
+            conn.execute("DELETE FROM sqlite_sequence WHERE name=?", (self.log_table,))
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (self.log_table, restored))
+            conn.execute("UPDATE export_state SET seq=?, deltas=? WHERE name=?",
+                         (restored, self.checkpoint_every, self.table))
+        return restored
+
+    # ---------- Retention ----------
+    def prune(self, directory=".", keep_checkpoints=2):
+        # Delete all but the newest `keep_checkpoints` checkpoints and the
+        # deltas that only lead up to the ones deleted. Returns the paths
+        # removed.
+        keep = max(keep_checkpoints, 1)
+        checkpoints = self._files("checkpoint", directory)
+        if len(checkpoints) <= keep:
+            return []
+        oldest_kept = checkpoints[-keep][0]
+        doomed = [path for seq, path in checkpoints[:-keep]]
+        doomed += [path for seq, path in self._files("delta", directory) if seq <= oldest_kept]
+        for path in doomed:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return doomed
+
+    # ---------- Files ----------
+    def _path(self, kind, seq, store):
+        suffix = ".gz" if store.compress else ""
+        return os.path.join(store.directory, f"{self.prefix}_{kind}_{seq:010d}.csv{suffix}")
+
+    def _files(self, kind, directory):
+        # [(seq, path)] in sequence order
+        pattern = re.compile(rf"{re.escape(self.prefix)}_{kind}_(\d+)\.csv(\.gz)?$")
+        found = []
+        for path in glob.glob(os.path.join(directory, f"{self.prefix}_{kind}_*.csv*")):
+            match = pattern.search(path)
+            if match:
+                found.append((int(match.group(1)), path))
+        return sorted(found)
+
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="")
+    return open(path, newline="")
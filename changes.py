@@ -0,0 +1,68 @@
+from collections import namedtuple
+
+# ================== Change Propagation ==================
+# Handlers publish one Change per row they touch; views subscribe and patch
+# just that row instead of re-reading the table.
+#
+#   op   "insert", "update", "delete", or "reload" after bulk changes
+#   key  primary key of the affected row (None for "reload")
+#   row  the row as it is now (None for deletes)
+#   old  the row as it was before (None for inserts)
+
+Change = namedtuple("Change", "op key row old")
+
+
+class ChangeBus:
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def publish(self, op, key=None, row=None, old=None):
+        change = Change(op, key, row, old)
+        for callback in list(self._subscribers):
+            callback(change)
+
+
+class CountIndex:
+    # Multiset of one column's non-empty values, kept current from Change
+    # events so distinct-value lists (e.g. the category dropdown) never need
+    # a table scan after a single-row edit.
+    def __init__(self, column):
+        self.column = column
+        self.counts = {}
+
+    def reset(self, counts):
+        self.counts = {value: n for value, n in counts if value}
+
+    def values(self):
+        return sorted(self.counts)
+
+    def apply(self, change):
+        # Returns True when a value appeared or disappeared
+        changed = False
+        if change.old is not None:
+            changed |= self._remove(change.old[self.column])
+        if change.row is not None:
+            changed |= self._add(change.row[self.column])
+        return changed
+
+    def _add(self, value):
+        if not value:
+            return False
+        self.counts[value] = self.counts.get(value, 0) + 1
+        return self.counts[value] == 1
+
+    def _remove(self, value):
+        if not value or value not in self.counts:
+            return False
+        self.counts[value] -= 1
+        if self.counts[value] == 0:
+            del self.counts[value]
+            return True
+        return False
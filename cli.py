@@ -0,0 +1,359 @@
+import argparse
+import csv
+import functools
+import importlib
+import os
+import sqlite3
+import sys
+
+# ================== Command Line ==================
+# Headless access to both apps for cron jobs and batch pipelines. Only the
+# chosen domain's core module is imported (never tkinter), so start-up is
+# quick and no display is needed. Runs in separate processes can share a
+# database: it is in WAL mode with a busy timeout.
+#
+#   python cli.py employee import staff.csv
+#   python cli.py --db /data/inventory.db inventory export csv changes
+#   python cli.py --export-dir /srv/exports --keep 10 --gzip employee export csv
+#   python cli.py inventory latest csv
+#   python cli.py employee export --if-changed csv      (cron: no-op if unchanged)
+#   python cli.py inventory stock P001 40
+#   python cli.py inventory adjust --file receipt.csv --no-negative
+#   python cli.py inventory stock-at P001 2024-03-31
+#   python cli.py inventory reorder-point category Tools 20
+#   python cli.py inventory low-stock > reorder.csv
+#   python cli.py --header employee salaries
+#
+# Rows are written to stdout as CSV; messages go to stderr. Exit status is
+# 1 when a command fails (duplicate or unknown ID, unreadable file).
+
+DOMAINS = {
+    "employee": {
+        "module": "employee_core", "noun": "employees",
+        "fields": ("emp_id", "name", "department", "email", "salary"),
+        "add": "add_employee", "update": "update_employee", "delete": "delete_employee",
+        "get": "fetch_employee", "page": "fetch_employees_after", "search": "search_employees",
+        "import_csv": "import_employees_csv", "import_txt": "import_employees_txt",
+        "convert": "convert_employee_row",
+    },
+    "inventory": {
+        "module": "inventory_core", "noun": "products",
+        "fields": ("product_id", "name", "category", "price", "stock"),
+        "add": "add_product", "update": "update_product", "delete": "delete_product",
+        "get": "fetch_product", "page": "fetch_products_after", "search": "search_products",
+        "import_csv": "import_products_csv", "import_txt": "import_products_txt",
+        "convert": "convert_product_row",
+    },
+}
+
+class CommandError(Exception):
+    pass
+
+
+def write_rows(rows, header=None):
+    writer = csv.writer(sys.stdout)
+    if header:
+        writer.writerow(header)
+    writer.writerows(rows)
+
+
+# ================== Commands ==================
+# Each takes (core, domain, args)
+def cmd_list(core, domain, args):
+    page = getattr(core, domain["page"])
+    if getattr(args, "category", None) is not None:
+        page = functools.partial(page, category=args.category)
+    if args.header:
+        write_rows([core.HEADERS])
+    key, left = args.after, args.limit
+    while left is None or left > 0:
+        rows = page(key, min(left or 1000, 1000))
+        if not rows:
+            break
+        write_rows(rows)
+        key = rows[-1][0]
+        left = None if left is None else left - len(rows)
+
+
+def cmd_get(core, domain, args):
+    row = getattr(core, domain["get"])(args.id)
+    if row is None:
+        raise CommandError(f"{args.id}: not found")
+    write_rows([row], core.HEADERS if args.header else None)
+
+
+def cmd_search(core, domain, args):
+    write_rows(getattr(core, domain["search"])(args.text), core.HEADERS if args.header else None)
+
+
+def parse_row(core, domain, values):
+    try:
+        return getattr(core, domain["convert"])(values)
+    except (ValueError, IndexError) as e:
+        raise CommandError(f"invalid values: {e}")
+
+
+def field_values(domain, args):
+    # The record's fields, one positional argument each, in column order
+    return [getattr(args, field) for field in domain["fields"]]
+
+
+def cmd_add(core, domain, args):
+    values = field_values(domain, args)
+    try:
+        getattr(core, domain["add"])(parse_row(core, domain, values))
+    except sqlite3.IntegrityError:
+        raise CommandError(f"{values[0]}: ID already exists")
+
+
+def cmd_update(core, domain, args):
+    values = field_values(domain, args)
+    if getattr(core, domain["update"])(parse_row(core, domain, values)) is None:
+        raise CommandError(f"{values[0]}: not found")
+
+
+def cmd_delete(core, domain, args):
+    missing = [key for key in args.ids if getattr(core, domain["delete"])(key) is None]
+    if missing:
+        raise CommandError(f"not found: {', '.join(missing)}")
+
+
+def cmd_import(core, domain, args):
+    name = args.file.lower().removesuffix(".gz")
+    kind = "import_txt" if name.endswith(".txt") else "import_csv"
+    stats = getattr(core, domain[kind])(args.file)
+    print(stats.summary(domain["noun"]), file=sys.stderr)
+
+
+def cmd_restore_snapshot(core, domain, args):
+    try:
+        stats = core.restore_snapshot(args.file)
+    except ValueError as e:
+        raise CommandError(str(e))
+    print(f"Restored {stats.inserted} {domain['noun']} from {args.file}.", file=sys.stderr)
+
+
+def cmd_export(core, domain, args):
+    for kind in args.kinds:
+        if args.if_changed:
+            filename = core.export_if_changed(kind)
+        else:
+            filename = core.EXPORTERS[kind]()
+        print(filename or f"{kind}: no changes to export", file=sys.stderr)
+
+
+def cmd_latest(core, domain, args):
+    path = core.EXPORTS.latest(args.kind)
+    if path is None:
+        raise CommandError(f"no {args.kind} export in {core.EXPORTS.directory}")
+    print(path)
+
+
+def cmd_stats(core, domain, args):
+    if domain["module"] == "employee_core":
+        write_rows(core.department_summary(), ["Department", "Employees", "Total Salary"])
+        count, total, average = core.salary_totals()
+        print(f"Total Employees: {count}\nTotal Salary: {total:.2f}\n"
+              f"Average Salary: {average:.2f}", file=sys.stderr)
+    else:
+        write_rows(core.category_summary(), ["Category", "Products", "Total Stock"])
+        print(f"Total Inventory Value: {core.inventory_value():.2f}", file=sys.stderr)
+
+
+def cmd_salaries(core, domain, args):
+    # Per-department salary statistics, then the same over all employees
+    rows = [("(all)" if department is None else department, count, *(round(v, 2) for v in values))
+            for department, count, *values in core.salary_statistics()]
+    write_rows(rows, core.SALARY_HEADERS if args.header else None)
+
+
+def cmd_stock(core, domain, args):
+    if core.set_stock(args.id, args.stock) is None:
+        raise CommandError(f"{args.id}: not found")
+
+
+def cmd_stock_at(core, domain, args):
+    if core.fetch_product(args.id) is None and not core.stock_movements(args.id, 1):
+        raise CommandError(f"{args.id}: not found")
+    print(core.stock_at(args.id, args.when))
+
+
+def cmd_history(core, domain, args):
+    write_rows(core.stock_movements(args.id, args.limit), ["No.", "At", "Quantity"] if args.header else None)
+
+
+def cmd_check_totals(core, domain, args):
+    mismatches = core.check_totals(repair=args.repair)
+    write_rows(mismatches, ["Group", "Column", "Stored", "Recomputed"] if args.header else None)
+    if mismatches and not args.repair:
+        raise CommandError(f"{len(mismatches)} stored totals differ from a full recompute")
+
+
+def cmd_adjust(core, domain, args):
+    pairs = args.movements
+    if bool(args.file) == bool(pairs) or len(pairs) % 2:
+        raise CommandError("adjust takes --file or ID QUANTITY pairs")
+    try:
+        if args.file:
+            stats = core.adjust_stock_csv(args.file, args.no_negative)
+        else:
+            stats = core.adjust_stock(zip(pairs[::2], pairs[1::2]), args.no_negative)
+    except ValueError as e:     # bad quantity, unknown product, negative stock
+        raise CommandError(str(e))
+    print(stats.summary(domain["noun"]), file=sys.stderr)
+
+
+def cmd_low_stock(core, domain, args):
+    # Products below their reorder point, or below an ad hoc --threshold
+    if args.threshold is not None:
+        write_rows(core.low_stock_products(args.threshold), core.HEADERS if args.header else None)
+        return
+    rows = [(*row, threshold) for _, threshold, _, *row in core.stock_alerts()]
+    write_rows(rows, core.HEADERS + ["Reorder Point"] if args.header else None)
+
+
+def cmd_reorder_point(core, domain, args):
+    # default N | product ID [N] | category NAME [N]; no N removes the point
+    values = list(args.values)
+    key = "" if args.scope == "default" else values.pop(0) if values else None
+    if key is None or len(values) > 1 or (args.scope == "default" and not values):
+        raise CommandError("usage: reorder-point default N | product ID [N] | category NAME [N]")
+    try:
+        threshold = int(values[0]) if values else None
+    except ValueError:
+        raise CommandError(f"invalid reorder point: {values[0]}")
+    core.set_reorder_point(args.scope, key, threshold)
+
+
+def cmd_reorder_points(core, domain, args):
+    write_rows(core.reorder_points(), ["Scope", "Key", "Reorder Point"] if args.header else None)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Manage employees and inventory without the GUI")
+    parser.add_argument("--db", help="database file (default: the app's own)")
+    parser.add_argument("--header", action="store_true", help="print a CSV header row")
+    parser.add_argument("--export-dir", help="directory for export files (default: exports)")
+    parser.add_argument("--keep", type=int, help="exports of each kind to keep")
+    parser.add_argument("--max-age-days", type=float, help="delete exports older than this")
+    parser.add_argument("--gzip", action="store_true", help="compress CSV/TXT exports")
+    domains = parser.add_subparsers(dest="domain", required=True)
+
+    for name, domain in DOMAINS.items():
+        commands = domains.add_parser(name).add_subparsers(dest="command", required=True)
+
+        p = commands.add_parser("list", help="all records in ID order")
+        p.add_argument("--after", help="start after this ID")
+        p.add_argument("--limit", type=int)
+        if name == "inventory":
+            p.add_argument("--category", help="only products in this category")
+        p.set_defaults(func=cmd_list)
+
+        p = commands.add_parser("get", help="one record by ID")
+        p.add_argument("id")
+        p.set_defaults(func=cmd_get)
+
+        p = commands.add_parser("search", help="ranked prefix search")
+        p.add_argument("text")
+        p.set_defaults(func=cmd_search)
+
+        for command, func in (("add", cmd_add), ("update", cmd_update)):
+            p = commands.add_parser(command, help=f"{command} one record")
+            for field in domain["fields"]:
+                p.add_argument(field)
+            p.set_defaults(func=func)
+
+        p = commands.add_parser("delete", help="delete records by ID")
+        p.add_argument("ids", nargs="+")
+        p.set_defaults(func=cmd_delete)
+
+        p = commands.add_parser("import", help="import a CSV export or TXT report")
+        p.add_argument("file")
+        p.set_defaults(func=cmd_import)
+
+        p = commands.add_parser("export", help="write export files to the export directory")
+        p.add_argument("kinds", nargs="+", choices=("changes", "csv", "txt", "snap"))
+        p.add_argument("--if-changed", action="store_true",
+                       help="skip kinds whose last export is still up to date")
+        p.set_defaults(func=cmd_export)
+
+        p = commands.add_parser("latest", help="path of the newest export of a kind")
+        p.add_argument("kind", choices=("csv", "txt", "snap"))
+        p.set_defaults(func=cmd_latest)
+
+        p = commands.add_parser("restore-snapshot", help="replace all records with a binary snapshot")
+        p.add_argument("file")
+        p.set_defaults(func=cmd_restore_snapshot)
+
+        p = commands.add_parser("stats", help="summary statistics")
+        p.set_defaults(func=cmd_stats)
+
+        p = commands.add_parser("check-totals", help="compare stored totals with a recompute")
+        p.add_argument("--repair", action="store_true", help="rebuild them if they differ")
+        p.set_defaults(func=cmd_check_totals)
+
+        if name == "employee":
+            p = commands.add_parser("salaries", help="salary statistics per department")
+            p.set_defaults(func=cmd_salaries)
+
+        if name == "inventory":
+            p = commands.add_parser("stock", help="set the stock of one product")
+            p.add_argument("id")
+            p.add_argument("stock", type=int)
+            p.set_defaults(func=cmd_stock)
+
+            p = commands.add_parser("adjust", help="add or remove stock for many products at once")
+            p.add_argument("movements", nargs="*", metavar="ID QUANTITY")
+            p.add_argument("--file", help="CSV of Product ID,Quantity lines")
+            p.add_argument("--no-negative", action="store_true",
+                           help="reject the batch if any stock would go below zero")
+            p.set_defaults(func=cmd_adjust)
+
+            p = commands.add_parser("stock-at", help="stock of a product at a past date or time")
+            p.add_argument("id")
+            p.add_argument("when", help="UTC 'YYYY-MM-DD[ HH:MM:SS]'; a date means its end")
+            p.set_defaults(func=cmd_stock_at)
+
+            p = commands.add_parser("history", help="latest stock movements of a product")
+            p.add_argument("id")
+            p.add_argument("--limit", type=int, default=50)
+            p.set_defaults(func=cmd_history)
+
+            p = commands.add_parser("low-stock", help="products below their reorder point")
+            p.add_argument("--threshold", type=int, help="use this threshold for every product")
+            p.set_defaults(func=cmd_low_stock)
+
+            p = commands.add_parser("reorder-point", help="set or remove a reorder point")
+            p.add_argument("scope", choices=("product", "category", "default"))
+            p.add_argument("values", nargs="*", metavar="KEY/N")
+            p.set_defaults(func=cmd_reorder_point)
+
+            p = commands.add_parser("reorder-points", help="list reorder points")
+            p.set_defaults(func=cmd_reorder_points)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    domain = DOMAINS[args.domain]
+    core = importlib.import_module(domain["module"])
+    if args.db:
+        core.DB_PATH = os.path.abspath(args.db)
+    if args.export_dir:
+        core.EXPORTS.directory = args.export_dir
+    if args.keep is not None:
+        core.EXPORTS.keep = args.keep
+    if args.max_age_days is not None:
+        core.EXPORTS.max_age_days = args.max_age_days
+    core.EXPORTS.compress = core.EXPORTS.compress or args.gzip
+    try:
+        core.connect_db()
+        args.func(core, domain, args)
+    except (CommandError, sqlite3.Error, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import functools
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from profiler import PROFILER, SQL
+
+# ================== Shared Data Access ==================
+# One configured connection per (thread, database file). sqlite3 connections
+# may not be shared between threads, so every thread gets its own and keeps it
+# for its whole lifetime instead of reconnecting in each handler.
+#
+# Several processes (app instances, the CLI) may share a database file: it
+# runs in WAL mode so readers never block the writer, a writer waits up to
+# BUSY_TIMEOUT for the lock, write transactions take the lock up front
+# (BEGIN IMMEDIATE) and @retrying re-runs a whole write operation with
+# backoff when the lock still could not be had.
+#
+# Statements and fetches count as the "sql" phase of the running profiled
+# operation (see profiler.py); iterating a cursor row by row is not timed,
+# so large results are streamed with batches(), one timed fetch per batch.
+
+STATEMENT_CACHE_SIZE = 256      # prepared statements kept per connection
+CACHE_SIZE_KIB = 16384          # page cache per connection (16 MB)
+BUSY_TIMEOUT = 5.0              # seconds to wait on a locked database
+RETRY_ATTEMPTS = 5              # tries of a @retrying operation
+RETRY_DELAY = 0.05              # first backoff in seconds, doubled each retry
+FETCH_BATCH = 1000              # rows per fetchmany() when streaming a result
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KIB}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA recursive_triggers=ON",   # REPLACE deletes fire DELETE triggers
+)
+
+_local = threading.local()
+
+
+class Cursor(sqlite3.Cursor):
+    def execute(self, *args):
+        with PROFILER.phase(SQL):
+            return super().execute(*args)
+
+    def executemany(self, *args):
+        with PROFILER.phase(SQL):
+            return super().executemany(*args)
+
+    def fetchone(self):
+        with PROFILER.phase(SQL):
+            return super().fetchone()
+
+    def fetchmany(self, *args):
+        with PROFILER.phase(SQL):
+            return super().fetchmany(*args)
+
+    def fetchall(self):
+        with PROFILER.phase(SQL):
+            return super().fetchall()
+
+
+class Connection(sqlite3.Connection):
+    # Outside a profiled operation statements get a plain cursor, so the
+    # CLI and benchmarks only pay for one thread-local lookup
+    def execute(self, *args):
+        if PROFILER.active():
+            return self.cursor(Cursor).execute(*args)
+        return super().execute(*args)
+
+    def executemany(self, *args):
+        if PROFILER.active():
+            return self.cursor(Cursor).executemany(*args)
+        return super().executemany(*args)
+
+    def executescript(self, script):
+        with PROFILER.phase(SQL):
+            return super().executescript(script)
+
+    def commit(self):
+        with PROFILER.phase(SQL):
+            super().commit()
+
+    def rollback(self):
+        with PROFILER.phase(SQL):
+            super().rollback()
+
+
+def _connections():
+    conns = getattr(_local, "connections", None)
+    if conns is None:
+        conns = _local.connections = {}
+    return conns
+
+
+def open_connection(path):
+    # A freshly configured connection that is not registered with the
+    # per-thread cache (one-off tools, benchmarks, child processes)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, factory=Connection,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(path):
+    conns = _connections()
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = open_connection(path)
+    return conn
+
+
+def close_connection(path=None):
+    # Close this thread's connection to `path`, or all of them
+    conns = _connections()
+    paths = [path] if path is not None else list(conns)
+    for p in paths:
+        conn = conns.pop(p, None)
+        if conn is not None:
+            conn.close()
+
+
+@contextmanager
+def transaction(path):
+    # Commit on success, roll back on any exception. The write lock is
+    # taken at the start, so what the block reads cannot change before it
+    # writes, and waiting for the lock goes through the busy timeout
+    # (a read transaction upgraded to a write one would fail at once).
+    # The whole block, commit included, counts as sql time.
+    conn = get_connection(path)
+    with PROFILER.phase(SQL), conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
+
+
+def is_busy(error):
+    return isinstance(error, sqlite3.OperationalError) and (
+        "locked" in str(error) or "busy" in str(error))
+
+
+def retrying(func):
+    # Re-run `func` (a whole write operation, which rolled back) when the
+    # database stayed locked, with jittered exponential backoff
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = RETRY_DELAY
+        for attempt in range(1, RETRY_ATTEMPTS + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_busy(e) or attempt == RETRY_ATTEMPTS:
+                    raise
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay *= 2
+    return wrapper
+
+
+def batches(cur, size=FETCH_BATCH):
+    # The rows of `cur` as lists of at most `size`, fetched as they are
+    # consumed: memory stays flat however large the result is
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield rows
@@ -0,0 +1,325 @@
+import csv
+import math
+from datetime import datetime
+
+import db
+import snapshot
+from aggregates import GroupAggregate
+from changelog import ChangeLog
+from export_store import ExportStore
+from importer import import_csv, import_txt
+from quantiles import GroupQuantiles
+from search import SearchIndex
+from txt_report import MONEY, TEXT, FixedWidthLayout
+from versions import RowVersions
+
+# ================== Employee Core ==================
+# Everything the employee app does to its data, without any UI: schema,
+# CRUD, search, statistics, import and export. Used by the Tk app, the
+# command line (cli.py), the benchmarks and the query plan check, so it
+# must never import tkinter.
+
+DB_PATH = "employees.db"
+
+HEADERS = ["Employee ID", "Name", "Department", "Email", "Salary"]
+
+# Delta exports: only rows changed since the last export, plus periodic
+# full checkpoints to restore from
+CHANGE_LOG = ChangeLog("employee", "emp_id", ("emp_id", "name", "department", "email", "salary"),
+                       HEADERS, prefix="employee")
+
+# Export files go to their own directory; old ones are pruned by count and
+# age, and the newest checkpoints (with their deltas) are kept for restore
+EXPORTS = ExportStore("exports", "employee", keep=50, max_age_days=30)
+KEEP_CHECKPOINTS = 2
+
+# Column types of binary snapshots (see snapshot.py)
+SNAPSHOT_COLUMNS = [("emp_id", snapshot.TEXT), ("name", snapshot.TEXT), ("department", snapshot.TEXT),
+                    ("email", snapshot.TEXT), ("salary", snapshot.REAL)]
+
+# Ranked prefix search over the text columns, kept in sync by triggers
+EMPLOYEE_SEARCH = SearchIndex("employee", "emp_id", ("emp_id", "name", "department", "email"))
+
+# Per-row version numbers for optimistic updates from several instances
+EMPLOYEE_VERSIONS = RowVersions("employee", "emp_id")
+
+# Per-department headcount, salary sum and sum of squares (for the standard
+# deviation), and a quantile sketch of salaries (for median and
+# percentiles), all kept up to date by triggers
+SALARY_TOTALS = GroupAggregate("employee", "department",
+                               {"salary": "{row}.salary", "salary_squares": "{row}.salary * {row}.salary"})
+SALARY_QUANTILES = GroupQuantiles("employee", "department", "salary")
+
+# One row per department or salary bucket: scanning these is cheap, not a
+# full table scan
+SUMMARY_TABLES = (SALARY_TOTALS.agg_table, SALARY_QUANTILES.sketch_table)
+
+# ================== Database Setup ==================
+def connect_db():
+    with db.transaction(DB_PATH) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS employee (
+                emp_id TEXT PRIMARY KEY,
+                name TEXT,
+                department TEXT,
+                email TEXT,
+                salary REAL
+            )
+        """)
+        # Secondary index for department lookups
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_employee_department ON employee(department, emp_id)")
+        CHANGE_LOG.install(conn)
+        EMPLOYEE_SEARCH.install(conn)
+        EMPLOYEE_VERSIONS.install(conn)
+        SALARY_TOTALS.install(conn)
+        SALARY_QUANTILES.install(conn)
+
+# Lookup queries. query_plans.py checks that none of them falls back to a
+# full table scan; add new app queries here.
+QUERIES = {
+    "first_page": "SELECT * FROM employee ORDER BY emp_id LIMIT ?",
+    "next_page": "SELECT * FROM employee WHERE emp_id > ? ORDER BY emp_id LIMIT ?",
+    "previous_page": "SELECT * FROM employee WHERE emp_id < ? ORDER BY emp_id DESC LIMIT ?",
+    "last_page": "SELECT * FROM employee ORDER BY emp_id DESC LIMIT ?",
+    "by_id": "SELECT * FROM employee WHERE emp_id=?",
+    "by_id_versioned": """SELECT e.*, v.version FROM employee e
+                          LEFT JOIN employee_versions v ON v.key = e.emp_id
+                          WHERE e.emp_id=?""",
+    "by_department": "SELECT * FROM employee WHERE department = ? ORDER BY emp_id",
+    "department_summary": """SELECT department, row_count, salary FROM employee_by_department
+                             ORDER BY department""",
+    "salary_totals": """SELECT department, row_count, salary, salary_squares
+                        FROM employee_by_department ORDER BY department""",
+}
+
+def query(name, *params):
+    return db.get_connection(DB_PATH).execute(QUERIES[name], params)
+
+# Keyset pages over the primary key for the record grid: the `limit` rows
+# after (ascending) or before (descending) a key, or from either end when
+# the key is None. Any page costs one index seek, however deep it is.
+def fetch_employees_after(emp_id, limit):
+    if emp_id is None:
+        return query("first_page", limit).fetchall()
+    return query("next_page", emp_id, limit).fetchall()
+
+def fetch_employees_before(emp_id, limit):
+    if emp_id is None:
+        return query("last_page", limit).fetchall()
+    return query("previous_page", emp_id, limit).fetchall()
+
+def fetch_employee(emp_id):
+    return query("by_id", emp_id).fetchone()
+
+def fetch_employee_version(emp_id):
+    # (row, version) read together, or (None, None); pass the version back
+    # to update_employee() to detect concurrent changes
+    row = query("by_id_versioned", emp_id).fetchone()
+    return (row[:-1], row[-1]) if row else (None, None)
+
+def format_employee(row):
+    return (row[0], row[1], row[2], row[3], f"${row[4]:.2f}")
+
+# ================== CRUD ==================
+# Each runs in its own transaction and is retried if the database stays
+# locked by another instance. add_employee() raises sqlite3.IntegrityError
+# for a duplicate ID; update and delete return the row as it was before
+# (None when the ID does not exist). Given the `version` the caller read,
+# update_employee() raises StaleRowError instead of overwriting a change
+# made since.
+@db.retrying
+def add_employee(row):
+    with db.transaction(DB_PATH) as conn:
+        conn.execute("INSERT INTO employee VALUES (?, ?, ?, ?, ?)", row)
+
+@db.retrying
+def update_employee(row, version=None):
+    with db.transaction(DB_PATH) as conn:
+        old = fetch_employee(row[0])
+        EMPLOYEE_VERSIONS.check(conn, row[0], version)
+        conn.execute("""UPDATE employee SET name=?, department=?, email=?, salary=? WHERE emp_id=?""",
+                     (*row[1:], row[0]))
+    return old
+
+@db.retrying
+def delete_employee(emp_id):
+    with db.transaction(DB_PATH) as conn:
+        old = fetch_employee(emp_id)
+        conn.execute("DELETE FROM employee WHERE emp_id=?", (emp_id,))
+    return old
+
+def search_employees(text):
+    return EMPLOYEE_SEARCH.search(db.get_connection(DB_PATH), text)
+
+# ================== Statistics ==================
+# Read from SALARY_TOTALS and SALARY_QUANTILES: O(departments) rows however
+# many employees there are. Medians and percentiles are interpolated like
+# statistics.quantiles(method="inclusive") and within 1% of its result.
+SALARY_HEADERS = ["Department", "Employees", "Total Salary", "Average", "Std Dev",
+                  "Median", "P90"]
+
+def department_summary():
+    # [(department, employees, total salary)]
+    return query("department_summary").fetchall()
+
+def salary_totals():
+    # (employees, total salary, average salary), summed over departments
+    rows = department_summary()
+    count = sum(row[1] for row in rows)
+    total = sum(row[2] for row in rows)
+    return count, total, total / count if count else 0
+
+def _salary_row(department, count, total, squares, sketch):
+    mean = total / count if count else 0
+    # Sample variance from the sums; rounding can take it just below 0
+    variance = (squares - total * mean) / (count - 1) if count > 1 else 0
+    median, p90 = sketch.quantiles((0.5, 0.9))
+    return (department, count, total, mean, math.sqrt(max(variance, 0)), median or 0, p90 or 0)
+
+def salary_statistics():
+    # [(department, employees, total, average, std dev, median, p90)] per
+    # department, then the same for all employees under department None
+    conn = db.get_connection(DB_PATH)
+    # One read transaction so the sums and the sketches match
+    conn.execute("BEGIN")
+    try:
+        rows = query("salary_totals").fetchall()
+        sketches = SALARY_QUANTILES.sketches(conn)
+    finally:
+        conn.commit()
+    stats, overall = [], SALARY_QUANTILES.empty()
+    for department, count, total, squares in rows:
+        sketch = sketches.get(department) or SALARY_QUANTILES.empty()
+        stats.append(_salary_row(department, count, total, squares, sketch))
+        overall.merge(sketch)
+    stats.append(_salary_row(None, sum(r[1] for r in rows), sum(r[2] for r in rows),
+                             sum(r[3] for r in rows), overall))
+    return stats
+
+def check_totals(repair=False):
+    # Compare the department totals and salary sketches with a full
+    # recompute; returns the mismatches found and, with repair=True,
+    # rebuilds both
+    with db.transaction(DB_PATH) as conn:
+        mismatches = SALARY_TOTALS.check(conn) + SALARY_QUANTILES.check(conn)
+        if mismatches and repair:
+            SALARY_TOTALS.rebuild(conn)
+            SALARY_QUANTILES.rebuild(conn)
+    return mismatches
+
+# ================== Import Files ==================
+# Tk-free so they can run on a background thread
+def convert_employee_row(row):
+    if not row[0]:
+        raise ValueError("missing employee ID")
+    return (row[0], row[1], row[2], row[3], float(row[4]) if row[4] else 0.0)
+
+def import_employees_csv(filename, progress=None, cancelled=None):
+    return import_csv(db.get_connection(DB_PATH), filename,
+                      "employee",
+                      convert_employee_row, progress=progress, cancelled=cancelled)
+
+# Column layout written by export_txt_file()
+TXT_LAYOUT = FixedWidthLayout([(10, TEXT), (20, TEXT), (15, TEXT), (25, TEXT), (9, MONEY)])
+# Longest value of each column, for TXT_LAYOUT.fit()
+TXT_LONGEST = """SELECT MAX(LENGTH(emp_id)), MAX(LENGTH(name)), MAX(LENGTH(department)),
+                        MAX(LENGTH(email)), MAX(LENGTH(printf('%.2f', salary))) FROM employee"""
+
+def import_employees_txt(filename, progress=None, cancelled=None):
+    return import_txt(db.get_connection(DB_PATH), filename, TXT_LAYOUT,
+                      "employee",
+                      convert_employee_row, progress=progress, cancelled=cancelled)
+
+# ================== Export Files ==================
+# Tk-free so they can run on the export worker thread
+def export_changes_file():
+    filename = CHANGE_LOG.export(db.get_connection(DB_PATH), EXPORTS)
+    if filename:
+        CHANGE_LOG.prune(EXPORTS.directory, KEEP_CHECKPOINTS)
+    return filename
+
+def changes_pending():
+    # Cheap check for periodic jobs: rows changed since the last delta export
+    return CHANGE_LOG.changed_since_export(db.get_connection(DB_PATH))
+
+def export_if_changed(kind):
+    # Run the `kind` export only if rows changed since it last ran (the
+    # version it covered is kept in the database, so this holds across
+    # restarts). Returns the file written, or None.
+    if kind == "changes":
+        return export_changes_file()
+    conn = db.get_connection(DB_PATH)
+    name = f"{CHANGE_LOG.table}.{kind}"
+    if not CHANGE_LOG.changed_since_export(conn, name) and EXPORTS.latest(kind):
+        return None
+    version = CHANGE_LOG.version(conn)
+    filename = EXPORTERS[kind]()
+    # Changes made during the export only cause one extra export next time
+    CHANGE_LOG.mark_exported(conn, name, version)
+    return filename
+
+def export_txt_file():
+    conn = db.get_connection(DB_PATH)
+    # One read transaction so the stored totals match the rows, which are
+    # streamed from the cursor a batch at a time
+    conn.execute("BEGIN")
+    try:
+        total_employees, total_salary, avg_salary = salary_totals()
+        w_id, w_name, w_dept, w_email, w_salary = TXT_LAYOUT.fit(conn.execute(TXT_LONGEST).fetchone())
+        cur = conn.execute("SELECT * FROM employee")
+
+        with EXPORTS.open("txt") as (f, filename):
+            f.write("EMPLOYEE REPORT\n")
+            f.write("=" * 50 + "\n")
+            f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+
+            if total_employees:
+                f.write(f"{'ID':<{w_id}} {'Name':<{w_name}} {'Department':<{w_dept}} "
+                        f"{'Email':<{w_email}} {'Salary':<{w_salary + 1}}\n")
+                f.write("-" * 85 + "\n")
+                for rows in db.batches(cur):
+                    f.write("".join(f"{row[0]:<{w_id}} {row[1]:<{w_name}} {row[2]:<{w_dept}} "
+                                    f"{row[3]:<{w_email}} ${row[4]:<{w_salary}.2f}\n"
+                                    for row in rows))
+
+                # Add summary
+                f.write("\n" + "=" * 85 + "\n")
+                f.write(f"Total Employees: {total_employees}\n")
+                f.write(f"Total Salary: ${total_salary:.2f}\n")
+                f.write(f"Average Salary: ${avg_salary:.2f}\n")
+            else:
+                f.write("No employees found.\n")
+    finally:
+        conn.commit()
+    return filename
+
+def export_csv_file():
+    # Streamed a batch at a time; the SELECT reads one consistent snapshot
+    cur = db.get_connection(DB_PATH).execute("SELECT * FROM employee")
+
+    with EXPORTS.open("csv", newline="") as (f, filename):
+        writer = csv.writer(f)
+        # Write header
+        writer.writerow(HEADERS)
+        # Write data
+        for rows in db.batches(cur):
+            writer.writerows(rows)
+    return filename
+
+def export_snapshot_file():
+    # Binary snapshot for fast restores; read in one transaction
+    conn = db.get_connection(DB_PATH)
+    conn.execute("BEGIN")
+    try:
+        with EXPORTS.open("snap", binary=True) as (f, filename):
+            snapshot.write_snapshot(conn, f, "employee", SNAPSHOT_COLUMNS)
+    finally:
+        conn.commit()
+    return filename
+
+def restore_snapshot(filename):
+    # Replace all employees with the contents of a snapshot; returns ImportStats
+    return snapshot.restore_snapshot(db.get_connection(DB_PATH), filename, "employee", SNAPSHOT_COLUMNS)
+
+EXPORTERS = {"txt": export_txt_file, "csv": export_csv_file, "changes": export_changes_file,
+             "snap": export_snapshot_file}
@@ -1,25 +1,22 @@
 import tkinter as tk
 from tkinter import messagebox, ttk, filedialog
 import sqlite3
-import csv
-import os
-from datetime import datetime
-
-# ================== Database Setup ==================
-def connect_db():
-    conn = sqlite3.connect("employees.db")
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS employee (
-            emp_id TEXT PRIMARY KEY,
-            name TEXT,
-            department TEXT,
-            email TEXT,
-            salary REAL
-        )
-    """)
-    conn.commit()
-    conn.close()
+
+from employee_core import (
+    connect_db, fetch_employees_after, fetch_employees_before, format_employee, fetch_employee_version,
+    add_employee, update_employee, delete_employee, search_employees,
+    import_employees_csv, import_employees_txt, salary_statistics,
+    EXPORTERS, changes_pending,
+)
+from profiler import PROFILER, RENDER, profiled, untimed
+from record_grid import RecordGrid
+from stats_panel import StatsPanel
+from versions import StaleRowError
+from workers import BackgroundTask, ExportWorker
+
+# Handlers are profiled (see profiler.py); the time spent answering a
+# dialog does not count as latency
+messagebox, filedialog = untimed(messagebox), untimed(filedialog)
 
 # ================== Main Application ==================
 class EmployeeManagementSystem:
@@ -39,11 +36,20 @@ class EmployeeManagementSystem:
         self.email = tk.StringVar()
         self.salary = tk.StringVar()
         self.search = tk.StringVar()
+        # (emp_id, version) of the employee last loaded into the form, so an
+        # update cannot silently overwrite another instance's change
+        self.loaded = None
+        self.timings = None
 
         # --- Create UI elements ---
         self.create_widgets()
         connect_db()
         self.show_all()
+
+        # Exports run off the UI thread; bursts of edits share one export
+        self.exporter = ExportWorker(self.root, EXPORTERS,
+                                     on_done=self.export_done, on_error=self.export_failed)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.setup_auto_save()
 
     def setup_styles(self):
@@ -216,266 +222,260 @@ class EmployeeManagementSystem:
                                        bg="#f0f0f0", font=self.label_font, fg=self.dark_color)
         auto_update_cb.grid(row=0, column=4, padx=10, pady=10)
 
+        salaries_btn = tk.Button(search_frame, text="Salary Statistics", command=self.salary_statistics,
+                                 bg=self.secondary_color, fg="white", font=self.button_font,
+                                 relief="flat", bd=0, padx=15, pady=5, cursor="hand2")
+        salaries_btn.grid(row=0, column=5, padx=5, pady=10)
+        salaries_btn.bind("<Enter>", lambda e: salaries_btn.config(bg="#2980b9"))
+        salaries_btn.bind("<Leave>", lambda e: salaries_btn.config(bg=self.secondary_color))
+
+        timings_btn = tk.Button(search_frame, text="Timings", command=self.show_timings,
+                                bg=self.light_color, fg=self.dark_color, font=self.button_font,
+                                relief="flat", bd=0, padx=15, pady=5, cursor="hand2")
+        timings_btn.grid(row=0, column=6, padx=(5, 10), pady=10)
+        timings_btn.bind("<Enter>", lambda e: timings_btn.config(bg="#bdc3c7"))
+        timings_btn.bind("<Leave>", lambda e: timings_btn.config(bg=self.light_color))
+
         # --- Employee Records ---
         record_frame = tk.LabelFrame(content_frame, text="Employee Records", 
                                     font=self.header_font, fg=self.dark_color, 
                                     bg="#f0f0f0", bd=2, relief="groove")
         record_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
 
-        # Text widget with scrollbar
-        text_frame = tk.Frame(record_frame, bg="#f0f0f0")
-        text_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.notebook = ttk.Notebook(record_frame)
+        self.notebook.pack(fill="both", expand=True, padx=10, pady=(10, 0))
 
-        self.txt_records = tk.Text(text_frame, height=12, font=("Consolas", 10), 
+        # Virtualized grid: only the rows near the viewport are ever built
+        self.records = RecordGrid(self.notebook, columns=("ID", "Name", "Department", "Email", "Salary"),
+                                  widths=(90, 180, 140, 220, 100), formatter=format_employee,
+                                  bg="#f0f0f0")
+        self.notebook.add(self.records, text="Employees")
+        self.records.tree.bind("<<TreeviewSelect>>", self.record_selected)
+
+        # Text widget with scrollbar for salary reports
+        text_frame = self.report_tab = tk.Frame(self.notebook, bg="#f0f0f0")
+        self.notebook.add(text_frame, text="Reports")
+
+        self.txt_report = tk.Text(text_frame, height=12, font=("Consolas", 10),
                                   bg="white", fg=self.dark_color, relief="solid", bd=1)
-        scrollbar = tk.Scrollbar(text_frame, orient="vertical", command=self.txt_records.yview)
-        self.txt_records.configure(yscrollcommand=scrollbar.set)
-        
-        self.txt_records.pack(side="left", fill="both", expand=True)
+        scrollbar = tk.Scrollbar(text_frame, orient="vertical", command=self.txt_report.yview)
+        self.txt_report.configure(yscrollcommand=scrollbar.set)
+
+        self.txt_report.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
-        
-        self.txt_records.insert(tk.END, "No employees found. Add some employees to get started!")
+
+        # Status line for export/import messages
+        self.status = tk.StringVar()
+        tk.Label(record_frame, textvariable=self.status, font=self.label_font, anchor="w",
+                 bg="#f0f0f0", fg=self.dark_color).pack(fill="x", padx=10, pady=(2, 5))
 
     # ================== Functions ==================
+    @profiled
     def add_employee(self):
         if self.emp_id.get() == "" or self.name.get() == "":
             messagebox.showerror("Error", "Employee ID and Name are required!")
             return
 
-        conn = sqlite3.connect("employees.db")
-        cur = conn.cursor()
         try:
-            cur.execute("INSERT INTO employee VALUES (?, ?, ?, ?, ?)", 
-                        (self.emp_id.get(), self.name.get(), self.department.get(), 
-                         self.email.get(), float(self.salary.get()) if self.salary.get() else 0.0))
-            conn.commit()
+            add_employee((self.emp_id.get(), self.name.get(), self.department.get(),
+                          self.email.get(), float(self.salary.get()) if self.salary.get() else 0.0))
             messagebox.showinfo("Success", "Employee added successfully!")
             self.show_all()
             if self.auto_update_var.get():
-                self.export_to_txt()
-                self.export_to_csv()
+                self.exporter.request("changes")
         except sqlite3.IntegrityError:
             messagebox.showerror("Error", "Employee ID already exists!")
         except ValueError:
             messagebox.showerror("Error", "Invalid salary value!")
-        conn.close()
 
+    @profiled
     def update_employee(self):
         if self.emp_id.get() == "":
             messagebox.showerror("Error", "Employee ID is required to update!")
             return
             
-        conn = sqlite3.connect("employees.db")
-        cur = conn.cursor()
-        cur.execute("""UPDATE employee SET name=?, department=?, email=?, salary=? WHERE emp_id=?""",
-                    (self.name.get(), self.department.get(), self.email.get(), 
-                     float(self.salary.get()) if self.salary.get() else 0.0, self.emp_id.get()))
-        conn.commit()
-        conn.close()
+        version = self.loaded[1] if self.loaded and self.loaded[0] == self.emp_id.get() else None
+        try:
+            update_employee((self.emp_id.get(), self.name.get(), self.department.get(), self.email.get(),
+                             float(self.salary.get()) if self.salary.get() else 0.0), version)
+        except StaleRowError as e:
+            messagebox.showerror("Error", f"{e}.\nThe form now shows the current values.")
+            self.load_employee(self.emp_id.get())
+            return
+        if version is not None:
+            self.loaded = (self.emp_id.get(), version + 1)
         messagebox.showinfo("Success", "Employee updated successfully!")
         self.show_all()
         if self.auto_update_var.get():
-            self.export_to_txt()
-            self.export_to_csv()
+            self.exporter.request("changes")
 
+    @profiled
     def delete_employee(self):
         if self.emp_id.get() == "":
             messagebox.showerror("Error", "Employee ID is required to delete!")
             return
             
-        conn = sqlite3.connect("employees.db")
-        cur = conn.cursor()
-        cur.execute("DELETE FROM employee WHERE emp_id=?", (self.emp_id.get(),))
-        conn.commit()
-        conn.close()
+        delete_employee(self.emp_id.get())
         messagebox.showinfo("Success", "Employee deleted successfully!")
         self.show_all()
         if self.auto_update_var.get():
-            self.export_to_txt()
-            self.export_to_csv()
+            self.exporter.request("changes")
+
+    @profiled
+    def record_selected(self, event):
+        key = self.records.selected_key()
+        if key is not None:
+            self.load_employee(key)
+
+    def load_employee(self, emp_id):
+        # Fill the form from the database and remember the row's version
+        row, version = fetch_employee_version(emp_id)
+        self.loaded = (row[0], version) if row else None
+        if row:
+            for var, value in zip((self.emp_id, self.name, self.department, self.email, self.salary), row):
+                var.set("" if value is None else value)
 
     def clear_fields(self):
+        self.loaded = None
         self.emp_id.set("")
         self.name.set("")
         self.department.set("")
         self.email.set("")
         self.salary.set("")
 
+    @profiled
     def search_employee(self):
-        conn = sqlite3.connect("employees.db")
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM employee WHERE emp_id=? OR name=?", 
-                    (self.search.get(), self.search.get()))
-        rows = cur.fetchall()
-        conn.close()
-
-        self.txt_records.delete(1.0, tk.END)
-        if rows:
-            for row in rows:
-                self.txt_records.insert(tk.END, f"ID: {row[0]} | Name: {row[1]} | Dept: {row[2]} | Email: {row[3]} | Salary: ${row[4]:.2f}\n")
-        else:
-            self.txt_records.insert(tk.END, "No records found.\n")
+        rows = search_employees(self.search.get())
+        self.notebook.select(self.records)
+        self.records.show(rows, empty_text="No records found.")
 
+    @profiled
     def show_all(self):
-        conn = sqlite3.connect("employees.db")
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM employee")
-        rows = cur.fetchall()
-        conn.close()
-
-        self.txt_records.delete(1.0, tk.END)
-        if rows:
-            for row in rows:
-                self.txt_records.insert(tk.END, f"ID: {row[0]} | Name: {row[1]} | Dept: {row[2]} | Email: {row[3]} | Salary: ${row[4]:.2f}\n")
-        else:
-            self.txt_records.insert(tk.END, "No employees found. Add some employees to get started!\n")
+        self.notebook.select(self.records)
+        self.records.load(fetch_employees_after, fetch_employees_before,
+                          empty_text="No employees found. Add some employees to get started!")
+
+    # ================== Statistics ==================
+    @profiled
+    def salary_statistics(self):
+        # Read from the per-department totals and sketches kept by triggers
+        rows = salary_statistics()
+
+        with PROFILER.phase(RENDER):
+            self.notebook.select(self.report_tab)
+            self.txt_report.delete(1.0, tk.END)
+            self.txt_report.insert(tk.END, "📊 Salary Statistics (median and P90 within 1%):\n\n")
+            self.txt_report.insert(tk.END, f"{'Department':<20} {'Employees':>9} {'Total':>15} {'Average':>12} "
+                                           f"{'Std Dev':>12} {'Median':>12} {'P90':>12}\n")
+            self.txt_report.insert(tk.END, "-" * 98 + "\n")
+            for department, count, total, mean, stddev, median, p90 in rows:
+                if department is None:
+                    self.txt_report.insert(tk.END, "-" * 98 + "\n")
+                    department = "All departments"
+                self.txt_report.insert(tk.END, f"{department or '(none)':<20} {count:>9} {total:>15,.2f} "
+                                               f"{mean:>12,.2f} {stddev:>12,.2f} {median:>12,.2f} {p90:>12,.2f}\n")
 
     # ================== File Operations ==================
+    @profiled
     def export_to_txt(self):
-        try:
-            conn = sqlite3.connect("employees.db")
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM employee")
-            rows = cur.fetchall()
-            conn.close()
-            
-            # Create filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"employee_export_{timestamp}.txt"
-            
-            with open(filename, "w") as f:
-                f.write("EMPLOYEE REPORT\n")
-                f.write("=" * 50 + "\n")
-                f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                
-                if rows:
-                    f.write(f"{'ID':<10} {'Name':<20} {'Department':<15} {'Email':<25} {'Salary':<10}\n")
-                    f.write("-" * 85 + "\n")
-                    for row in rows:
-                        f.write(f"{row[0]:<10} {row[1]:<20} {row[2]:<15} {row[3]:<25} ${row[4]:<9.2f}\n")
-                    
-                    # Add summary
-                    total_employees = len(rows)
-                    total_salary = sum(row[4] for row in rows)
-                    avg_salary = total_salary / total_employees if total_employees > 0 else 0
-                    f.write("\n" + "=" * 85 + "\n")
-                    f.write(f"Total Employees: {total_employees}\n")
-                    f.write(f"Total Salary: ${total_salary:.2f}\n")
-                    f.write(f"Average Salary: ${avg_salary:.2f}\n")
-                else:
-                    f.write("No employees found.\n")
-            
-            self.txt_records.insert(tk.END, f"\n✅ Exported data to {filename}\n")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export to TXT: {str(e)}")
+        self.exporter.request("txt")
 
+    @profiled
     def export_to_csv(self):
-        try:
-            conn = sqlite3.connect("employees.db")
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM employee")
-            rows = cur.fetchall()
-            conn.close()
-            
-            # Create filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"employee_export_{timestamp}.csv"
-            
-            with open(filename, "w", newline="") as f:
-                writer = csv.writer(f)
-                # Write header
-                writer.writerow(["Employee ID", "Name", "Department", "Email", "Salary"])
-                # Write data
-                writer.writerows(rows)
-            
-            self.txt_records.insert(tk.END, f"✅ Exported data to {filename}\n")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export to CSV: {str(e)}")
+        self.exporter.request("csv")
+
+    def export_done(self, filenames):
+        filenames = [f for f in filenames if f]  # None: no changes to export
+        if filenames:
+            self.status.set(f"✅ Exported data to {', '.join(filenames)}")
 
+    def export_failed(self, error):
+        messagebox.showerror("Error", f"Failed to export: {str(error)}")
+
+    @profiled
     def import_from_txt(self):
         try:
             filename = filedialog.askopenfilename(
                 title="Select TXT file",
-                filetypes=(("Text files", "*.txt"), ("All files", "*.*"))
+                filetypes=(("Text files", ("*.txt", "*.txt.gz")), ("All files", "*.*"))
             )
             
             if not filename:
                 return
                 
-            with open(filename, "r") as f:
-                lines = f.readlines()
-            
-            # Parse the file and add employees to database
-            conn = sqlite3.connect("employees.db")
-            cur = conn.cursor()
-            
-            imported_count = 0
-            for line in lines:
-                # Skip header lines
-                if line.startswith("=") or line.startswith("EMPLOYEE") or line.startswith("Generated") or not line.strip():
-                    continue
-                    
-                # Skip summary lines
-                if line.startswith("Total") or line.startswith("-"):
-                    continue
-            
-            conn.commit()
-            conn.close()
-            
-            messagebox.showinfo("Success", f"Imported data from TXT file. Please review and adjust as needed.")
-            self.show_all()
+            # Parse the report line by line and insert in one transaction
+            self.start_import(self.import_txt_btn, "import_txt",
+                              lambda report, cancelled: import_employees_txt(filename, report, cancelled))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to import from TXT: {str(e)}")
 
+    @profiled
     def import_from_csv(self):
         try:
             filename = filedialog.askopenfilename(
                 title="Select CSV file",
-                filetypes=(("CSV files", "*.csv"), ("All files", "*.*"))
+                filetypes=(("CSV files", ("*.csv", "*.csv.gz")), ("All files", "*.*"))
             )
             
             if not filename:
                 return
                 
-            with open(filename, "r") as f:
-                reader = csv.reader(f)
-                next(reader)  # Skip header row
-                
-                conn = sqlite3.connect("employees.db")
-                cur = conn.cursor()
-                
-                imported_count = 0
-                for row in reader:
-                    if len(row) >= 5:
-                        try:
-                            cur.execute("INSERT OR IGNORE INTO employee VALUES (?, ?, ?, ?, ?)",
-                                      (row[0], row[1], row[2], row[3], float(row[4]) if row[4] else 0.0))
-                            imported_count += 1
-                        except:
-                            continue
-                
-                conn.commit()
-                conn.close()
-            
-            messagebox.showinfo("Success", f"Imported {imported_count} employees from CSV file.")
-            self.show_all()
-            if self.auto_update_var.get():
-                self.export_to_txt()
-                self.export_to_csv()
+            # Stream the file in batches on a background thread
+            self.start_import(self.import_csv_btn, "import_csv",
+                              lambda report, cancelled: import_employees_csv(filename, report, cancelled))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to import from CSV: {str(e)}")
 
+    def start_import(self, button, name, job):
+        # Run `job` in the background; its button becomes a Cancel button
+        text, command = button.cget("text"), button.cget("command")
+        self.import_task = BackgroundTask(self.root, job, on_progress=self.import_progress,
+                                          on_done=self.import_done, on_error=self.import_failed,
+                                          name=name)
+        self.import_restore = lambda: button.config(text=text, command=command)
+        button.config(text="Cancel Import", command=self.import_task.cancel)
+        self.import_task.start()
+
+    def import_progress(self, fraction, stats):
+        self.status.set(f"Importing... {fraction:.0%} ({stats.inserted} inserted)")
+
+    @profiled
+    def import_done(self, stats):
+        self.import_restore()
+        self.status.set(stats.summary("employees"))
+        messagebox.showinfo("Success", stats.summary("employees"))
+        self.show_all()
+        if self.auto_update_var.get():
+            self.exporter.request("changes")
+
+    def import_failed(self, error):
+        self.import_restore()
+        messagebox.showerror("Error", f"Failed to import: {str(error)}")
+
+    def show_timings(self):
+        # Live latency statistics of the handlers (see stats_panel.py)
+        if self.timings is None or not self.timings.winfo_exists():
+            self.timings = StatsPanel(self.root)
+        self.timings.lift()
+
     def setup_auto_save(self):
         # Auto-save every 5 minutes
         self.root.after(300000, self.auto_save_files)
 
+    @profiled
     def auto_save_files(self):
-        if self.auto_update_var.get():
-            self.export_to_txt()
-            self.export_to_csv()
+        # A no-op unless rows changed since the last export (also across
+        # restarts): the check reads one counter
+        if self.auto_update_var.get() and changes_pending():
+            self.exporter.request("changes")
         # Schedule next auto-save
         self.root.after(300000, self.auto_save_files)
 
+    def on_close(self):
+        # Let a pending export finish before the window goes away
+        self.exporter.stop()
+        self.root.destroy()
+
 # ================== Run Program ==================
 if __name__ == "__main__":
     root = tk.Tk()
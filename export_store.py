@@ -0,0 +1,131 @@
+import gzip
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from profiler import IO, PROFILER
+
+# ================== Export Storage ==================
+# All export files of one app go to a dedicated directory instead of the
+# working directory. Each file is written under a temporary name and
+# renamed into place when complete, so readers never see a half-written
+# export. After every export the older files of that kind are pruned:
+# only the newest `keep` are kept, and none older than `max_age_days`.
+#
+# <prefix>_<kind>.latest holds the name of the newest complete file of
+# each kind, so downstream readers can open latest(kind) without listing
+# the directory. With compress=True files are gzip-compressed while they
+# are written (".gz" is appended to the name); binary exports such as
+# snapshots are read through mmap and are never compressed.
+#
+# Files are written through a BUFFER_SIZE buffer, so exporters can write
+# row by row (or batch by batch) without a system call per write.
+
+BUFFER_SIZE = 1 << 20       # bytes buffered per export file
+
+
+class ExportStore:
+    def __init__(self, directory, prefix, keep=50, max_age_days=30, compress=False):
+        self.directory = directory
+        self.prefix = prefix
+        self.keep = keep                    # None: no limit on count
+        self.max_age_days = max_age_days    # None: no limit on age
+        self.compress = compress
+
+    @contextmanager
+    def open(self, kind, newline=None, binary=False):
+        # Text (or binary) file for a new export of `kind` (also its
+        # extension); yields (file, final path). Nothing is published if the
+        # body raises. The body counts as io time, except for its own sql.
+        path = self._new_path(kind, self.compress and not binary)
+        with self.write(path, newline, binary) as f:
+            yield f, path
+        with PROFILER.phase(IO):
+            self._point_latest(kind, path)
+            self.prune(kind)
+
+    @contextmanager
+    def write(self, path, newline=None, binary=False):
+        # File that appears at `path` only once the body completes: it is
+        # written under a temporary name in the same directory and renamed
+        # into place. gzip-compressed when `path` ends in ".gz".
+        with PROFILER.phase(IO):
+            directory = os.path.dirname(path)
+            os.makedirs(directory or ".", exist_ok=True)
+            tmp = os.path.join(directory, f".{os.path.basename(path)}."
+                                          f"{os.getpid()}_{threading.get_ident()}.tmp")
+            if binary:
+                f = open(tmp, "wb", buffering=BUFFER_SIZE)
+            elif path.endswith(".gz"):
+                f = io.TextIOWrapper(io.BufferedWriter(gzip.GzipFile(tmp, "wb"), BUFFER_SIZE),
+                                     newline=newline)
+            else:
+                f = open(tmp, "w", buffering=BUFFER_SIZE, newline=newline)
+            try:
+                with f:
+                    yield f
+            except BaseException:
+                os.remove(tmp)
+                raise
+            os.replace(tmp, path)
+
+    def _new_path(self, kind, compress):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = ".gz" if compress else ""
+        path = os.path.join(self.directory, f"{self.prefix}_export_{timestamp}.{kind}{suffix}")
+        n = 1
+        while os.path.exists(path):
+            # Several exports within one second
+            path = os.path.join(self.directory, f"{self.prefix}_export_{timestamp}_{n:02d}.{kind}{suffix}")
+            n += 1
+        return path
+
+    # ---------- Latest pointer ----------
+    def _pointer(self, kind):
+        return os.path.join(self.directory, f"{self.prefix}_{kind}.latest")
+
+    def _point_latest(self, kind, path):
+        pointer = self._pointer(kind)
+        with open(pointer + ".tmp", "w") as f:
+            f.write(os.path.basename(path) + "\n")
+        os.replace(pointer + ".tmp", pointer)
+
+    def latest(self, kind):
+        # Path of the newest complete export of `kind`, or None
+        try:
+            with open(self._pointer(kind)) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return os.path.join(self.directory, name) if name else None
+
+    # ---------- Retention ----------
+    def files(self, kind):
+        # [(mtime, path)] of the exports of `kind`, oldest first
+        start = f"{self.prefix}_export_"
+        ends = (f".{kind}", f".{kind}.gz")
+        try:
+            found = [(e.stat().st_mtime, e.name, e.path) for e in os.scandir(self.directory)
+                     if e.name.startswith(start) and e.name.endswith(ends)]
+        except FileNotFoundError:
+            return []
+        return [(mtime, path) for mtime, name, path in sorted(found)]
+
+    def prune(self, kind):
+        # Delete exports beyond `keep` or older than `max_age_days`; the
+        # latest one always stays. Returns the paths removed.
+        files = self.files(kind)
+        doomed = {path for mtime, path in (files[:-self.keep] if self.keep else [])}
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            doomed.update(path for mtime, path in files if mtime < cutoff)
+        doomed.discard(self.latest(kind))
+        for path in doomed:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass    # pruned by another process
+        return sorted(doomed)
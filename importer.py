@@ -0,0 +1,217 @@
+import csv
+import gzip
+import io
+import itertools
+import mmap
+import multiprocessing
+import os
+from collections import deque
+
+# ================== Streaming Bulk Import ==================
+# Reads a file record by record (never the whole file), converts each
+# record and loads it in batches. By default every batch is its own
+# transaction; atomic=True wraps the whole import in one. Rows that fail
+# conversion count as invalid; valid rows whose key already exists are
+# ignored and count as skipped.
+#
+# Each batch goes into a temp staging table with executemany() and then
+# into the real table with one INSERT OR IGNORE ... SELECT. Row triggers
+# (change log, FTS index) then run inside a single statement per batch,
+# which keeps FTS5 from flushing its index once per row.
+#
+# Files ending in .gz (compressed exports) are decompressed as they are read.
+#
+# import_csv_parallel() is for very large CSV files: the file is mapped
+# with mmap and split on line boundaries into chunks that a process pool
+# parses and converts, while the calling process stays the only writer and
+# loads the converted rows in file order.
+
+BATCH_SIZE = 10000
+CHUNK_BYTES = 16 * 1024 * 1024  # parallel import: bytes parsed per task
+
+
+class ImportStats:
+    def __init__(self):
+        self.inserted = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.cancelled = False
+
+    def __repr__(self):
+        return (f"ImportStats(inserted={self.inserted}, skipped={self.skipped}, "
+                f"invalid={self.invalid}, cancelled={self.cancelled})")
+
+    def summary(self, noun):
+        text = f"Imported {self.inserted} {noun}"
+        if self.skipped:
+            text += f", skipped {self.skipped} already present"
+        if self.invalid:
+            text += f", {self.invalid} invalid rows"
+        if self.cancelled:
+            text += " (cancelled)"
+        return text + "."
+
+
+def import_rows(conn, records, table, convert, batch_size=BATCH_SIZE,
+                progress=None, cancelled=None, position=None, atomic=False):
+    # convert(record) -> parameter tuple, raising ValueError/IndexError for
+    # bad records. progress(fraction, stats) is called after every batch,
+    # with the fraction taken from position(); cancelled() is polled between
+    # batches. A cancelled atomic import is rolled back entirely.
+    stats = ImportStats()
+    stage = f"import_stage_{table}"
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {stage} AS SELECT * FROM {table} WHERE 0")
+    marks = ", ".join("?" * len(conn.execute(f"SELECT * FROM {stage}").description))
+
+    def flush(batch):
+        conn.executemany(f"INSERT INTO {stage} VALUES ({marks})", batch)
+        inserted = conn.execute(f"INSERT OR IGNORE INTO {table} SELECT * FROM {stage}").rowcount
+        conn.execute(f"DELETE FROM {stage}")
+        if not atomic:
+            conn.commit()
+        stats.inserted += inserted
+        stats.skipped += len(batch) - inserted
+        batch.clear()
+
+    try:
+        batch = []
+        for record in records:
+            try:
+                batch.append(convert(record))
+            except (ValueError, IndexError):
+                stats.invalid += 1
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                if progress is not None:
+                    progress(position() if position else 0.0, stats)
+                if cancelled is not None and cancelled():
+                    stats.cancelled = True
+                    break
+        else:
+            if batch:
+                flush(batch)
+    except BaseException:
+        conn.rollback()
+        raise
+    if stats.cancelled and atomic:
+        conn.rollback()
+        stats.inserted = stats.skipped = 0
+    else:
+        conn.commit()
+    if progress is not None:
+        progress(1.0, stats)
+    return stats
+
+
+def _open(path, newline=None):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline=newline)
+    return open(path, newline=newline)
+
+
+def _position(f, path):
+    # Fraction of the file on disk read so far (compressed bytes for .gz)
+    size = os.path.getsize(path) or 1
+    raw = getattr(f.buffer, "fileobj", f.buffer)
+    return lambda: min(raw.tell() / size, 1.0)
+
+
+def import_csv(conn, path, table, convert, **kwargs):
+    with _open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip header row
+        return import_rows(conn, reader, table, convert,
+                           position=_position(f, path), **kwargs)
+
+
+def import_txt(conn, path, layout, table, convert, **kwargs):
+    # Fixed-width report (see txt_report); convert() receives the list of
+    # field strings of one record line
+    def parse(record):
+        line, widths = record
+        return convert(layout.split(line, widths))
+
+    with _open(path) as f:
+        return import_rows(conn, layout.records(f), table, parse,
+                           position=_position(f, path), atomic=True, **kwargs)
+
+
+def _parse_chunk(path, start, end, convert):
+    # Pool task: converted rows (None for invalid records) of bytes
+    # start..end of a CSV file, or None if a quoted field contains a line
+    # break, in which case line boundaries need not be record boundaries
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        text = m[start:end].decode("utf-8")
+    records = list(csv.reader(io.StringIO(text, newline="")))
+    if '"' in text and any("\n" in field or "\r" in field for record in records for field in record):
+        return None
+    rows = []
+    for record in records:
+        try:
+            rows.append(convert(record))
+        except (ValueError, IndexError):
+            rows.append(None)
+    return rows
+
+
+def _converted(row):
+    if row is None:
+        raise ValueError("invalid record")
+    return row
+
+
+def import_csv_parallel(conn, path, table, convert, workers=None, chunk_bytes=CHUNK_BYTES, **kwargs):
+    # Same result as import_csv(). convert runs in worker processes, so it
+    # must be a module-level function. Compressed files and files of a
+    # single chunk are imported sequentially; from the first chunk with a
+    # multi-line quoted field on, the rest of the file is parsed here.
+    size = os.path.getsize(path)
+    if path.endswith(".gz") or size <= chunk_bytes:
+        return import_csv(conn, path, table, convert, **kwargs)
+    workers = workers or os.cpu_count() or 1
+
+    bounds = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        start = m.find(b"\n") + 1      # skip header row
+        while start < size:
+            end = m.find(b"\n", start + chunk_bytes)
+            end = size if end < 0 else end + 1
+            bounds.append((start, end))
+            start = end
+
+    read = [lambda: bounds[0][0]]       # bytes of the file handed to the writer
+
+    def records(pool):
+        pending = deque()
+        chunks = iter(bounds)
+
+        def submit():
+            # Stay a few chunks ahead of the writer, no more
+            for start, end in itertools.islice(chunks, 2 * workers - len(pending)):
+                pending.append((start, end, pool.apply_async(_parse_chunk, (path, start, end, convert))))
+
+        submit()
+        while pending:
+            start, end, result = pending.popleft()
+            rows = result.get()
+            if rows is None:
+                yield from tail(start)
+                return
+            submit()
+            read[0] = lambda: end
+            yield from rows
+
+    def tail(start):
+        with open(path, "rb") as f:
+            f.seek(start)
+            read[0] = f.tell
+            for record in csv.reader(io.TextIOWrapper(f, encoding="utf-8", newline="")):
+                try:
+                    yield convert(record)
+                except (ValueError, IndexError):
+                    yield None
+
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        return import_rows(conn, records(pool), table, _converted,
+                           position=lambda: min(read[0]() / size, 1.0), **kwargs)
@@ -0,0 +1,376 @@
+import csv
+from datetime import datetime
+
+import db
+import snapshot
+from adjustments import apply_movements, read_movements_csv
+from aggregates import GroupAggregate
+from changelog import ChangeLog
+from export_store import ExportStore
+from importer import import_csv_parallel, import_txt
+from ledger import StockLedger
+from reorder import ReorderMonitor
+from search import SearchIndex
+from txt_report import MONEY, TEXT, FixedWidthLayout
+from versions import RowVersions
+
+# ================= Inventory Core =================
+# Everything the inventory app does to its data, without any UI: schema,
+# CRUD, search, statistics, import and export. Used by the Tk app, the
+# command line (cli.py), the benchmarks and the query plan check, so it
+# must never import tkinter.
+
+DB_PATH = "inventory.db"
+
+HEADERS = ["Product ID", "Name", "Category", "Price", "Stock"]
+
+# Delta exports: only rows changed since the last export, plus periodic
+# full checkpoints to restore from
+CHANGE_LOG = ChangeLog("products", "product_id", ("product_id", "name", "category", "price", "stock"),
+                       HEADERS, prefix="inventory")
+
+# Export files go to their own directory; old ones are pruned by count and
+# age, and the newest checkpoints (with their deltas) are kept for restore
+EXPORTS = ExportStore("exports", "inventory", keep=50, max_age_days=30)
+KEEP_CHECKPOINTS = 2
+
+# Column types of binary snapshots (see snapshot.py)
+SNAPSHOT_COLUMNS = [("product_id", snapshot.TEXT), ("name", snapshot.TEXT), ("category", snapshot.TEXT),
+                    ("price", snapshot.REAL), ("stock", snapshot.INT)]
+
+# Ranked prefix search over the text columns, kept in sync by triggers
+PRODUCT_SEARCH = SearchIndex("products", "product_id", ("product_id", "name", "category"))
+
+# Per-category product count, stock and value, kept up to date by triggers
+CATEGORY_TOTALS = GroupAggregate("products", "category",
+                                 {"stock": "{row}.stock", "value": "{row}.price * {row}.stock"})
+
+# Default reorder point; products and categories can have their own
+LOW_STOCK = 5
+
+# Products below their reorder point, kept up to date by triggers
+STOCK_ALERTS = ReorderMonitor("products", "product_id", "category", "stock", default=LOW_STOCK)
+
+# Per-row version numbers for optimistic updates from several instances
+PRODUCT_VERSIONS = RowVersions("products", "product_id")
+
+# Append-only history of every stock change, with a per-product snapshot
+# every 100 movements for point-in-time stock
+STOCK_LEDGER = StockLedger("products", "product_id", "stock", every=100)
+
+# One row per category or per low product: scanning these is cheap, not a
+# full table scan
+SUMMARY_TABLES = (CATEGORY_TOTALS.agg_table, STOCK_ALERTS.alerts_table)
+
+# ================= Database Setup ==================
+def connect_db():
+    with db.transaction(DB_PATH) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS products (
+                product_id TEXT PRIMARY KEY,
+                name TEXT,
+                category TEXT,
+                price REAL,
+                stock INTEGER
+            )
+        """)
+        # Secondary indexes: category filter pages and the low-stock range
+        # (category and value totals live in CATEGORY_TOTALS)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products(category, product_id, stock)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_products_stock ON products(stock, price)")
+        CHANGE_LOG.install(conn)
+        PRODUCT_SEARCH.install(conn)
+        CATEGORY_TOTALS.install(conn)
+        STOCK_ALERTS.install(conn)
+        PRODUCT_VERSIONS.install(conn)
+        STOCK_LEDGER.install(conn)
+
+# Lookup and statistics queries. query_plans.py checks that none of them
+# falls back to a full table scan; add new app queries here.
+QUERIES = {
+    "first_page": "SELECT * FROM products ORDER BY product_id LIMIT ?",
+    "next_page": "SELECT * FROM products WHERE product_id > ? ORDER BY product_id LIMIT ?",
+    "previous_page": "SELECT * FROM products WHERE product_id < ? ORDER BY product_id DESC LIMIT ?",
+    "last_page": "SELECT * FROM products ORDER BY product_id DESC LIMIT ?",
+    "category_first_page": "SELECT * FROM products WHERE category = ? ORDER BY product_id LIMIT ?",
+    "category_next_page": """SELECT * FROM products WHERE category = ? AND product_id > ?
+                             ORDER BY product_id LIMIT ?""",
+    "category_previous_page": """SELECT * FROM products WHERE category = ? AND product_id < ?
+                                 ORDER BY product_id DESC LIMIT ?""",
+    "category_last_page": "SELECT * FROM products WHERE category = ? ORDER BY product_id DESC LIMIT ?",
+    "by_id": "SELECT * FROM products WHERE product_id=?",
+    "by_id_versioned": """SELECT p.*, v.version FROM products p
+                          LEFT JOIN products_versions v ON v.key = p.product_id
+                          WHERE p.product_id=?""",
+    "low_stock": "SELECT * FROM products WHERE stock < ?",
+    "category_counts": "SELECT category, row_count FROM products_by_category",
+    "category_summary": "SELECT category, row_count, stock FROM products_by_category ORDER BY category",
+    "inventory_value": "SELECT SUM(value) FROM products_by_category",
+}
+
+def query(name, *params):
+    return db.get_connection(DB_PATH).execute(QUERIES[name], params)
+
+# Keyset pages over the primary key for the record grid, optionally
+# restricted to one category: the `limit` rows after (ascending) or before
+# (descending) a key, or from either end when the key is None. Any page
+# costs one index seek, however deep it is.
+def fetch_products_after(product_id, limit, category=None):
+    if category is None:
+        if product_id is None:
+            return query("first_page", limit).fetchall()
+        return query("next_page", product_id, limit).fetchall()
+    if product_id is None:
+        return query("category_first_page", category, limit).fetchall()
+    return query("category_next_page", category, product_id, limit).fetchall()
+
+def fetch_products_before(product_id, limit, category=None):
+    if category is None:
+        if product_id is None:
+            return query("last_page", limit).fetchall()
+        return query("previous_page", product_id, limit).fetchall()
+    if product_id is None:
+        return query("category_last_page", category, limit).fetchall()
+    return query("category_previous_page", category, product_id, limit).fetchall()
+
+def fetch_product(product_id):
+    return query("by_id", product_id).fetchone()
+
+def fetch_product_version(product_id):
+    # (row, version) read together, or (None, None); pass the version back
+    # to update_product()/set_stock() to detect concurrent changes
+    row = query("by_id_versioned", product_id).fetchone()
+    return (row[:-1], row[-1]) if row else (None, None)
+
+def format_product(row):
+    return (row[0], row[1], row[2], f"${row[3]:.2f}", row[4])
+
+# ================= CRUD =================
+# Each runs in its own transaction and is retried if the database stays
+# locked by another instance. add_product() raises sqlite3.IntegrityError
+# for a duplicate ID; the others return the row as it was before (None
+# when the ID does not exist). Given the `version` the caller read,
+# update_product() and set_stock() raise StaleRowError instead of
+# overwriting a change made since.
+@db.retrying
+def add_product(row):
+    with db.transaction(DB_PATH) as conn:
+        conn.execute("INSERT INTO products VALUES (?, ?, ?, ?, ?)", row)
+
+@db.retrying
+def update_product(row, version=None):
+    with db.transaction(DB_PATH) as conn:
+        old = fetch_product(row[0])
+        PRODUCT_VERSIONS.check(conn, row[0], version)
+        conn.execute("""UPDATE products SET name=?, category=?, price=?, stock=? WHERE product_id=?""",
+                     (*row[1:], row[0]))
+    return old
+
+@db.retrying
+def set_stock(product_id, stock, version=None):
+    with db.transaction(DB_PATH) as conn:
+        old = fetch_product(product_id)
+        PRODUCT_VERSIONS.check(conn, product_id, version)
+        conn.execute("UPDATE products SET stock=? WHERE product_id=?", (stock, product_id))
+    return old
+
+def adjust_stock(movements, check_negative=False):
+    # Add [(product_id, delta)] to the stock of many products in one
+    # transaction. Returns AdjustStats; raises AdjustmentError (and changes
+    # nothing) for unknown products, or for stock going below zero when
+    # check_negative is set.
+    movements = list(movements)     # a retry reads them again
+    return db.retrying(apply_movements)(db.get_connection(DB_PATH), "products", "product_id",
+                                        "stock", movements, check_negative)
+
+def adjust_stock_csv(filename, check_negative=False):
+    # Same for a goods receipt or pick list: CSV of Product ID,Quantity
+    return adjust_stock(read_movements_csv(filename), check_negative)
+
+@db.retrying
+def delete_product(product_id):
+    with db.transaction(DB_PATH) as conn:
+        old = fetch_product(product_id)
+        conn.execute("DELETE FROM products WHERE product_id=?", (product_id,))
+    return old
+
+def search_products(text):
+    return PRODUCT_SEARCH.search(db.get_connection(DB_PATH), text)
+
+# ================= Stock Alerts =================
+def stock_alerts():
+    # Products below their reorder point: [(seq, threshold, raised_at, *row)]
+    return STOCK_ALERTS.alerts(db.get_connection(DB_PATH))
+
+def stock_alerts_after(seq):
+    # Alerts raised since alert `seq`; empty (and free) when nothing new is low
+    return STOCK_ALERTS.raised_after(db.get_connection(DB_PATH), seq)
+
+def last_alert_seq():
+    return STOCK_ALERTS.last_seq(db.get_connection(DB_PATH))
+
+@db.retrying
+def set_reorder_point(scope, key, threshold):
+    # scope is "product", "category" or "default"; threshold=None removes
+    # a product or category reorder point
+    with db.transaction(DB_PATH) as conn:
+        STOCK_ALERTS.set_point(conn, scope, key, threshold)
+
+def reorder_points():
+    return STOCK_ALERTS.points(db.get_connection(DB_PATH))
+
+# ================= Stock History =================
+# Times are UTC, as stored by the ledger ('YYYY-MM-DD HH:MM:SS'); a bare
+# date means the end of that day
+def stock_at(product_id, when):
+    if len(when) == 10:
+        when += " 23:59:59"
+    return STOCK_LEDGER.stock_at(db.get_connection(DB_PATH), product_id, when)
+
+def stock_movements(product_id, limit=50):
+    # Latest stock movements of a product, newest first: [(n, at, delta)]
+    return STOCK_LEDGER.movements(db.get_connection(DB_PATH), product_id, limit)
+
+# ================= Statistics =================
+def low_stock_products(threshold=LOW_STOCK):
+    # Ad hoc threshold for all products; see stock_alerts() for reorder points
+    return query("low_stock", threshold).fetchall()
+
+def category_counts():
+    # [(category, products)]
+    return query("category_counts").fetchall()
+
+def category_summary():
+    # [(category, products, total stock)]
+    return query("category_summary").fetchall()
+
+def inventory_value():
+    return query("inventory_value").fetchone()[0] or 0
+
+def check_totals(repair=False):
+    # Compare the per-category totals with a full recompute; returns the
+    # mismatches found and, with repair=True, rebuilds the totals
+    with db.transaction(DB_PATH) as conn:
+        mismatches = CATEGORY_TOTALS.check(conn)
+        if mismatches and repair:
+            CATEGORY_TOTALS.rebuild(conn)
+    return mismatches
+
+# ================= Import Files =================
+# Tk-free so they can run on a background thread
+def convert_product_row(row):
+    if not row[0]:
+        raise ValueError("missing product ID")
+    return (row[0], row[1], row[2], float(row[3]), int(row[4]))
+
+def import_products_csv(filename, progress=None, cancelled=None, workers=None):
+    # Large supplier files are parsed by a process pool (one per core by
+    # default); small ones in this process
+    return import_csv_parallel(db.get_connection(DB_PATH), filename, "products",
+                               convert_product_row, workers=workers,
+                               progress=progress, cancelled=cancelled)
+
+# Column layout written by export_txt_file()
+TXT_LAYOUT = FixedWidthLayout([(10, TEXT), (20, TEXT), (15, TEXT), (9, MONEY), (10, TEXT)])
+# Longest value of each column, for TXT_LAYOUT.fit()
+TXT_LONGEST = """SELECT MAX(LENGTH(product_id)), MAX(LENGTH(name)), MAX(LENGTH(category)),
+                        MAX(LENGTH(printf('%.2f', price))), MAX(LENGTH(stock)) FROM products"""
+
+def import_products_txt(filename, progress=None, cancelled=None):
+    return import_txt(db.get_connection(DB_PATH), filename, TXT_LAYOUT,
+                      "products",
+                      convert_product_row, progress=progress, cancelled=cancelled)
+
+# ================= Export Files =================
+# Tk-free so they can run on the export worker thread
+def export_changes_file():
+    filename = CHANGE_LOG.export(db.get_connection(DB_PATH), EXPORTS)
+    if filename:
+        CHANGE_LOG.prune(EXPORTS.directory, KEEP_CHECKPOINTS)
+    return filename
+
+def changes_pending():
+    # Cheap check for periodic jobs: rows changed since the last delta export
+    return CHANGE_LOG.changed_since_export(db.get_connection(DB_PATH))
+
+def export_if_changed(kind):
+    # Run the `kind` export only if rows changed since it last ran (the
+    # version it covered is kept in the database, so this holds across
+    # restarts). Returns the file written, or None.
+    if kind == "changes":
+        return export_changes_file()
+    conn = db.get_connection(DB_PATH)
+    name = f"{CHANGE_LOG.table}.{kind}"
+    if not CHANGE_LOG.changed_since_export(conn, name) and EXPORTS.latest(kind):
+        return None
+    version = CHANGE_LOG.version(conn)
+    filename = EXPORTERS[kind]()
+    # Changes made during the export only cause one extra export next time
+    CHANGE_LOG.mark_exported(conn, name, version)
+    return filename
+
+def export_txt_file():
+    conn = db.get_connection(DB_PATH)
+    # One read transaction so the stored totals match the rows, which are
+    # streamed from the cursor a batch at a time
+    conn.execute("BEGIN")
+    try:
+        total_products = CATEGORY_TOTALS.total(conn, "row_count")
+        total_value = CATEGORY_TOTALS.total(conn, "value")
+        w_id, w_name, w_cat, w_price, w_stock = TXT_LAYOUT.fit(conn.execute(TXT_LONGEST).fetchone())
+        cur = conn.execute("SELECT * FROM products")
+
+        with EXPORTS.open("txt") as (f, filename):
+            f.write("INVENTORY REPORT\n")
+            f.write("=" * 50 + "\n")
+            f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+
+            if total_products:
+                f.write(f"{'ID':<{w_id}} {'Name':<{w_name}} {'Category':<{w_cat}} "
+                        f"{'Price':<{w_price + 1}} {'Stock':<{w_stock}}\n")
+                f.write("-" * 75 + "\n")
+                for rows in db.batches(cur):
+                    f.write("".join(f"{row[0]:<{w_id}} {row[1]:<{w_name}} {row[2]:<{w_cat}} "
+                                    f"${row[3]:<{w_price}.2f} {row[4]:<{w_stock}}\n"
+                                    for row in rows))
+
+                # Add summary
+                f.write("\n" + "=" * 75 + "\n")
+                f.write(f"Total Products: {total_products}\n")
+                f.write(f"Total Inventory Value: ${total_value:.2f}\n")
+            else:
+                f.write("No products found in inventory.\n")
+    finally:
+        conn.commit()
+    return filename
+
+def export_csv_file():
+    # Streamed a batch at a time; the SELECT reads one consistent snapshot
+    cur = db.get_connection(DB_PATH).execute("SELECT * FROM products")
+
+    with EXPORTS.open("csv", newline="") as (f, filename):
+        writer = csv.writer(f)
+        # Write header
+        writer.writerow(HEADERS)
+        # Write data
+        for rows in db.batches(cur):
+            writer.writerows(rows)
+    return filename
+
+def export_snapshot_file():
+    # Binary snapshot for fast restores; read in one transaction
+    conn = db.get_connection(DB_PATH)
+    conn.execute("BEGIN")
+    try:
+        with EXPORTS.open("snap", binary=True) as (f, filename):
+            snapshot.write_snapshot(conn, f, "products", SNAPSHOT_COLUMNS)
+    finally:
+        conn.commit()
+    return filename
+
+def restore_snapshot(filename):
+    # Replace all products with the contents of a snapshot; returns ImportStats
+    return snapshot.restore_snapshot(db.get_connection(DB_PATH), filename, "products", SNAPSHOT_COLUMNS)
+
+EXPORTERS = {"txt": export_txt_file, "csv": export_csv_file, "changes": export_changes_file,
+             "snap": export_snapshot_file}
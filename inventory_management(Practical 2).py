@@ -1,25 +1,30 @@
 import tkinter as tk
 from tkinter import messagebox, ttk, filedialog
 import sqlite3
-import csv
-import os
-from datetime import datetime
-
-# ================= Database Setup ==================
-def connect_db():
-    conn = sqlite3.connect("inventory.db")
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS products (
-            product_id TEXT PRIMARY KEY,
-            name TEXT,
-            category TEXT,
-            price REAL,
-            stock INTEGER
-        )
-    """)
-    conn.commit()
-    conn.close()
+
+from adjustments import AdjustmentError
+from changes import ChangeBus, CountIndex
+from inventory_core import (
+    connect_db, fetch_products_after, fetch_products_before, format_product,
+    add_product, update_product, set_stock, delete_product, search_products,
+    fetch_product_version, adjust_stock, adjust_stock_csv,
+    category_counts, category_summary, inventory_value,
+    stock_alerts, stock_alerts_after, last_alert_seq, set_reorder_point,
+    import_products_csv, import_products_txt,
+    EXPORTERS, changes_pending,
+)
+from profiler import PROFILER, RENDER, profiled, untimed
+from record_grid import RecordGrid
+from search import SearchCache
+from stats_panel import StatsPanel
+from versions import StaleRowError
+from workers import BackgroundTask, ExportWorker
+
+SEARCH_DELAY_MS = 250   # pause in typing before a search runs
+
+# Handlers are profiled (see profiler.py); the time spent answering a
+# dialog does not count as latency
+messagebox, filedialog = untimed(messagebox), untimed(filedialog)
 
 # ================= Main Application =================
 class InventoryManagementSystem:
@@ -40,11 +45,34 @@ class InventoryManagementSystem:
         self.stock = tk.StringVar()
         self.search = tk.StringVar()
         self.filter_category = tk.StringVar()
+        self.reorder_point = tk.StringVar()
+        # (product_id, version) of the product last loaded into the form, so
+        # an update cannot silently overwrite another instance's change
+        self.loaded = None
+
+        # Single-row edits are published here and patched into the views
+        self.changes = ChangeBus()
+        self.categories = CountIndex(2)
+        self.changes.subscribe(self.apply_change)
+        self.changes.subscribe(self.check_alerts)
+
+        # Search as you type: recent results are cached and the writes above
+        # drop just the queries they affect
+        self.search_cache = SearchCache(search_products, (0, 1, 2))
+        self.changes.subscribe(self.search_cache.apply)
+        self.search_job = None
+        self.timings = None
 
         # Create UI elements
         self.create_widgets()
         connect_db()
+        self.alert_seq = last_alert_seq()
         self.show_all()
+
+        # Exports run off the UI thread; bursts of edits share one export
+        self.exporter = ExportWorker(self.root, EXPORTERS,
+                                     on_done=self.export_done, on_error=self.export_failed)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.setup_auto_save()
 
     def setup_styles(self):
@@ -117,6 +145,12 @@ class InventoryManagementSystem:
                                    width=25, relief="solid", bd=1)
         self.stock_entry.grid(row=2, column=1, padx=(0, 10), pady=8, sticky="ew")
 
+        tk.Label(prod_frame, text="Reorder Point:", font=self.label_font, 
+                bg="#f0f0f0", fg=self.dark_color).grid(row=2, column=2, sticky="w", padx=(10, 5), pady=8)
+        self.reorder_entry = tk.Entry(prod_frame, textvariable=self.reorder_point, font=self.label_font, 
+                                     width=25, relief="solid", bd=1)
+        self.reorder_entry.grid(row=2, column=3, padx=(0, 10), pady=8, sticky="ew")
+
         # Buttons with improved styling
         btn_frame = tk.Frame(prod_frame, bg="#f0f0f0")
         btn_frame.grid(row=3, columnspan=4, pady=15)
@@ -149,6 +183,13 @@ class InventoryManagementSystem:
         self.stock_btn.bind("<Enter>", lambda e: self.stock_btn.config(bg="#d35400"))
         self.stock_btn.bind("<Leave>", lambda e: self.stock_btn.config(bg=self.warning_color))
 
+        self.adjust_btn = tk.Button(btn_frame, text="Add to Stock", command=self.adjust_stock, 
+                                   bg=self.warning_color, fg="white", font=self.button_font,
+                                   relief="flat", bd=0, padx=15, pady=8, cursor="hand2")
+        self.adjust_btn.pack(side="left", padx=5)
+        self.adjust_btn.bind("<Enter>", lambda e: self.adjust_btn.config(bg="#d35400"))
+        self.adjust_btn.bind("<Leave>", lambda e: self.adjust_btn.config(bg=self.warning_color))
+
         self.clear_btn = tk.Button(btn_frame, text="Clear Fields", command=self.clear_fields, 
                                   bg=self.light_color, fg=self.dark_color, font=self.button_font,
                                   relief="flat", bd=0, padx=15, pady=8, cursor="hand2")
@@ -191,6 +232,14 @@ class InventoryManagementSystem:
         self.import_csv_btn.bind("<Enter>", lambda e: self.import_csv_btn.config(bg="#bdc3c7"))
         self.import_csv_btn.bind("<Leave>", lambda e: self.import_csv_btn.config(bg=self.light_color))
 
+        self.movements_btn = tk.Button(export_frame, text="Apply Stock Movements", 
+                                      command=self.apply_stock_movements, 
+                                      bg=self.light_color, fg=self.dark_color, font=self.button_font,
+                                      relief="flat", bd=0, padx=15, pady=5, cursor="hand2")
+        self.movements_btn.pack(side="left", padx=5)
+        self.movements_btn.bind("<Enter>", lambda e: self.movements_btn.config(bg="#bdc3c7"))
+        self.movements_btn.bind("<Leave>", lambda e: self.movements_btn.config(bg=self.light_color))
+
         # Search & Filter Frame
         search_frame = tk.LabelFrame(content_frame, text="Search & Filter", 
                                     font=self.header_font, fg=self.dark_color, 
@@ -202,6 +251,7 @@ class InventoryManagementSystem:
         self.search_entry = tk.Entry(search_frame, textvariable=self.search, font=self.label_font, 
                                     width=20, relief="solid", bd=1)
         self.search_entry.grid(row=0, column=1, padx=(0, 10), pady=10)
+        self.search.trace_add("write", self.search_typed)
 
         search_btn = tk.Button(search_frame, text="Search", command=self.search_product, 
                               bg=self.secondary_color, fg="white", font=self.button_font,
@@ -258,6 +308,29 @@ class InventoryManagementSystem:
         value_btn.bind("<Enter>", lambda e: value_btn.config(bg="#219653"))
         value_btn.bind("<Leave>", lambda e: value_btn.config(bg=self.success_color))
 
+        product_point_btn = tk.Button(stats_frame, text="Set Product Reorder Point",
+                                      command=self.set_product_reorder_point,
+                                      bg=self.light_color, fg=self.dark_color, font=self.button_font,
+                                      relief="flat", bd=0, padx=15, pady=8, cursor="hand2")
+        product_point_btn.pack(side="left", padx=10, pady=10)
+        product_point_btn.bind("<Enter>", lambda e: product_point_btn.config(bg="#bdc3c7"))
+        product_point_btn.bind("<Leave>", lambda e: product_point_btn.config(bg=self.light_color))
+
+        category_point_btn = tk.Button(stats_frame, text="Set Category Reorder Point",
+                                       command=self.set_category_reorder_point,
+                                       bg=self.light_color, fg=self.dark_color, font=self.button_font,
+                                       relief="flat", bd=0, padx=15, pady=8, cursor="hand2")
+        category_point_btn.pack(side="left", padx=10, pady=10)
+        category_point_btn.bind("<Enter>", lambda e: category_point_btn.config(bg="#bdc3c7"))
+        category_point_btn.bind("<Leave>", lambda e: category_point_btn.config(bg=self.light_color))
+
+        timings_btn = tk.Button(stats_frame, text="Timings", command=self.show_timings,
+                                bg=self.light_color, fg=self.dark_color, font=self.button_font,
+                                relief="flat", bd=0, padx=15, pady=8, cursor="hand2")
+        timings_btn.pack(side="left", padx=10, pady=10)
+        timings_btn.bind("<Enter>", lambda e: timings_btn.config(bg="#bdc3c7"))
+        timings_btn.bind("<Leave>", lambda e: timings_btn.config(bg=self.light_color))
+
         # Auto-update toggle
         self.auto_update_var = tk.BooleanVar()
         self.auto_update_var.set(True)
@@ -271,9 +344,19 @@ class InventoryManagementSystem:
                                     bg="#f0f0f0", bd=2, relief="groove")
         record_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
 
-        # Text widget with scrollbar
-        text_frame = tk.Frame(record_frame, bg="#f0f0f0")
-        text_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        self.notebook = ttk.Notebook(record_frame)
+        self.notebook.pack(fill="both", expand=True, padx=10, pady=(10, 0))
+
+        # Virtualized grid: rows are keyed by product ID so edits patch in place
+        self.records = RecordGrid(self.notebook, columns=("ID", "Name", "Category", "Price", "Stock"),
+                                  widths=(100, 220, 160, 100, 80), formatter=format_product,
+                                  bg="#f0f0f0")
+        self.notebook.add(self.records, text="Products")
+        self.records.tree.bind("<<TreeviewSelect>>", self.record_selected)
+
+        # Text widget with scrollbar for statistics reports
+        text_frame = self.report_tab = tk.Frame(self.notebook, bg="#f0f0f0")
+        self.notebook.add(text_frame, text="Reports")
 
         self.txt_records = tk.Text(text_frame, height=12, font=("Consolas", 10), 
                                   bg="white", fg=self.dark_color, relief="solid", bd=1)
@@ -282,331 +365,397 @@ class InventoryManagementSystem:
         
         self.txt_records.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
-        
-        self.txt_records.insert(tk.END, "No products found. Add some products to get started!")
+
+        # Status line for export/import messages
+        self.status = tk.StringVar()
+        tk.Label(record_frame, textvariable=self.status, font=self.label_font, anchor="w",
+                 bg="#f0f0f0", fg=self.dark_color).pack(fill="x", padx=10, pady=(2, 5))
 
     # ================= Functions =================
+    @profiled
     def add_product(self):
         if self.product_id.get() == "" or self.name.get() == "":
             messagebox.showerror("Error", "Product ID and Name are required!")
             return
 
-        conn = sqlite3.connect("inventory.db")
-        cur = conn.cursor()
         try:
-            cur.execute("INSERT INTO products VALUES (?, ?, ?, ?, ?)",
-                        (self.product_id.get(), self.name.get(), self.category.get(),
-                         float(self.price.get()), int(self.stock.get())))
-            conn.commit()
+            row = (self.product_id.get(), self.name.get(), self.category.get(),
+                   float(self.price.get()), int(self.stock.get()))
+            add_product(row)
             messagebox.showinfo("Success", "Product added successfully!")
-            self.show_all()
+            self.changes.publish("insert", row[0], row)
             if self.auto_update_var.get():
-                self.export_to_txt()
-                self.export_to_csv()
+                self.exporter.request("changes")
         except sqlite3.IntegrityError:
             messagebox.showerror("Error", "Product ID already exists!")
         except ValueError:
             messagebox.showerror("Error", "Invalid price or stock quantity!")
-        conn.close()
 
+    @profiled
     def update_product(self):
         if self.product_id.get() == "":
             messagebox.showerror("Error", "Product ID is required to update!")
             return
             
-        conn = sqlite3.connect("inventory.db")
-        cur = conn.cursor()
-        cur.execute("""UPDATE products SET name=?, category=?, price=?, stock=? WHERE product_id=?""",
-                    (self.name.get(), self.category.get(), float(self.price.get()), int(self.stock.get()), self.product_id.get()))
-        conn.commit()
-        conn.close()
+        row = (self.product_id.get(), self.name.get(), self.category.get(),
+               float(self.price.get()), int(self.stock.get()))
+        version = self.loaded_version()
+        try:
+            old = update_product(row, version)
+        except StaleRowError as e:
+            self.stale(e)
+            return
+        if version is not None:
+            self.loaded = (row[0], version + 1)
         messagebox.showinfo("Success", "Product updated successfully!")
-        self.show_all()
+        if old:
+            self.changes.publish("update", row[0], row, old)
         if self.auto_update_var.get():
-            self.export_to_txt()
-            self.export_to_csv()
+            self.exporter.request("changes")
 
+    @profiled
     def delete_product(self):
         if self.product_id.get() == "":
             messagebox.showerror("Error", "Product ID is required to delete!")
             return
             
-        conn = sqlite3.connect("inventory.db")
-        cur = conn.cursor()
-        cur.execute("DELETE FROM products WHERE product_id=?", (self.product_id.get(),))
-        conn.commit()
-        conn.close()
+        old = delete_product(self.product_id.get())
         messagebox.showinfo("Success", "Product deleted successfully!")
-        self.show_all()
+        if old:
+            self.changes.publish("delete", old[0], None, old)
         if self.auto_update_var.get():
-            self.export_to_txt()
-            self.export_to_csv()
+            self.exporter.request("changes")
 
+    @profiled
     def update_stock(self):
         if self.product_id.get() == "":
             messagebox.showerror("Error", "Product ID is required to update stock!")
             return
             
-        conn = sqlite3.connect("inventory.db")
-        cur = conn.cursor()
-        cur.execute("UPDATE products SET stock=? WHERE product_id=?",
-                    (int(self.stock.get()), self.product_id.get()))
-        conn.commit()
-        conn.close()
+        stock = int(self.stock.get())
+        version = self.loaded_version()
+        try:
+            old = set_stock(self.product_id.get(), stock, version)
+        except StaleRowError as e:
+            self.stale(e)
+            return
+        if version is not None:
+            self.loaded = (self.product_id.get(), version + 1)
         messagebox.showinfo("Success", "Stock updated successfully!")
-        self.show_all()
+        if old:
+            self.changes.publish("update", old[0], old[:4] + (stock,), old)
+        if self.auto_update_var.get():
+            self.exporter.request("changes")
+
+    @profiled
+    def adjust_stock(self):
+        # Adds the Stock field (negative to remove) to the current stock, so
+        # concurrent receipts add up instead of overwriting each other
+        if self.product_id.get() == "":
+            messagebox.showerror("Error", "Product ID is required to adjust stock!")
+            return
+        try:
+            delta = int(self.stock.get())
+            adjust_stock([(self.product_id.get(), delta)], check_negative=True)
+        except AdjustmentError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        except ValueError:
+            messagebox.showerror("Error", "Invalid stock quantity!")
+            return
+        row, version = fetch_product_version(self.product_id.get())
+        if self.loaded_version() is not None:
+            self.loaded = (row[0], version)
+        messagebox.showinfo("Success", f"Stock is now {row[4]}.")
+        self.changes.publish("update", row[0], row, row[:4] + (row[4] - delta,))
+        if self.auto_update_var.get():
+            self.exporter.request("changes")
+
+    @profiled
+    def apply_stock_movements(self):
+        # A goods receipt or pick list (Product ID,Quantity) in one transaction
+        filename = filedialog.askopenfilename(
+            title="Select stock movements CSV",
+            filetypes=(("CSV files", "*.csv"), ("All files", "*.*"))
+        )
+        if not filename:
+            return
+        try:
+            stats = adjust_stock_csv(filename, check_negative=True)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Error", f"No stock was changed: {str(e)}")
+            return
+        self.status.set(stats.summary("products"))
+        messagebox.showinfo("Success", stats.summary("products"))
+        self.changes.publish("reload")
         if self.auto_update_var.get():
-            self.export_to_txt()
-            self.export_to_csv()
+            self.exporter.request("changes")
+
+    @profiled
+    def record_selected(self, event):
+        key = self.records.selected_key()
+        if key is not None:
+            self.load_product(key)
+
+    def load_product(self, product_id):
+        # Fill the form from the database and remember the row's version
+        row, version = fetch_product_version(product_id)
+        self.loaded = (row[0], version) if row else None
+        if row:
+            for var, value in zip((self.product_id, self.name, self.category, self.price, self.stock), row):
+                var.set("" if value is None else value)
+
+    def loaded_version(self):
+        # Version to check an update against: only if the form still shows
+        # the product that was loaded into it
+        if self.loaded and self.loaded[0] == self.product_id.get():
+            return self.loaded[1]
+        return None
+
+    def stale(self, error):
+        messagebox.showerror("Error", f"{error}.\nThe form now shows the current values.")
+        self.load_product(self.product_id.get())
 
     def clear_fields(self):
+        self.loaded = None
         self.product_id.set("")
         self.name.set("")
         self.category.set("")
         self.price.set("")
         self.stock.set("")
 
-    def search_product(self):
-        conn = sqlite3.connect("inventory.db")
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM products WHERE product_id=? OR name=?", (self.search.get(), self.search.get()))
-        rows = cur.fetchall()
-        conn.close()
-
-        self.txt_records.delete(1.0, tk.END)
-        if rows:
-            for row in rows:
-                self.txt_records.insert(tk.END, f"ID: {row[0]} | Name: {row[1]} | Category: {row[2]} | Price: ${row[3]:.2f} | Stock: {row[4]}\n")
+    @profiled
+    def search_typed(self, *args):
+        # Cached queries show at once; others wait for a pause in typing
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+            self.search_job = None
+        if not self.search.get().strip():
+            self.show_products()
+        elif self.search_cache.get(self.search.get()) is not None:
+            self.search_product()
         else:
-            self.txt_records.insert(tk.END, "No records found.\n")
+            self.search_job = self.root.after(SEARCH_DELAY_MS, self.search_product)
 
+    @profiled
+    def search_product(self):
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+            self.search_job = None
+        rows = self.search_cache.lookup(self.search.get())
+        self.notebook.select(self.records)
+        self.records.show(rows, empty_text="No records found.")
+
+    @profiled
     def filter_by_category(self):
-        conn = sqlite3.connect("inventory.db")
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM products WHERE category=?", (self.filter_category.get(),))
-        rows = cur.fetchall()
-        conn.close()
-
-        self.txt_records.delete(1.0, tk.END)
-        if rows:
-            for row in rows:
-                self.txt_records.insert(tk.END, f"ID: {row[0]} | Name: {row[1]} | Category: {row[2]} | Price: ${row[3]:.2f} | Stock: {row[4]}\n")
-        else:
-            self.txt_records.insert(tk.END, "No products found in this category.\n")
-
+        category = self.filter_category.get()
+        self.notebook.select(self.records)
+        self.records.load(lambda key, limit: fetch_products_after(key, limit, category),
+                          lambda key, limit: fetch_products_before(key, limit, category),
+                          empty_text="No products found in this category.",
+                          accepts=lambda row: row[2] == category)
+
+    @profiled
     def show_all(self):
-        conn = sqlite3.connect("inventory.db")
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM products")
-        rows = cur.fetchall()
-        conn.close()
-
-        # Update category list in dropdown
-        categories = list(set(row[2] for row in rows if row[2]))  # Filter out None/empty categories
-        self.category_cb['values'] = categories
-
-        self.txt_records.delete(1.0, tk.END)
-        if rows:
-            for row in rows:
-                self.txt_records.insert(tk.END, f"ID: {row[0]} | Name: {row[1]} | Category: {row[2]} | Price: ${row[3]:.2f} | Stock: {row[4]}\n")
+        # Full refresh: rebuild the category list and reload the first page
+        # (and forget cached searches, which may predate other instances' writes)
+        self.search_cache.clear()
+        self.categories.reset(category_counts())
+        self.category_cb['values'] = self.categories.values()
+        self.show_products()
+
+    def show_products(self):
+        self.notebook.select(self.records)
+        self.records.load(fetch_products_after, fetch_products_before,
+                          empty_text="No products found. Add some products to get started!")
+
+    def apply_change(self, change):
+        if change.op == "reload":
+            self.show_all()
+            return
+        if self.categories.apply(change):
+            self.category_cb['values'] = self.categories.values()
+        if change.op == "delete":
+            self.records.remove(change.key)
         else:
-            self.txt_records.insert(tk.END, "No products found. Add some products to get started!\n")
+            self.records.upsert(change.row)
 
     # ================= Statistics =================
+    @profiled
     def low_stock_alert(self):
-        conn = sqlite3.connect("inventory.db")
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM products WHERE stock < 5")
-        rows = cur.fetchall()
-        conn.close()
-
-        self.txt_records.delete(1.0, tk.END)
-        if rows:
-            self.txt_records.insert(tk.END, "⚠ Low Stock Products (<5 units):\n\n")
-            for row in rows:
-                self.txt_records.insert(tk.END, f"ID: {row[0]} | Name: {row[1]} | Stock: {row[4]}\n")
-        else:
-            self.txt_records.insert(tk.END, "All products have sufficient stock.\n")
-
+        rows = stock_alerts()
+
+        with PROFILER.phase(RENDER):
+            self.notebook.select(self.report_tab)
+            self.txt_records.delete(1.0, tk.END)
+            if rows:
+                self.txt_records.insert(tk.END, "⚠ Low Stock Products (below their reorder point):\n\n")
+                for seq, threshold, raised_at, *row in rows:
+                    self.txt_records.insert(tk.END, f"ID: {row[0]} | Name: {row[1]} | Stock: {row[4]} "
+                                                    f"| Reorder Point: {threshold} | Since: {raised_at}\n")
+            else:
+                self.txt_records.insert(tk.END, "All products have sufficient stock.\n")
+
+    @profiled
     def category_summary(self):
-        conn = sqlite3.connect("inventory.db")
-        cur = conn.cursor()
-        cur.execute("SELECT category, COUNT(*), SUM(stock) FROM products GROUP BY category")
-        rows = cur.fetchall()
-        conn.close()
+        rows = category_summary()
 
-        self.txt_records.delete(1.0, tk.END)
-        self.txt_records.insert(tk.END, "📊 Category Summary:\n\n")
-        for row in rows:
-            self.txt_records.insert(tk.END, f"Category: {row[0]} | Products: {row[1]} | Total Stock: {row[2] or 0}\n")
+        with PROFILER.phase(RENDER):
+            self.notebook.select(self.report_tab)
+            self.txt_records.delete(1.0, tk.END)
+            self.txt_records.insert(tk.END, "📊 Category Summary:\n\n")
+            for row in rows:
+                self.txt_records.insert(tk.END, f"Category: {row[0]} | Products: {row[1]} | Total Stock: {row[2] or 0}\n")
 
+    @profiled
     def inventory_value(self):
-        conn = sqlite3.connect("inventory.db")
-        cur = conn.cursor()
-        cur.execute("SELECT SUM(price * stock) FROM products")
-        total_value = cur.fetchone()[0]
-        conn.close()
+        total_value = inventory_value()
+
+        with PROFILER.phase(RENDER):
+            self.notebook.select(self.report_tab)
+            self.txt_records.delete(1.0, tk.END)
+            self.txt_records.insert(tk.END, f"💰 Total Inventory Value: ${total_value:.2f}\n")
+
+    # ================= Stock Alerts =================
+    def check_alerts(self, change):
+        # Runs after every published edit or import; reads nothing unless a
+        # product has just dropped below its reorder point
+        rows = stock_alerts_after(self.alert_seq)
+        if not rows:
+            return
+        self.alert_seq = rows[-1][0]
+        lines = [f"{row[3]} {row[4]}: {row[7]} left (reorder point {row[1]})" for row in rows[:10]]
+        if len(rows) > 10:
+            lines.append(f"... and {len(rows) - 10} more")
+        self.status.set(f"⚠ {len(rows)} product(s) fell below their reorder point")
+        messagebox.showwarning("Low Stock", "\n".join(lines))
+
+    @profiled
+    def set_product_reorder_point(self):
+        if self.product_id.get() == "":
+            messagebox.showerror("Error", "Product ID is required to set its reorder point!")
+            return
+        self.save_reorder_point("product", self.product_id.get())
+
+    @profiled
+    def set_category_reorder_point(self):
+        if self.category.get() == "":
+            messagebox.showerror("Error", "Category is required to set its reorder point!")
+            return
+        self.save_reorder_point("category", self.category.get())
 
-        self.txt_records.delete(1.0, tk.END)
-        self.txt_records.insert(tk.END, f"💰 Total Inventory Value: ${total_value if total_value else 0:.2f}\n")
+    def save_reorder_point(self, scope, key):
+        # An empty reorder point removes it, falling back to the wider one
+        try:
+            threshold = int(self.reorder_point.get()) if self.reorder_point.get() else None
+        except ValueError:
+            messagebox.showerror("Error", "Invalid reorder point!")
+            return
+        set_reorder_point(scope, key, threshold)
+        self.status.set(f"Reorder point for {scope} {key}: {threshold if threshold is not None else 'default'}")
+        self.check_alerts(None)
 
     # ================= File Operations =================
+    @profiled
     def export_to_txt(self):
-        try:
-            conn = sqlite3.connect("inventory.db")
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM products")
-            rows = cur.fetchall()
-            conn.close()
-            
-            # Create filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"inventory_export_{timestamp}.txt"
-            
-            with open(filename, "w") as f:
-                f.write("INVENTORY REPORT\n")
-                f.write("=" * 50 + "\n")
-                f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                
-                if rows:
-                    f.write(f"{'ID':<10} {'Name':<20} {'Category':<15} {'Price':<10} {'Stock':<10}\n")
-                    f.write("-" * 75 + "\n")
-                    for row in rows:
-                        f.write(f"{row[0]:<10} {row[1]:<20} {row[2]:<15} ${row[3]:<9.2f} {row[4]:<10}\n")
-                    
-                    # Add summary
-                    total_products = len(rows)
-                    total_value = sum(row[3] * row[4] for row in rows)
-                    f.write("\n" + "=" * 75 + "\n")
-                    f.write(f"Total Products: {total_products}\n")
-                    f.write(f"Total Inventory Value: ${total_value:.2f}\n")
-                else:
-                    f.write("No products found in inventory.\n")
-            
-            self.txt_records.insert(tk.END, f"\n✅ Exported data to {filename}\n")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export to TXT: {str(e)}")
+        self.exporter.request("txt")
 
+    @profiled
     def export_to_csv(self):
-        try:
-            conn = sqlite3.connect("inventory.db")
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM products")
-            rows = cur.fetchall()
-            conn.close()
-            
-            # Create filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"inventory_export_{timestamp}.csv"
-            
-            with open(filename, "w", newline="") as f:
-                writer = csv.writer(f)
-                # Write header
-                writer.writerow(["Product ID", "Name", "Category", "Price", "Stock"])
-                # Write data
-                writer.writerows(rows)
-            
-            self.txt_records.insert(tk.END, f"✅ Exported data to {filename}\n")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export to CSV: {str(e)}")
+        self.exporter.request("csv")
 
+    def export_done(self, filenames):
+        filenames = [f for f in filenames if f]  # None: no changes to export
+        if filenames:
+            self.status.set(f"✅ Exported data to {', '.join(filenames)}")
+
+    def export_failed(self, error):
+        messagebox.showerror("Error", f"Failed to export: {str(error)}")
+
+    @profiled
     def import_from_txt(self):
         try:
             filename = filedialog.askopenfilename(
                 title="Select TXT file",
-                filetypes=(("Text files", "*.txt"), ("All files", "*.*"))
+                filetypes=(("Text files", ("*.txt", "*.txt.gz")), ("All files", "*.*"))
             )
             
             if not filename:
                 return
                 
-            with open(filename, "r") as f:
-                lines = f.readlines()
-            
-            # Parse the file and add products to database
-            conn = sqlite3.connect("inventory.db")
-            cur = conn.cursor()
-            
-            imported_count = 0
-            for line in lines:
-                # Skip header lines
-                if line.startswith("=") or line.startswith("INVENTORY") or line.startswith("Generated") or not line.strip():
-                    continue
-                    
-                # Skip summary lines
-                if line.startswith("Total") or line.startswith("-"):
-                    continue
-                    
-                # Parse product lines (this is a simplified parser)
-                parts = line.split()
-                if len(parts) >= 5 and parts[0] != "ID":
-                    try:
-                        product_id = parts[0]
-                        # Check if product already exists
-                        cur.execute("SELECT * FROM products WHERE product_id=?", (product_id,))
-                        if not cur.fetchone():
-                            # Add new product (simplified - would need more robust parsing in real app)
-                            pass
-                    except:
-                        continue
-            
-            conn.commit()
-            conn.close()
-            
-            messagebox.showinfo("Success", f"Imported data from TXT file. Please review and adjust as needed.")
-            self.show_all()
+            # Parse the report line by line and insert in one transaction
+            self.start_import(self.import_txt_btn, "import_txt",
+                              lambda report, cancelled: import_products_txt(filename, report, cancelled))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to import from TXT: {str(e)}")
 
+    def start_import(self, button, name, job):
+        # Run `job` in the background; its button becomes a Cancel button
+        text, command = button.cget("text"), button.cget("command")
+        self.import_task = BackgroundTask(self.root, job, on_progress=self.import_progress,
+                                          on_done=self.import_done, on_error=self.import_failed,
+                                          name=name)
+        self.import_restore = lambda: button.config(text=text, command=command)
+        button.config(text="Cancel Import", command=self.import_task.cancel)
+        self.import_task.start()
+
+    def import_progress(self, fraction, stats):
+        self.status.set(f"Importing... {fraction:.0%} ({stats.inserted} inserted)")
+
+    @profiled
+    def import_done(self, stats):
+        self.import_restore()
+        self.status.set(stats.summary("products"))
+        messagebox.showinfo("Success", stats.summary("products"))
+        self.changes.publish("reload")
+        if self.auto_update_var.get():
+            self.exporter.request("changes")
+
+    def import_failed(self, error):
+        self.import_restore()
+        messagebox.showerror("Error", f"Failed to import: {str(error)}")
+
+    @profiled
     def import_from_csv(self):
         try:
             filename = filedialog.askopenfilename(
                 title="Select CSV file",
-                filetypes=(("CSV files", "*.csv"), ("All files", "*.*"))
+                filetypes=(("CSV files", ("*.csv", "*.csv.gz")), ("All files", "*.*"))
             )
             
             if not filename:
                 return
                 
-            with open(filename, "r") as f:
-                reader = csv.reader(f)
-                next(reader)  # Skip header row
-                
-                conn = sqlite3.connect("inventory.db")
-                cur = conn.cursor()
-                
-                imported_count = 0
-                for row in reader:
-                    if len(row) >= 5:
-                        try:
-                            cur.execute("INSERT OR IGNORE INTO products VALUES (?, ?, ?, ?, ?)",
-                                      (row[0], row[1], row[2], float(row[3]), int(row[4])))
-                            imported_count += 1
-                        except:
-                            continue
-                
-                conn.commit()
-                conn.close()
-            
-            messagebox.showinfo("Success", f"Imported {imported_count} products from CSV file.")
-            self.show_all()
-            if self.auto_update_var.get():
-                self.export_to_txt()
-                self.export_to_csv()
+            # Stream the file in batches on a background thread
+            self.start_import(self.import_csv_btn, "import_csv",
+                              lambda report, cancelled: import_products_csv(filename, report, cancelled))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to import from CSV: {str(e)}")
 
+    def show_timings(self):
+        # Live latency statistics of the handlers (see stats_panel.py)
+        if self.timings is None or not self.timings.winfo_exists():
+            self.timings = StatsPanel(self.root)
+        self.timings.lift()
+
     def setup_auto_save(self):
         # Auto-save every 5 minutes
         self.root.after(300000, self.auto_save_files)
 
+    @profiled
     def auto_save_files(self):
-        if self.auto_update_var.get():
-            self.export_to_txt()
-            self.export_to_csv()
+        # A no-op unless rows changed since the last export (also across
+        # restarts): the check reads one counter
+        if self.auto_update_var.get() and changes_pending():
+            self.exporter.request("changes")
         # Schedule next auto-save
         self.root.after(300000, self.auto_save_files)
 
+    def on_close(self):
+        # Let a pending export finish before the window goes away
+        self.exporter.stop()
+        self.root.destroy()
+
 # ================= Run App =================
 if __name__ == "__main__":
     root = tk.Tk()
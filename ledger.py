@@ -0,0 +1,127 @@
+# ================== Stock Movement Ledger ==================
+# An append-only history of every change to an item's stock, written by
+# triggers on the base table, so it also covers stock changed by imports,
+# restores, batch adjustments and other app instances. <table>_ledger
+# holds one row per movement: the item, the movement's number n among the
+# item's movements, the quantity added (negative for removals) and when
+# (UTC, like CURRENT_TIMESTAMP). The table is clustered on (item, n), so
+# appending a movement writes one page and an item's history is stored
+# contiguously. Adding a row counts as
+# moving its stock in, deleting it as moving it out, and changing a row's
+# ID as moving the stock from the old ID to the new one.
+#
+# Every `every` movements of an item the triggers also write a snapshot
+# row with the item's stock after that movement. Stock at any past moment is
+# then the last snapshot before it plus the movements after that
+# snapshot, at most `every` of them, instead of a replay of the item's
+# whole history:
+#
+#   <table>_ledger            item, n, delta, at
+#   <table>_ledger_snapshots  item, at, n, stock   (one per `every` moves)
+#
+# Time is assumed to run forward with n (one machine's clock). rebuild()
+# recomputes the snapshots from the ledger itself, e.g. after changing
+# `every`.
+
+SNAPSHOT_EVERY = 100
+
+
+class StockLedger:
+    def __init__(self, table, key, stock, every=SNAPSHOT_EVERY):
+        self.table = table
+        self.key = key
+        self.stock = stock
+        self.every = every
+        self.ledger_table = f"{table}_ledger"
+        self.snapshots_table = f"{table}_ledger_snapshots"
+
+    # ---------- Schema ----------
+    def install(self, conn):
+        t, k, s, ledger = self.table, self.key, self.stock, self.ledger_table
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (ledger,)).fetchone()
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {ledger} (
+                item TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                delta INTEGER NOT NULL,
+                at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (item, n)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS {self.snapshots_table} (
+                item TEXT NOT NULL,
+                at TEXT NOT NULL,
+                n INTEGER NOT NULL,
+                stock INTEGER NOT NULL,
+                PRIMARY KEY (item, at, n)
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER IF NOT EXISTS {ledger}_insert AFTER INSERT ON {t}
+            WHEN IFNULL(NEW.{s}, 0) <> 0
+            BEGIN {self._move(f"NEW.{k}", f"NEW.{s}", f"NEW.{s}")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {ledger}_update AFTER UPDATE OF {s} ON {t}
+            WHEN OLD.{k} IS NEW.{k} AND IFNULL(OLD.{s}, 0) <> IFNULL(NEW.{s}, 0)
+            BEGIN {self._move(f"NEW.{k}", f"IFNULL(NEW.{s}, 0) - IFNULL(OLD.{s}, 0)", f"NEW.{s}")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {ledger}_rekey AFTER UPDATE OF {k} ON {t}
+            WHEN OLD.{k} IS NOT NEW.{k}
+            BEGIN {self._move(f"OLD.{k}", f"-OLD.{s}", "0")}
+                  {self._move(f"NEW.{k}", f"NEW.{s}", f"NEW.{s}")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {ledger}_delete AFTER DELETE ON {t}
+            WHEN IFNULL(OLD.{s}, 0) <> 0
+            BEGIN {self._move(f"OLD.{k}", f"-OLD.{s}", "0")}
+            END;
+        """)
+        if not exists:
+            # Stock that was there before the ledger becomes an opening movement
+            conn.execute(f"""INSERT INTO {ledger} (item, n, delta)
+                             SELECT {k}, 1, {s} FROM {t} WHERE IFNULL({s}, 0) <> 0 ORDER BY {k}""")
+            self.rebuild(conn)
+
+    def _move(self, item, delta, stock):
+        # Append one movement (skipped when delta is 0) and, if it is the
+        # item's every-th, a snapshot of `stock`
+        ledger = self.ledger_table
+        last = f"(SELECT MAX(n) FROM {ledger} WHERE item = {item})"
+        return f"""
+                INSERT INTO {ledger} (item, n, delta)
+                SELECT {item}, IFNULL({last}, 0) + 1, IFNULL({delta}, 0)
+                WHERE IFNULL({delta}, 0) <> 0;
+                INSERT INTO {self.snapshots_table} (item, at, n, stock)
+                SELECT item, at, n, IFNULL({stock}, 0) FROM {ledger}
+                WHERE item = {item} AND n = {last}
+                  AND n % {int(self.every)} = 0 AND IFNULL({delta}, 0) <> 0;"""
+
+    def rebuild(self, conn):
+        # Recompute every snapshot from the ledger
+        conn.execute(f"DELETE FROM {self.snapshots_table}")
+        conn.execute(f"""
+            INSERT INTO {self.snapshots_table} (item, at, n, stock)
+            SELECT item, at, n, stock FROM (
+                SELECT item, at, n, SUM(delta) OVER (PARTITION BY item ORDER BY n) AS stock
+                FROM {self.ledger_table}
+            ) WHERE n % {int(self.every)} = 0""")
+
+    # ---------- Queries ----------
+    def stock_at(self, conn, item, when):
+        # Stock of `item` at UTC time `when` ('YYYY-MM-DD HH:MM:SS'): 0
+        # before its first movement and after it was deleted
+        snap = conn.execute(f"""SELECT n, stock FROM {self.snapshots_table}
+                                WHERE item = ? AND at <= ? ORDER BY at DESC, n DESC LIMIT 1""",
+                            (item, when)).fetchone()
+        after = conn.execute(f"""SELECT n FROM {self.snapshots_table}
+                                 WHERE item = ? AND at > ? ORDER BY at, n LIMIT 1""",
+                             (item, when)).fetchone()
+        start, stock = snap or (0, 0)
+        # Only the movements between the two snapshots are read
+        (delta,) = conn.execute(f"""SELECT SUM(delta) FROM {self.ledger_table}
+                                    WHERE item = ? AND n > ? AND n < ? AND at <= ?""",
+                                (item, start, after[0] if after else 1 << 62, when)).fetchone()
+        return stock + (delta or 0)
+
+    def movements(self, conn, item, limit=50):
+        # The item's latest movements, newest first: [(n, at, delta)]
+        return conn.execute(f"""SELECT n, at, delta FROM {self.ledger_table}
+                                WHERE item = ? ORDER BY n DESC LIMIT ?""", (item, limit)).fetchall()
@@ -0,0 +1,288 @@
+import cProfile
+import functools
+import io
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# ================== Operation Profiler ==================
+# Times what the apps do, per operation (a button handler, a grid page, an
+# export run), and splits each operation's time into phases:
+#
+#   handler  the operation's own Python code
+#   sql      statements and fetches on a db connection
+#   render   Treeview and Text updates
+#   io       writing export files
+#   dialog   waiting for the user in a modal dialog (not counted as latency)
+#
+# Phases nest and are exclusive: entering one pauses the one around it, so
+# an operation's phases add up to its total. State is per thread, so an
+# import on a background thread is its own operation. Outside any
+# operation (CLI, benchmarks) a phase costs one thread-local lookup.
+#
+# Every operation and phase keeps a rolling histogram of its latest
+# WINDOW samples. stats() summarizes them, dump() writes them as JSON and
+# stats_panel.py shows them live.
+#
+#   APP_PROFILE=show_all        run the next show_all under cProfile and
+#                               write profile_show_all_<time>.prof
+#   APP_PROFILE_JSON=stats.json dump the statistics there at exit
+
+HANDLER = "handler"
+SQL = "sql"
+RENDER = "render"
+IO = "io"
+DIALOG = "dialog"
+PHASES = (HANDLER, SQL, RENDER, IO, DIALOG)
+TOTAL = "total"
+
+WINDOW = 1000               # samples kept per histogram
+BUCKETS_PER_OCTAVE = 4      # histogram resolution: buckets grow by 2**(1/4)
+MIN_SECONDS = 1e-6          # lower edge of the first bucket
+
+
+class LatencyHistogram:
+    # Log-scaled bucket counts over the latest WINDOW samples, plus the
+    # samples themselves for exact percentiles
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.counts = {}
+        self.total_count = 0
+        self.total_seconds = 0.0
+
+    @staticmethod
+    def bucket(seconds):
+        if seconds <= MIN_SECONDS:
+            return 0
+        return int(math.log2(seconds / MIN_SECONDS) * BUCKETS_PER_OCTAVE) + 1
+
+    def add(self, seconds):
+        if len(self.samples) == self.samples.maxlen:
+            old = self.bucket(self.samples[0])
+            self.counts[old] -= 1
+            if not self.counts[old]:
+                del self.counts[old]
+        self.samples.append(seconds)
+        b = self.bucket(seconds)
+        self.counts[b] = self.counts.get(b, 0) + 1
+        self.total_count += 1
+        self.total_seconds += seconds
+
+    def summary(self):
+        # Milliseconds over the window; count and total cover all samples
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": self.total_count}
+
+        def pct(p):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+        return {
+            "count": self.total_count,
+            "total_ms": self.total_seconds * 1000,
+            "window": len(ordered),
+            "mean_ms": sum(ordered) / len(ordered) * 1000,
+            "p50_ms": pct(0.50),
+            "p90_ms": pct(0.90),
+            "p99_ms": pct(0.99),
+            "max_ms": ordered[-1] * 1000,
+            # {upper edge in ms: samples}, non-empty buckets only
+            "buckets": {f"{MIN_SECONDS * 2 ** (b / BUCKETS_PER_OCTAVE) * 1000:.4g}": n
+                        for b, n in sorted(self.counts.items())},
+        }
+
+
+class _Frame:
+    # The running operation of one thread: a stack of [phase, started]
+    # and the seconds charged to each phase so far
+    __slots__ = ("name", "stack", "spent")
+
+    def __init__(self, name, phase, now):
+        self.name = name
+        self.stack = [[phase, now]]
+        self.spent = dict.fromkeys(PHASES, 0.0)
+
+    def switch(self, now):
+        # Charge the time since the last switch to the current phase
+        top = self.stack[-1]
+        self.spent[top[0]] += now - top[1]
+        top[1] = now
+
+
+class _Phase:
+    __slots__ = ("frame", "name")
+
+    def __init__(self, frame, name):
+        self.frame = frame
+        self.name = name
+
+    def __enter__(self):
+        now = time.perf_counter()
+        self.frame.switch(now)
+        self.frame.stack.append([self.name, now])
+
+    def __exit__(self, *exc):
+        now = time.perf_counter()
+        self.frame.switch(now)
+        self.frame.stack.pop()
+        self.frame.stack[-1][1] = now
+
+
+class _NoPhase:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+class _State(threading.local):
+    frame = None        # the thread's running operation (class default: a
+                        # missing attribute would make every lookup raise)
+
+
+class _Operation:
+    def __init__(self, profiler, name, phase):
+        self.profiler = profiler
+        self.name = name
+        self.phase = phase
+        self.frame = None
+        self.nested = None
+        self.cprofile = None
+
+    def __enter__(self):
+        p = self.profiler
+        outer = p._local.frame
+        if outer is not None:
+            # Called from inside another operation: just a phase of it
+            self.nested = _Phase(outer, self.phase)
+            self.nested.__enter__()
+            return
+        if p.capture == self.name:
+            p.capture = None
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+        self.frame = p._local.frame = _Frame(self.name, self.phase, time.perf_counter())
+
+    def __exit__(self, *exc):
+        if self.nested is not None:
+            self.nested.__exit__()
+            return
+        frame = self.frame
+        frame.switch(time.perf_counter())
+        self.profiler._local.frame = None
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.profiler._save_profile(self.name, self.cprofile)
+        self.profiler.record(frame.name, frame.spent)
+
+
+class Profiler:
+    def __init__(self, capture=None):
+        self._local = _State()
+        self._lock = threading.Lock()
+        self.histograms = {}        # {operation: {TOTAL or phase: LatencyHistogram}}
+        self.capture = capture      # operation to run under cProfile once
+        self.profile_dir = "."
+
+    def operation(self, name, phase=HANDLER):
+        # Context manager timing one operation; inside another operation it
+        # only counts as `phase` of that one
+        return _Operation(self, name, phase)
+
+    def active(self):
+        # Whether this thread is inside a profiled operation
+        return self._local.frame is not None
+
+    def phase(self, name):
+        # Context manager charging the time inside to phase `name` of this
+        # thread's running operation, if there is one
+        frame = self._local.frame
+        return _NO_PHASE if frame is None else _Phase(frame, name)
+
+    def record(self, name, spent):
+        # spent: {phase: seconds} of one finished operation
+        with self._lock:
+            histograms = self.histograms.get(name)
+            if histograms is None:
+                histograms = self.histograms[name] = {TOTAL: LatencyHistogram()}
+            histograms[TOTAL].add(sum(spent.values()) - spent.get(DIALOG, 0.0))
+            for phase, seconds in spent.items():
+                if seconds:
+                    if phase not in histograms:
+                        histograms[phase] = LatencyHistogram()
+                    histograms[phase].add(seconds)
+
+    def stats(self):
+        # {operation: {"total" or phase: summary}}, slowest p99 first
+        with self._lock:
+            stats = {name: {key: h.summary() for key, h in histograms.items()}
+                     for name, histograms in self.histograms.items()}
+        return dict(sorted(stats.items(), key=lambda item: -item[1][TOTAL].get("p99_ms", 0)))
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+    def dump(self, path):
+        data = {"generated": datetime.now().isoformat(timespec="seconds"),
+                "window": WINDOW, "operations": self.stats()}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        return path
+
+    def _save_profile(self, name, prof):
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.profile_dir, f"profile_{name}_{stamp}.prof")
+        prof.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(prof, stream=text).sort_stats("cumulative").print_stats(25)
+        print(f"cProfile of {name} written to {path}\n{text.getvalue()}", file=sys.stderr)
+
+
+PROFILER = Profiler(capture=os.environ.get("APP_PROFILE") or None)
+
+if os.environ.get("APP_PROFILE_JSON"):
+    import atexit
+    atexit.register(PROFILER.dump, os.environ["APP_PROFILE_JSON"])
+
+
+def profiled(func=None, *, name=None, phase=HANDLER):
+    # Decorator: each call is an operation named after the function (or
+    # `name`), whose own code counts as `phase`
+    if func is None:
+        return functools.partial(profiled, name=name, phase=phase)
+    op = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with PROFILER.operation(op, phase):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class untimed:
+    # Stand-in for a module of modal dialogs (messagebox, filedialog):
+    # the time the user takes to answer is not counted as latency
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, name):
+        func = getattr(self._module, name)
+        if not callable(func):
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PROFILER.phase(DIALOG):
+                return func(*args, **kwargs)
+        return wrapper
@@ -0,0 +1,217 @@
+import bisect
+import math
+
+# ================== Quantile Sketches ==================
+# Approximate quantiles (median, p90, ...) of a numeric column, per group,
+# without sorting the rows. Values are counted in logarithmic buckets:
+# bucket k holds the values in (bounds[k-2], bounds[k-1]] with
+# bounds[i] = MIN_VALUE * gamma**i, so reporting a bucket's midpoint is off
+# by at most `accuracy` of the true value (relative error, like DDSketch).
+# Bucket 0 counts values <= 0 and NULL; values above MAX_VALUE share the
+# last bucket.
+#
+# A quantile falling between two values is interpolated between them, as
+# statistics.quantiles(method="inclusive") does.
+#
+# A sketch is just {bucket: count}, so sketches with the same accuracy
+# merge by adding counts: one per group can be combined into a sketch of
+# the whole table, or of several databases.
+#
+# QuantileSketch is the in-memory sketch. GroupQuantiles keeps one sketch
+# per group in a table, maintained by insert, update and delete triggers
+# on the base table:
+#
+#   <table>_<column>_sketch   group, bucket, n   (non-empty buckets only)
+#   <table>_<column>_bounds   upper, bucket      (bucket lookup for triggers)
+#
+# The triggers find a value's bucket with one seek in the bounds table
+# rather than with ln(), which not every SQLite build has.
+
+ACCURACY = 0.01         # relative error of a reported quantile
+MIN_VALUE = 0.01        # upper edge of the first bucket (one cent)
+MAX_VALUE = 1e12        # values above this all fall in the last bucket
+
+
+def bucket_bounds(accuracy=ACCURACY):
+    # Upper edges of buckets 1, 2, ...
+    gamma = (1 + accuracy) / (1 - accuracy)
+    count = math.ceil(math.log(MAX_VALUE / MIN_VALUE, gamma)) + 1
+    return [MIN_VALUE * gamma ** i for i in range(count)]
+
+
+class QuantileSketch:
+    def __init__(self, accuracy=ACCURACY, counts=None, bounds=None):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.bounds = bounds or bucket_bounds(accuracy)
+        self.counts = dict(counts or {})        # {bucket: values}
+
+    def bucket(self, value):
+        if value is None or value <= 0:
+            return 0
+        return bisect.bisect_left(self.bounds, value) + 1
+
+    def value(self, bucket):
+        # The value reported for a bucket: within `accuracy` of every
+        # value in it (clipped at the ends of the range)
+        if bucket <= 0:
+            return 0.0
+        if bucket == 1:
+            return MIN_VALUE / 2
+        upper = self.bounds[min(bucket, len(self.bounds)) - 1]
+        return 2 * upper / (self.gamma + 1)
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    def add(self, value, n=1):
+        b = self.bucket(value)
+        self.counts[b] = self.counts.get(b, 0) + n
+        if not self.counts[b]:
+            del self.counts[b]
+
+    def remove(self, value, n=1):
+        self.add(value, -n)
+
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError("cannot merge sketches of different accuracy")
+        for b, n in other.counts.items():
+            self.counts[b] = self.counts.get(b, 0) + n
+        return self
+
+    def quantile(self, q):
+        # Approximate q-quantile (0 <= q <= 1), or None when empty. Same
+        # definition as statistics.quantiles(method="inclusive"): linear
+        # interpolation between the values ranked just below and just
+        # above q * (count - 1). Both are within `accuracy` of the exact
+        # values at those ranks, so the result is within `accuracy` of the
+        # exact quantile.
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        low = math.floor(rank)
+        wanted = [low, min(low + 1, total - 1)]
+        found = []
+        seen = 0
+        for b in sorted(self.counts):
+            seen += self.counts[b]
+            while wanted and seen > wanted[0]:
+                found.append(self.value(b))
+                wanted.pop(0)
+            if not wanted:
+                break
+        below, above = found
+        return below + (above - below) * (rank - low)
+
+    def quantiles(self, qs):
+        return [self.quantile(q) for q in qs]
+
+
+class GroupQuantiles:
+    def __init__(self, table, group, column, accuracy=ACCURACY):
+        self.table = table
+        self.group = group
+        self.column = column
+        self.accuracy = accuracy
+        self.bounds = bucket_bounds(accuracy)
+        self.sketch_table = f"{table}_{column}_sketch"
+        self.bounds_table = f"{table}_{column}_bounds"
+
+    # ---------- Schema ----------
+    def install(self, conn):
+        t, g, sketch = self.table, self.group, self.sketch_table
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (sketch,)).fetchone()
+
+        def add(row):
+            return f"""
+                INSERT INTO {sketch} ({g}, bucket, n)
+                VALUES (COALESCE({row}.{g}, ''), {self._bucket(f"{row}.{self.column}")}, 1)
+                ON CONFLICT ({g}, bucket) DO UPDATE SET n = n + 1;"""
+
+        def remove(row):
+            where = f"{g} = COALESCE({row}.{g}, '') AND bucket = {self._bucket(f'{row}.{self.column}')}"
+            return f"""
+                UPDATE {sketch} SET n = n - 1 WHERE {where};
+                DELETE FROM {sketch} WHERE {where} AND n = 0;"""
+
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {sketch} (
+                {g} TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                n INTEGER NOT NULL,
+                PRIMARY KEY ({g}, bucket)
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS {self.bounds_table} (
+                upper REAL PRIMARY KEY,
+                bucket INTEGER NOT NULL
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER IF NOT EXISTS {sketch}_insert AFTER INSERT ON {t}
+            BEGIN {add("NEW")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {sketch}_update AFTER UPDATE OF {g}, {self.column} ON {t}
+            BEGIN {remove("OLD")} {add("NEW")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {sketch}_delete AFTER DELETE ON {t}
+            BEGIN {remove("OLD")}
+            END;
+        """)
+        if not exists:
+            conn.executemany(f"INSERT INTO {self.bounds_table} VALUES (?, ?)",
+                             ((upper, i) for i, upper in enumerate(self.bounds, 1)))
+            # Count the rows that were there before the sketch was
+            self.rebuild(conn)
+
+    def _bucket(self, value):
+        # SQL for the bucket of `value`, matching QuantileSketch.bucket()
+        return f"""(CASE WHEN IFNULL({value}, 0) <= 0 THEN 0
+                    ELSE IFNULL((SELECT bucket FROM {self.bounds_table} WHERE upper >= {value}
+                                 ORDER BY upper LIMIT 1), {len(self.bounds) + 1}) END)"""
+
+    def _recompute_sql(self):
+        return (f"SELECT COALESCE({self.group}, '') AS grp, {self._bucket(self.column)} AS b, COUNT(*) "
+                f"FROM {self.table} GROUP BY grp, b")
+
+    # ---------- Reads ----------
+    def empty(self):
+        # A sketch that merges with this one's
+        return QuantileSketch(self.accuracy, bounds=self.bounds)
+
+    def sketch(self, conn, group=None):
+        # QuantileSketch of one group, or of all groups merged
+        if group is None:
+            rows = conn.execute(f"SELECT bucket, SUM(n) FROM {self.sketch_table} GROUP BY bucket")
+        else:
+            rows = conn.execute(f"SELECT bucket, n FROM {self.sketch_table} WHERE {self.group} = ?",
+                                (group,))
+        sketch = self.empty()
+        sketch.counts.update(rows)
+        return sketch
+
+    def sketches(self, conn):
+        # {group: QuantileSketch} for every group
+        sketches = {}
+        for group, b, n in conn.execute(f"SELECT {self.group}, bucket, n FROM {self.sketch_table}"):
+            if group not in sketches:
+                sketches[group] = self.empty()
+            sketches[group].counts[b] = n
+        return sketches
+
+    # ---------- Consistency ----------
+    def check(self, conn):
+        # [(group, "bucket N", stored, recomputed)] for every disagreement,
+        # in the shape GroupAggregate.check() reports
+        stored = {(g, b): n for g, b, n in conn.execute(f"SELECT {self.group}, bucket, n "
+                                                        f"FROM {self.sketch_table}")}
+        actual = {(g, b): n for g, b, n in conn.execute(self._recompute_sql())}
+        return [(key[0], f"bucket {key[1]}", stored.get(key, 0), actual.get(key, 0))
+                for key in sorted(stored.keys() | actual.keys())
+                if stored.get(key, 0) != actual.get(key, 0)]
+
+    def rebuild(self, conn):
+        conn.execute(f"DELETE FROM {self.sketch_table}")
+        conn.execute(f"INSERT INTO {self.sketch_table} ({self.group}, bucket, n) {self._recompute_sql()}")
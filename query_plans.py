@@ -0,0 +1,63 @@
+import importlib
+import os
+import re
+import sys
+import tempfile
+
+import db
+
+# ================== Query Plan Regression Check ==================
+# Builds each app's schema in a scratch database and runs EXPLAIN QUERY
+# PLAN on every query in its QUERIES table. A query fails when any step
+# scans a table without an index; scanning a covering index is fine for
+# whole-table aggregates, and so is scanning one of the app's
+# SUMMARY_TABLES (one row per group).
+#
+#   python query_plans.py        exits 1 if any query regressed
+
+APPS = {
+    "employee": "employee_core",
+    "inventory": "inventory_core",
+}
+
+_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def load_app(name):
+    # The app's Tk-free core module (schema, queries, import/export)
+    return importlib.import_module(APPS[name])
+
+
+def full_scans(conn, sql):
+    params = (None,) * sql.count("?")
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [detail for *_, detail in plan if _FULL_SCAN.match(detail)]
+
+
+def check(directory):
+    failures = []
+    for name in APPS:
+        app = load_app(name)
+        app.DB_PATH = os.path.join(directory, f"{name}.db")
+        app.connect_db()
+        conn = db.get_connection(app.DB_PATH)
+        allowed = getattr(app, "SUMMARY_TABLES", ())
+        for query, sql in app.QUERIES.items():
+            for detail in full_scans(conn, sql):
+                if _FULL_SCAN.match(detail).group(1) not in allowed:
+                    failures.append(f"{name}.{query}: {detail}")
+        db.close_connection(app.DB_PATH)
+    return failures
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        failures = check(tmp)
+    for failure in failures:
+        print(f"FULL SCAN  {failure}")
+    print(f"{len(failures)} query plan regression(s)" if failures else "All query plans use indexes")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
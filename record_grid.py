@@ -0,0 +1,295 @@
+import bisect
+import tkinter as tk
+from tkinter import ttk
+
+from profiler import RENDER, profiled
+
+# ================== Virtualized Record Grid ==================
+# A ttk.Treeview that only ever holds a sliding window of rows. Pages are
+# pulled from a keyset source as the user scrolls towards either edge and
+# dropped again at the far edge, so first paint and memory depend on the
+# window size rather than on the size of the table.
+#
+# A source is a pair of callables taking (key, limit):
+#   fetch_after(key, limit)  -> rows with row key > key in ascending order
+#                               (key None means from the start)
+#   fetch_before(key, limit) -> rows with row key < key in descending order
+#                               (key None means from the end)
+# The first column of every row is its key.
+#
+# The pager bar below the grid jumps to the first, previous, next or last
+# page, or to the page starting at a typed key. Each jump replaces the
+# window with one keyset page, so it costs one index seek no matter how
+# far into the table it lands (no OFFSET scans).
+#
+# upsert()/remove() patch a single row in place, so a one-row edit costs
+# work proportional to the window, never to the table.
+#
+# Grid updates count as render time of the operation that asked for them;
+# paging and scrolling on their own are profiled operations.
+
+
+class RecordGrid(tk.Frame):
+    def __init__(self, parent, columns, widths=None, formatter=None,
+                 page_size=100, max_rows=500, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.page_size = page_size
+        self.max_rows = max(max_rows, 2 * page_size)
+        self.formatter = formatter or (lambda row: row)
+        self.fetch_after = None
+        self.fetch_before = None
+        self.accepts = None
+        self.empty_text = ""
+        self.more_after = False
+        self.more_before = False
+        self._keys = {}
+        self._busy = False
+        self._hold_before = False    # don't grow upwards right after a page jump
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
+        for col, width in zip(columns, widths or [120] * len(columns)):
+            self.tree.heading(col, text=col, anchor="w")
+            self.tree.column(col, width=width, anchor="w")
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+
+        bg = self.cget("bg")
+        self.pager = tk.Frame(self, bg=bg)
+        self.pager_buttons = {}
+        for name, text, command in (("first", "|< First", self.first_page),
+                                    ("previous", "< Prev", self.previous_page),
+                                    ("next", "Next >", self.next_page),
+                                    ("last", "Last >|", self.last_page)):
+            button = tk.Button(self.pager, text=text, command=command, font=("Arial", 9),
+                               relief="flat", padx=8, cursor="hand2")
+            button.pack(side="left", padx=2, pady=(4, 0))
+            self.pager_buttons[name] = button
+        self.seek_key = tk.StringVar()
+        tk.Label(self.pager, text="Go to ID:", font=("Arial", 9), bg=bg).pack(side="left", padx=(10, 2))
+        self.seek_entry = tk.Entry(self.pager, textvariable=self.seek_key, width=12)
+        self.seek_entry.pack(side="left", pady=(4, 0))
+        self.seek_entry.bind("<Return>", lambda e: self.seek(self.seek_key.get().strip()))
+        self.range_text = tk.StringVar()
+        tk.Label(self.pager, textvariable=self.range_text, font=("Arial", 9), fg="#7f8c8d",
+                 bg=bg).pack(side="right", padx=5)
+
+        # The pager is packed first so it keeps its row when the grid shrinks
+        self.pager.pack(side="bottom", fill="x")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.placeholder = tk.Label(self.tree, bg="white", fg="#7f8c8d", font=("Arial", 10))
+
+    # ---------- Public API ----------
+    @profiled(phase=RENDER)
+    def load(self, fetch_after, fetch_before=None, empty_text="", accepts=None):
+        # Show a paged source, starting from its first page. `accepts` tells
+        # upsert() whether a changed row still belongs to this view.
+        self.fetch_after = fetch_after
+        self.fetch_before = fetch_before
+        self.accepts = accepts
+        self.empty_text = empty_text
+        self.first_page()
+
+    @profiled(phase=RENDER)
+    def show(self, rows, empty_text=""):
+        # Show a fixed, already bounded list of rows (search results)
+        self.fetch_after = None
+        self.fetch_before = None
+        self.accepts = None
+        self.empty_text = empty_text
+        self._clear()
+        self._append(rows)
+        self._refresh_placeholder()
+
+    def row_count(self):
+        return len(self._keys)
+
+    def selected_key(self):
+        # Key of the selected row, or None
+        selection = self.tree.selection()
+        return self._keys.get(selection[0]) if selection else None
+
+    # ---------- Page controls ----------
+    @profiled(phase=RENDER)
+    def first_page(self):
+        if self.fetch_after is None:
+            return
+        rows = self.fetch_after(None, self.page_size)
+        self._show_page(rows, False, len(rows) == self.page_size)
+
+    @profiled(phase=RENDER)
+    def next_page(self):
+        items = self.tree.get_children()
+        if self.fetch_after is None or not items:
+            return
+        rows = self.fetch_after(self._keys[items[-1]], self.page_size)
+        if rows:
+            self._show_page(rows, True, len(rows) == self.page_size)
+
+    @profiled(phase=RENDER)
+    def previous_page(self):
+        items = self.tree.get_children()
+        if self.fetch_before is None or not items:
+            return
+        rows = self.fetch_before(self._keys[items[0]], self.page_size)
+        if rows:
+            self._show_page(rows[::-1], len(rows) == self.page_size, True)
+
+    @profiled(phase=RENDER)
+    def last_page(self):
+        if self.fetch_before is None:
+            return
+        rows = self.fetch_before(None, self.page_size)
+        self._show_page(rows[::-1], len(rows) == self.page_size, False)
+
+    @profiled(phase=RENDER)
+    def seek(self, key):
+        # The page starting at the first row whose key is >= `key`
+        if self.fetch_after is None or self.fetch_before is None or not key:
+            return
+        before = self.fetch_before(key, 1)
+        rows = self.fetch_after(before[0][0] if before else None, self.page_size)
+        if not rows:
+            self.last_page()    # past the last key
+            return
+        self._show_page(rows, bool(before), len(rows) == self.page_size)
+
+    def _show_page(self, rows, more_before, more_after):
+        self._clear()
+        self._append(rows)
+        self.more_before = more_before
+        self.more_after = more_after
+        # The page opens at its top; earlier rows are only pulled in once
+        # the user has scrolled down and comes back up
+        self._hold_before = more_before
+        self._refresh_placeholder()
+
+    @profiled(phase=RENDER)
+    def upsert(self, row):
+        iid = str(row[0])
+        if self.accepts is not None and not self.accepts(row):
+            self.remove(row[0])
+            return
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.formatter(row))
+            return
+        if self.fetch_after is None:
+            return  # fixed result lists only get patched, never grown
+        # New rows are placed only when they sort inside the loaded window;
+        # anything beyond it is picked up by the next page fetch.
+        keys = [self._keys[i] for i in self.tree.get_children()]
+        index = bisect.bisect_left(keys, row[0])
+        if (index == 0 and self.more_before) or (index == len(keys) and self.more_after):
+            return
+        self._insert(index, row)
+        self._refresh_placeholder()
+
+    @profiled(phase=RENDER)
+    def remove(self, key):
+        iid = str(key)
+        if self.tree.exists(iid):
+            self._drop((iid,))
+            self._refresh_placeholder()
+
+    # ---------- Window management ----------
+    def _clear(self):
+        self.tree.delete(*self.tree.get_children())
+        self._keys.clear()
+        self.more_after = False
+        self.more_before = False
+        self.tree.yview_moveto(0)
+
+    def _refresh_placeholder(self):
+        if not self._keys and self.empty_text:
+            self.placeholder.config(text=self.empty_text)
+            self.placeholder.place(relx=0.5, rely=0.5, anchor="center")
+        else:
+            self.placeholder.place_forget()
+        self._refresh_pager()
+
+    def _refresh_pager(self):
+        paged = self.fetch_after is not None
+        backward = paged and self.fetch_before is not None
+        for name, enabled in (("first", paged and self.more_before),
+                              ("previous", backward and self.more_before),
+                              ("next", paged and self.more_after),
+                              ("last", backward and self.more_after)):
+            self.pager_buttons[name].config(state="normal" if enabled else "disabled")
+        self.seek_entry.config(state="normal" if backward else "disabled")
+        items = self.tree.get_children()
+        self.range_text.set(f"{self._keys[items[0]]} - {self._keys[items[-1]]}" if paged and items else "")
+
+    def _insert(self, index, row):
+        iid = str(row[0])
+        self._keys[iid] = row[0]
+        self.tree.insert("", index, iid=iid, values=self.formatter(row))
+
+    def _append(self, rows):
+        for row in rows:
+            self._insert("end", row)
+
+    def _prepend(self, rows):
+        # `rows` arrive nearest-first (descending), so each goes to the top
+        for row in rows:
+            self._insert(0, row)
+
+    def _first_visible(self):
+        return round(self.tree.yview()[0] * len(self._keys))
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._busy or self.fetch_after is None:
+            return
+        if float(first) > 0.1:
+            self._hold_before = False
+        if float(last) >= 0.9 and self.more_after:
+            self._busy = True
+            self.after_idle(self._grow_after)
+        elif (float(first) <= 0.1 and self.more_before and not self._hold_before
+              and self.fetch_before is not None):
+            self._busy = True
+            self.after_idle(self._grow_before)
+
+    @profiled(name="scroll_down", phase=RENDER)
+    def _grow_after(self):
+        try:
+            items = self.tree.get_children()
+            if not items:
+                return
+            top = self._first_visible()
+            rows = self.fetch_after(self._keys[items[-1]], self.page_size)
+            self.more_after = len(rows) == self.page_size
+            self._append(rows)
+            overflow = len(self._keys) - self.max_rows
+            if overflow > 0:
+                self._drop(items[:overflow])
+                self.more_before = True
+                self.tree.yview_moveto(max(top - overflow, 0) / len(self._keys))
+            self._refresh_pager()
+        finally:
+            self._busy = False
+
+    @profiled(name="scroll_up", phase=RENDER)
+    def _grow_before(self):
+        try:
+            items = self.tree.get_children()
+            if not items:
+                return
+            top = self._first_visible()
+            rows = self.fetch_before(self._keys[items[0]], self.page_size)
+            self.more_before = len(rows) == self.page_size
+            self._prepend(rows)
+            overflow = len(self._keys) - self.max_rows
+            if overflow > 0:
+                self._drop(items[-overflow:])
+                self.more_after = True
+            self.tree.yview_moveto((top + len(rows)) / len(self._keys))
+            self._refresh_pager()
+        finally:
+            self._busy = False
+
+    def _drop(self, items):
+        self.tree.delete(*items)
+        for iid in items:
+            del self._keys[iid]
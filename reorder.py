@@ -0,0 +1,145 @@
+# ================== Reorder Points & Stock Alerts ==================
+# Reorder points can be set per item, per group (category) or as a
+# default; the most specific one applies. Triggers keep <table>_alerts
+# holding exactly the items whose stock is below their reorder point, so
+# the table works like a partial index on below-threshold rows (SQLite's
+# own partial indexes cannot look up a threshold in another table).
+#
+# An item gets a new alert sequence number when it drops below its
+# reorder point; further changes while it stays low keep the number, and
+# the alert is removed once it is restocked. raised_after(seq) therefore
+# returns just the alerts raised since the caller last looked, with one
+# primary-key range read that finds nothing when nothing is low.
+
+PRODUCT = "product"
+CATEGORY = "category"
+DEFAULT = "default"
+
+
+class ReorderMonitor:
+    def __init__(self, table, key, group, stock, default):
+        self.table = table
+        self.key = key
+        self.group = group
+        self.stock = stock
+        self.default = default
+        self.points_table = f"{table}_reorder_points"
+        self.alerts_table = f"{table}_alerts"
+
+    # ---------- Schema ----------
+    def install(self, conn):
+        t, k, alerts = self.table, self.key, self.alerts_table
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (alerts,)).fetchone()
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {self.points_table} (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                threshold INTEGER NOT NULL,
+                PRIMARY KEY (scope, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS {self.points_table}_threshold
+                ON {self.points_table}(threshold);
+            INSERT OR IGNORE INTO {self.points_table} VALUES ('{DEFAULT}', '', {int(self.default)});
+
+            CREATE TABLE IF NOT EXISTS {alerts} (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                item TEXT NOT NULL UNIQUE,
+                stock INTEGER,
+                threshold INTEGER NOT NULL,
+                raised_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TRIGGER IF NOT EXISTS {alerts}_insert AFTER INSERT ON {t}
+            BEGIN {self._raise("NEW")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {alerts}_update
+            AFTER UPDATE OF {k}, {self.group}, {self.stock} ON {t}
+            BEGIN
+                DELETE FROM {alerts} WHERE item = OLD.{k}
+                    AND (OLD.{k} IS NOT NEW.{k} OR NOT IFNULL({self._low("NEW")}, 0));
+                {self._raise("NEW")}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {alerts}_delete AFTER DELETE ON {t}
+            BEGIN
+                DELETE FROM {alerts} WHERE item = OLD.{k};
+            END;
+        """)
+        if not exists:
+            # Alerts for the rows that were there before the table was
+            self.refresh(conn)
+
+    def _threshold(self, row):
+        # The most specific reorder point for `row` (NEW, OLD or an alias)
+        p = self.points_table
+        return (f"COALESCE("
+                f"(SELECT threshold FROM {p} WHERE scope = '{PRODUCT}' AND key = {row}.{self.key}), "
+                f"(SELECT threshold FROM {p} WHERE scope = '{CATEGORY}' AND key = {row}.{self.group}), "
+                f"(SELECT threshold FROM {p} WHERE scope = '{DEFAULT}'), {int(self.default)})")
+
+    def _low(self, row):
+        # Rows at or above the highest reorder point anywhere (most of them)
+        # are settled by one index lookup, before the specific point
+        return (f"{row}.{self.stock} < (SELECT MAX(threshold) FROM {self.points_table}) "
+                f"AND {row}.{self.stock} < {self._threshold(row)}")
+
+    def _raise(self, row, source="", where=None):
+        # Insert an alert for `row` if it is low; an existing alert keeps its
+        # sequence number and just takes the new stock and threshold
+        where = f"({where}) AND " if where else ""
+        return f"""
+                INSERT INTO {self.alerts_table} (item, stock, threshold)
+                SELECT {row}.{self.key}, {row}.{self.stock}, {self._threshold(row)} {source}
+                WHERE {where}{self._low(row)}
+                ON CONFLICT (item) DO UPDATE SET stock = excluded.stock, threshold = excluded.threshold;"""
+
+    # ---------- Reorder points ----------
+    def set_point(self, conn, scope, key, threshold):
+        # threshold=None removes the point (not allowed for the default)
+        if scope == DEFAULT:
+            key = ""
+            if threshold is None:
+                raise ValueError("the default reorder point cannot be removed")
+        if threshold is None:
+            conn.execute(f"DELETE FROM {self.points_table} WHERE scope=? AND key=?", (scope, key))
+        else:
+            conn.execute(f"INSERT OR REPLACE INTO {self.points_table} VALUES (?, ?, ?)",
+                         (scope, key, int(threshold)))
+        # Re-evaluate only the items the point applies to
+        if scope == PRODUCT:
+            self.refresh(conn, f"{self.key} = ?", (key,))
+        elif scope == CATEGORY:
+            self.refresh(conn, f"{self.group} = ?", (key,))
+        else:
+            self.refresh(conn)
+
+    def points(self, conn):
+        # [(scope, key, threshold)]
+        return conn.execute(f"SELECT scope, key, threshold FROM {self.points_table} "
+                            f"ORDER BY scope, key").fetchall()
+
+    def refresh(self, conn, where="1", params=()):
+        # Recompute the alerts of the items matching `where`
+        t, k = self.table, self.key
+        conn.execute(f"""
+            DELETE FROM {self.alerts_table} WHERE item IN (
+                SELECT {k} FROM {t} r WHERE ({where}) AND NOT IFNULL({self._low("r")}, 0))
+        """, params)
+        conn.execute(self._raise("r", f"FROM {t} r", where), params)
+
+    # ---------- Alerts ----------
+    def alerts(self, conn):
+        # Current alerts joined to their rows, lowest stock first
+        return conn.execute(f"""
+            SELECT a.seq, a.threshold, a.raised_at, t.* FROM {self.alerts_table} a
+            JOIN {self.table} t ON t.{self.key} = a.item ORDER BY a.stock, a.item
+        """).fetchall()
+
+    def last_seq(self, conn):
+        return conn.execute(f"SELECT COALESCE(MAX(seq), 0) FROM {self.alerts_table}").fetchone()[0]
+
+    def raised_after(self, conn, seq):
+        # Alerts raised since `seq`, oldest first
+        return conn.execute(f"""
+            SELECT a.seq, a.threshold, a.raised_at, t.* FROM {self.alerts_table} a
+            JOIN {self.table} t ON t.{self.key} = a.item WHERE a.seq > ? ORDER BY a.seq
+        """, (seq,)).fetchall()
@@ -0,0 +1,148 @@
+import re
+import sqlite3
+import unicodedata
+from collections import OrderedDict
+
+# ================== Full-text Search ==================
+# An FTS5 index over a table's searchable columns, stored as an external
+# content table keyed on the base table's rowid and kept in sync by
+# triggers. Queries match every token as a prefix ("ann sal" finds
+# "Anna ... Sales"), are ranked by bm25 and limited, so lookups cost
+# milliseconds regardless of table size. An exact key match always comes
+# first. Without FTS5 in the SQLite build it falls back to LIKE prefixes.
+
+SEARCH_LIMIT = 200
+CACHE_SIZE = 128
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# What FTS5's default tokenizer treats as one token (no underscores)
+_FTS_TOKEN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def match_query(text):
+    # "ann sal" -> '"ann"* "sal"*' (all tokens, each as a prefix)
+    return " ".join(f'"{token}"*' for token in _TOKEN.findall(text))
+
+
+class SearchIndex:
+    def __init__(self, table, key, columns):
+        self.table = table
+        self.key = key
+        self.columns = columns          # indexed columns, key included
+        self.fts_table = f"{table}_fts"
+        self.available = True
+
+    def install(self, conn):
+        t, fts = self.table, self.fts_table
+        cols = ", ".join(self.columns)
+        new = ", ".join(f"new.{c}" for c in self.columns)
+        old = ", ".join(f"old.{c}" for c in self.columns)
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (fts,)).fetchone()
+        try:
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                         f"{cols}, content='{t}', content_rowid='rowid')")
+        except sqlite3.OperationalError:
+            self.available = False      # SQLite built without FTS5
+            return
+        conn.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {t}_fts_insert AFTER INSERT ON {t}
+            BEGIN
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.rowid, {new});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {t}_fts_delete AFTER DELETE ON {t}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {t}_fts_update AFTER UPDATE ON {t}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old});
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.rowid, {new});
+            END;
+        """)
+        if not exists:
+            # Index the rows that were there before the index was
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+    def search(self, conn, text, limit=SEARCH_LIMIT):
+        text = text.strip()
+        rows = conn.execute(f"SELECT * FROM {self.table} WHERE {self.key}=?", (text,)).fetchall()
+        query = match_query(text)
+        if query:
+            if self.available:
+                rows += conn.execute(f"""
+                    SELECT t.* FROM {self.fts_table} f JOIN {self.table} t ON t.rowid = f.rowid
+                    WHERE {self.fts_table} MATCH ? ORDER BY f.rank LIMIT ?
+                """, (query, limit)).fetchall()
+            else:
+                where = " OR ".join(f"{c} LIKE ?" for c in self.columns)
+                rows += conn.execute(f"SELECT * FROM {self.table} WHERE {where} LIMIT ?",
+                                     (*[text + "%"] * len(self.columns), limit)).fetchall()
+        # The exact key match may also be among the ranked results
+        seen, unique = set(), []
+        for row in rows:
+            if row[0] not in seen:
+                seen.add(row[0])
+                unique.append(row)
+        return unique[:limit]
+
+
+def _fold(text):
+    # Case and diacritics folded away, as the FTS5 tokenizer does
+    text = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+class SearchCache:
+    # Bounded LRU cache of search results keyed by query, for search as you
+    # type. apply(change) takes the Change events of writes (see changes.py)
+    # and drops only the queries the write can affect: those whose results
+    # hold the old row, and those the new row would match. The match test
+    # folds case and diacritics and matches token prefixes like FTS5, and
+    # errs towards dropping an entry.
+    def __init__(self, search, columns, size=CACHE_SIZE):
+        self.search = search            # text -> rows (key first)
+        self.columns = columns          # positions of the searched columns in a row
+        self.size = size
+        self._entries = OrderedDict()   # query -> (rows, keys)
+
+    def get(self, text):
+        # Cached rows for `text`, or None
+        entry = self._entries.get(text.strip())
+        if entry is None:
+            return None
+        self._entries.move_to_end(text.strip())
+        return entry[0]
+
+    def lookup(self, text):
+        rows = self.get(text)
+        if rows is None:
+            rows = self.search(text)
+            self._entries[text.strip()] = (rows, {row[0] for row in rows})
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return rows
+
+    def clear(self):
+        self._entries.clear()
+
+    def apply(self, change):
+        if change.op == "reload":
+            self.clear()
+            return
+        tokens = set()
+        if change.row is not None:
+            for c in self.columns:
+                if change.row[c] is not None:
+                    tokens.update(_FTS_TOKEN.findall(_fold(change.row[c])))
+        for text, (rows, keys) in list(self._entries.items()):
+            if change.key in keys or (change.old is not None and change.old[0] in keys):
+                del self._entries[text]
+            elif change.row is not None and self._matches(change.row, tokens, text):
+                del self._entries[text]
+
+    def _matches(self, row, tokens, text):
+        # Would `row` (with folded `tokens`) be among the results for `text`?
+        if str(row[0]) == text:
+            return True
+        return all(any(token.startswith(q) for token in tokens)
+                   for q in _FTS_TOKEN.findall(_fold(text)))
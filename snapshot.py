@@ -0,0 +1,232 @@
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from importer import import_rows
+
+# ================== Binary Snapshots ==================
+# A compact columnar copy of one table. Every column is stored as one
+# typed array, so a snapshot can be mapped with mmap and its numeric
+# columns read in place (memoryview.cast), without parsing text:
+#
+#   REAL  float64 values
+#   INT   the narrowest of int8/16/32/64 that holds every value
+#   TEXT  "dict": an index array (uint8/16/32) into a string table, used
+#         when values repeat (names, categories, departments);
+#         "plain": offsets into a UTF-8 blob, used when every value is
+#         unique (IDs, emails)
+#
+# A column containing NULLs also gets a bitmap of its NULL rows.
+#
+# File layout: MAGIC, uint32 header length, JSON header (table, rows,
+# byte order, and per column its type, encoding and the offset/length of
+# each segment), then the segments, each aligned to 8 bytes.
+
+MAGIC = b"SNAPSHOT\x01"
+ALIGN = 8
+
+TEXT = "text"
+INT = "int"
+REAL = "real"
+
+_INT_CODES = [(code, 8 * array(code).itemsize) for code in ("b", "h", "i", "q")]
+_INDEX_CODES = [(code, 8 * array(code).itemsize) for code in ("B", "H", "I")]
+
+
+def _int_code(values):
+    low, high = (min(values), max(values)) if values else (0, 0)
+    for code, bits in _INT_CODES:
+        if -(1 << (bits - 1)) <= low and high < (1 << (bits - 1)):
+            return code
+    raise OverflowError("integer does not fit in 64 bits")
+
+
+def _index_code(count):
+    for code, bits in _INDEX_CODES:
+        if count <= (1 << bits):
+            return code
+    raise OverflowError("too many distinct strings")
+
+
+class _Column:
+    # Accumulates one column's values while the table is read
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.nulls = []
+        if kind == TEXT:
+            self.ids = {}
+            self.index = array("I")
+        else:
+            self.values = array("d" if kind == REAL else "q")
+
+    def append(self, row, value):
+        if value is None:
+            self.nulls.append(row)
+            value = "" if self.kind == TEXT else 0
+        if self.kind == TEXT:
+            # setdefault keeps the first id handed out for each string
+            self.index.append(self.ids.setdefault(value, len(self.ids)))
+        else:
+            self.values.append(value)
+
+    def segments(self, rows):
+        # (header entry, {segment name: bytes})
+        entry = {"name": self.name, "type": self.kind}
+        segs = {}
+        if self.kind == TEXT:
+            strings = list(self.ids)
+            if len(strings) == rows:
+                entry["encoding"] = "plain"      # ids are 0..rows-1 in order
+            else:
+                entry["encoding"] = "dict"
+                entry["index"] = _index_code(len(strings))
+                segs["index"] = array(entry["index"], self.index).tobytes()
+            blob = [s.encode() for s in strings]
+            offsets = array("Q", [0])
+            for b in blob:
+                offsets.append(offsets[-1] + len(b))
+            entry["offsets"] = "I" if offsets[-1] < 1 << 32 else "Q"
+            segs["offsets"] = array(entry["offsets"], offsets).tobytes()
+            segs["strings"] = b"".join(blob)
+        elif self.kind == INT:
+            entry["code"] = _int_code(self.values)
+            segs["values"] = array(entry["code"], self.values).tobytes()
+        else:
+            entry["code"] = "d"
+            segs["values"] = self.values.tobytes()
+        if self.nulls:
+            bitmap = bytearray((rows + 7) // 8)
+            for row in self.nulls:
+                bitmap[row >> 3] |= 1 << (row & 7)
+            segs["nulls"] = bytes(bitmap)
+        return entry, segs
+
+
+def write_snapshot(conn, f, table, columns):
+    # columns: [(name, TEXT/INT/REAL)] in table order; f: binary file.
+    # Returns the number of rows written.
+    cols = [_Column(name, kind) for name, kind in columns]
+    rows = 0
+    cur = conn.execute(f"SELECT {', '.join(name for name, _ in columns)} FROM {table}")
+    for values in cur:
+        for col, value in zip(cols, values):
+            col.append(rows, value)
+        rows += 1
+
+    header = {"table": table, "rows": rows, "byteorder": sys.byteorder, "columns": []}
+    body = []
+    position = 0
+    for col in cols:
+        entry, segs = col.segments(rows)
+        entry["segments"] = {}
+        for name, data in segs.items():
+            entry["segments"][name] = [position, len(data)]
+            padding = -len(data) % ALIGN
+            body.append(data + b"\0" * padding)
+            position += len(data) + padding
+        header["columns"].append(entry)
+
+    head = json.dumps(header).encode()
+    start = len(MAGIC) + 4 + len(head)
+    head += b" " * (-start % ALIGN)     # segments start 8-byte aligned
+    f.write(MAGIC + struct.pack("<I", len(head)) + head)
+    for data in body:
+        f.write(data)
+    return rows
+
+
+class Snapshot:
+    # Read-only view of a snapshot file through mmap
+    def __init__(self, path):
+        self._view = None
+        self._tables = {}           # decoded string tables of dict columns
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:          # empty file
+            self._file.close()
+            raise ValueError(f"{path} is not a snapshot")
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a snapshot")
+        (size,) = struct.unpack_from("<I", self._map, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._map[start:start + size])
+        if header["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+        self._base = start + size
+        self._view = memoryview(self._map)
+        self.table = header["table"]
+        self.rows = header["rows"]
+        self.columns = header["columns"]
+
+    def close(self):
+        self._tables.clear()
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def names(self):
+        return [col["name"] for col in self.columns]
+
+    def _segment(self, col, name, code=None):
+        offset, length = col["segments"][name]
+        view = self._view[self._base + offset:self._base + offset + length]
+        return view.cast(code) if code else view
+
+    def column(self, name, start=0, stop=None):
+        # Values of rows start..stop as a list (None for NULLs). Numeric
+        # columns are sliced straight out of the mapped file.
+        col = self.columns[self.names.index(name)]
+        stop = self.rows if stop is None else min(stop, self.rows)
+        if col["type"] == TEXT and col["encoding"] == "plain":
+            offsets = self._segment(col, "offsets", col["offsets"])
+            strings = self._segment(col, "strings")
+            values = [str(strings[a:b], "utf-8")
+                      for a, b in zip(offsets[start:stop], offsets[start + 1:stop + 1])]
+        elif col["type"] == TEXT:
+            table = self._tables.get(name)
+            if table is None:
+                offsets = self._segment(col, "offsets", col["offsets"])
+                strings = self._segment(col, "strings")
+                table = self._tables[name] = [str(strings[a:b], "utf-8")
+                                              for a, b in zip(offsets, offsets[1:])]
+            values = [table[i] for i in self._segment(col, "index", col["index"])[start:stop]]
+        else:
+            values = self._segment(col, "values", col["code"])[start:stop].tolist()
+        if "nulls" in col["segments"]:
+            bitmap = self._segment(col, "nulls")
+            for row in range(start, stop):
+                if bitmap[row >> 3] & (1 << (row & 7)):
+                    values[row - start] = None
+        return values
+
+    def iter_rows(self, chunk=10000):
+        # Row tuples in table order, decoded one chunk of rows at a time
+        for start in range(0, self.rows, chunk):
+            yield from zip(*(self.column(name, start, start + chunk) for name in self.names))
+
+
+def restore_snapshot(conn, path, table, columns):
+    # Replace the contents of `table` with the snapshot at `path`, in one
+    # transaction (row triggers still run, so derived tables stay in step).
+    # Returns the ImportStats of the load.
+    with Snapshot(path) as snap:
+        if snap.table != table or snap.names != [name for name, _ in columns]:
+            raise ValueError(f"{path} is a snapshot of {snap.table}({', '.join(snap.names)}), "
+                             f"not of {table}")
+        conn.execute(f"DELETE FROM {table}")
+        return import_rows(conn, snap.iter_rows(), table, tuple, atomic=True)
@@ -0,0 +1,79 @@
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+
+from profiler import PHASES, PROFILER, TOTAL
+
+# ================== Timing Stats Panel ==================
+# A window listing every profiled operation with its latency over the
+# latest samples (see profiler.py), refreshed while it is open. Expanding
+# an operation shows how its time splits into sql, render, io and its own
+# handler code. The statistics can be saved as JSON or reset.
+
+COLUMNS = ("Count", "Mean ms", "p50 ms", "p90 ms", "p99 ms", "Max ms")
+KEYS = ("count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms")
+
+
+class StatsPanel(tk.Toplevel):
+    REFRESH_MS = 1000
+
+    def __init__(self, parent, profiler=PROFILER):
+        super().__init__(parent)
+        self.title("Operation Timings")
+        self.geometry("760x420")
+        self.profiler = profiler
+        self.open = set()       # operations whose phases are expanded
+
+        self.tree = ttk.Treeview(self, columns=COLUMNS)
+        self.tree.heading("#0", text="Operation / phase")
+        self.tree.column("#0", width=220)
+        for col in COLUMNS:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=80, anchor="e")
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.bind("<<TreeviewOpen>>", lambda e: self.open.add(self.tree.focus()))
+        self.tree.bind("<<TreeviewClose>>", lambda e: self.open.discard(self.tree.focus()))
+
+        buttons = tk.Frame(self)
+        buttons.pack(side="bottom", fill="x", padx=5, pady=5)
+        tk.Button(buttons, text="Save JSON...", command=self.save).pack(side="left", padx=5)
+        tk.Button(buttons, text="Reset", command=self.reset).pack(side="left", padx=5)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.job = None
+        self.refresh()
+
+    def destroy(self):
+        if self.job is not None:
+            self.after_cancel(self.job)
+            self.job = None
+        super().destroy()
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for name, stats in self.profiler.stats().items():
+            self.tree.insert("", "end", iid=name, text=name, values=self._values(stats[TOTAL]),
+                             open=name in self.open)
+            for phase in PHASES:
+                if phase in stats:
+                    self.tree.insert(name, "end", text=phase, values=self._values(stats[phase]))
+        self.job = self.after(self.REFRESH_MS, self.refresh)
+
+    @staticmethod
+    def _values(summary):
+        return [summary["count"]] + [f"{summary[key]:.2f}" if key in summary else ""
+                                     for key in KEYS[1:]]
+
+    def save(self):
+        filename = filedialog.asksaveasfilename(parent=self, title="Save timings",
+                                                defaultextension=".json",
+                                                filetypes=(("JSON files", "*.json"),))
+        if filename:
+            try:
+                self.profiler.dump(filename)
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to save timings: {e}", parent=self)
+
+    def reset(self):
+        self.profiler.reset()
+        self.open.clear()
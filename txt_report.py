@@ -0,0 +1,74 @@
+import re
+
+# ================== Fixed-width TXT Reports ==================
+# Parser for the reports written by export_txt_file(): a title block, a
+# column header underlined with dashes, one fixed-width line per record
+# and a summary block after a blank line. Each column is padded to its
+# width and followed by one space; money columns carry a "$" before the
+# padded value. Reports are read line by line, so memory stays constant.
+#
+# The layout's widths are minimums: the exporter widens a column to its
+# longest value (fit()) and pads the header to match, and the parser reads
+# the widths back from where the header's titles start. Titles are single
+# words for that reason. Values are never truncated, so every exported
+# record imports again.
+
+TEXT = "text"
+MONEY = "money"
+
+
+class FixedWidthLayout:
+    def __init__(self, columns):
+        # columns: [(width, kind)] in report order
+        self.columns = columns
+
+    def fit(self, longest):
+        # Column widths for values of at most longest[i] characters (None
+        # when the column is empty; money values counted without the "$")
+        return [max(width, n or 0) for (width, _), n in zip(self.columns, longest)]
+
+    def header_widths(self, header):
+        # Column widths of a report, from the start of each header title;
+        # the layout's own widths when the header does not match it
+        starts = [m.start() for m in re.finditer(r"\S+", header)]
+        if len(starts) != len(self.columns):
+            return [width for width, _ in self.columns]
+        widths = [end - start - 1 - (kind == MONEY)
+                  for start, end, (_, kind) in zip(starts, starts[1:], self.columns)]
+        return widths + [self.columns[-1][0]]
+
+    def records(self, lines):
+        # (line, widths) of every record line
+        header, widths = None, None
+        for line in lines:
+            if widths is None:
+                # The dashed rule under the column header opens the table
+                if line.startswith("-" * 10) and header is not None:
+                    widths = self.header_widths(header)
+                header = line
+                continue
+            if not line.strip() or line.startswith("="):
+                header, widths = None, None
+                continue
+            yield line, widths
+
+    def split(self, line, widths=None):
+        # Field strings of one record line, with the widths read from its
+        # report's header; ValueError when the line does not fit them
+        line = line.rstrip("\r\n")
+        fields, pos = [], 0
+        last = len(self.columns) - 1
+        for i, width in enumerate(widths or [width for width, _ in self.columns]):
+            kind = self.columns[i][1]
+            if kind == MONEY:
+                if line[pos:pos + 1] != "$":
+                    raise ValueError(f"expected '$' at column {pos + 1}")
+                pos += 1
+            if i == last:
+                fields.append(line[pos:].strip())
+                break
+            if line[pos + width:pos + width + 1] != " ":
+                raise ValueError(f"value overflows column {i + 1}")
+            fields.append(line[pos:pos + width].rstrip())
+            pos += width + 1
+        return fields
@@ -0,0 +1,66 @@
+# ================== Row Versions ==================
+# Optimistic concurrency for several app instances sharing one database.
+# Triggers keep a version number per row in <table>_versions: 1 when the
+# row is inserted, +1 on every update, gone when it is deleted. A writer
+# remembers the version of the row it showed the user and passes it back
+# with its update; check() then refuses the update with StaleRowError if
+# another instance changed the row in the meantime, instead of silently
+# overwriting that change.
+
+
+class StaleRowError(Exception):
+    def __init__(self, key, expected, current):
+        state = "deleted" if current is None else f"now at version {current}"
+        super().__init__(f"{key} was changed by someone else (read at version {expected}, {state})")
+        self.key = key
+        self.expected = expected
+        self.current = current
+
+
+class RowVersions:
+    def __init__(self, table, key):
+        self.table = table
+        self.key = key
+        self.versions_table = f"{table}_versions"
+
+    def install(self, conn):
+        t, k, v = self.table, self.key, self.versions_table
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (v,)).fetchone()
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {v} (
+                key TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER IF NOT EXISTS {v}_insert AFTER INSERT ON {t}
+            BEGIN
+                INSERT OR REPLACE INTO {v} VALUES (NEW.{k}, 1);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {v}_update AFTER UPDATE ON {t}
+            BEGIN
+                DELETE FROM {v} WHERE key = OLD.{k} AND OLD.{k} IS NOT NEW.{k};
+                INSERT INTO {v} VALUES (NEW.{k}, 1)
+                    ON CONFLICT (key) DO UPDATE SET version = version + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS {v}_delete AFTER DELETE ON {t}
+            BEGIN
+                DELETE FROM {v} WHERE key = OLD.{k};
+            END;
+        """)
+        if not exists:
+            # Rows that were there before versioning start at version 1
+            conn.execute(f"INSERT OR IGNORE INTO {v} SELECT {k}, 1 FROM {t}")
+
+    def version(self, conn, key):
+        # Current version of `key`, or None if there is no such row
+        row = conn.execute(f"SELECT version FROM {self.versions_table} WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def check(self, conn, key, expected):
+        # Call inside the write transaction, before writing the row.
+        # expected=None skips the check (last writer wins).
+        if expected is None:
+            return
+        current = self.version(conn, key)
+        if current != expected:
+            raise StaleRowError(key, expected, current)
@@ -0,0 +1,193 @@
+import queue
+import threading
+import time
+
+import db
+from profiler import PROFILER
+
+# ================== Background Export Worker ==================
+# Exports run on one background thread so the Tk main loop never waits on
+# disk I/O. Requests are coalesced: every request made while an export is
+# pending just joins it, and the export starts once requests have been
+# quiet for `delay` seconds (or `max_delay` after the first one), so a
+# burst of edits produces a single export.
+#
+# Tk is not thread-safe, so results travel back through a queue that the
+# main thread drains with root.after() while work is outstanding. Each
+# export is profiled as operation export_<kind>.
+
+
+class ExportWorker:
+    POLL_MS = 100
+
+    def __init__(self, root, exporters, on_done=None, on_error=None,
+                 delay=0.5, max_delay=5.0):
+        # exporters: {kind: callable() -> filename}, called on the worker thread
+        self.root = root
+        self.exporters = exporters
+        self.on_done = on_done
+        self.on_error = on_error
+        self.delay = delay
+        self.max_delay = max_delay
+        self.runs = 0
+
+        self._cond = threading.Condition()
+        self._pending = set()
+        self._first_request = self._last_request = 0.0
+        self._busy = False
+        self._stopping = False
+        self._results = queue.Queue()
+        self._polling = False
+
+        self._thread = threading.Thread(target=self._run, name="export-worker", daemon=True)
+        self._thread.start()
+
+    # ---------- Main thread ----------
+    def request(self, *kinds):
+        now = time.monotonic()
+        with self._cond:
+            if not self._pending:
+                self._first_request = now
+            self._pending.update(kinds or self.exporters)
+            self._last_request = now
+            self._cond.notify()
+        self._start_polling()
+
+    def stop(self, timeout=30.0):
+        # Finish anything pending, then end the thread
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._drain()
+
+    def idle(self):
+        with self._cond:
+            return not self._pending and not self._busy
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _poll(self):
+        self._drain()
+        if self.idle() and self._results.empty():
+            self._polling = False
+        else:
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _drain(self):
+        while True:
+            try:
+                ok, payload = self._results.get_nowait()
+            except queue.Empty:
+                return
+            callback = self.on_done if ok else self.on_error
+            if callback is not None:
+                callback(payload)
+
+    # ---------- Worker thread ----------
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                if self._pending:
+                    now = time.monotonic()
+                    due = min(self._last_request + self.delay,
+                              self._first_request + self.max_delay)
+                    if self._stopping or now >= due:
+                        kinds, self._pending = self._pending, set()
+                        self._busy = True
+                        return kinds
+                    self._cond.wait(due - now)
+                elif self._stopping:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _run(self):
+        try:
+            while True:
+                kinds = self._next_batch()
+                if kinds is None:
+                    return
+                try:
+                    filenames = [self._export(kind, export)
+                                 for kind, export in self.exporters.items() if kind in kinds]
+                    self._results.put((True, filenames))
+                except Exception as e:
+                    self._results.put((False, e))
+                finally:
+                    self.runs += 1
+                    with self._cond:
+                        self._busy = False
+        finally:
+            db.close_connection()
+
+    def _export(self, kind, export):
+        with PROFILER.operation(f"export_{kind}"):
+            return export()
+
+
+# ================== Background Task ==================
+# A one-off job (e.g. a bulk import) on its own thread. The job is called
+# as job(report, cancelled): report(*args) publishes progress and
+# cancelled() says whether cancel() was requested. Only the latest
+# progress report and the final outcome are passed to the UI, again
+# through root.after(). The job is profiled as operation `name`.
+
+
+class BackgroundTask:
+    POLL_MS = 100
+
+    def __init__(self, root, job, on_progress=None, on_done=None, on_error=None,
+                 name="background_task"):
+        self.root = root
+        self.job = job
+        self.name = name
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._progress = None
+        self._outcome = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="background-task", daemon=True)
+        self._thread.start()
+        self.root.after(self.POLL_MS, self._poll)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def running(self):
+        return self._thread is not None and self._outcome is None
+
+    def _report(self, *args):
+        with self._lock:
+            self._progress = args
+
+    def _run(self):
+        try:
+            with PROFILER.operation(self.name):
+                outcome = (True, self.job(self._report, self._cancel.is_set))
+        except Exception as e:
+            outcome = (False, e)
+        finally:
+            db.close_connection()
+        self._outcome = outcome
+
+    def _poll(self):
+        with self._lock:
+            progress, self._progress = self._progress, None
+        if progress is not None and self.on_progress is not None:
+            self.on_progress(*progress)
+        if self._outcome is None:
+            self.root.after(self.POLL_MS, self._poll)
+            return
+        ok, payload = self._outcome
+        callback = self.on_done if ok else self.on_error
+        if callback is not None:
+            callback(payload)